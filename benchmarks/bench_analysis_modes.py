@@ -0,0 +1,76 @@
+"""Compare end-to-end latency of the two-pass and combined analysis paths.
+
+Runs both paths against the local mock server so the difference is the number
+of serial round trips, not model speed:
+
+    python -m benchmarks.bench_analysis_modes --iterations 20 --latency 0.3
+"""
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+from PIL import Image
+
+from src.image_preprocess import ImagePreprocessor
+from src.openai_vision import (
+    ImageProcessingInputDetail,
+    analyze_and_roast,
+    generate_joke_from_description,
+    process_image_with_openai,
+)
+from benchmarks.mock_openai import MockOpenAIServer
+
+PROMPT = "What can you see in this screenshot?"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def two_pass(client, image):
+    completion = process_image_with_openai(client, image, PROMPT, detail=ImageProcessingInputDetail.LOW)
+    description = completion.choices[0].message.content
+    return description, generate_joke_from_description(client, description)
+
+
+def combined(client, image):
+    return analyze_and_roast(client, image, PROMPT, detail=ImageProcessingInputDetail.LOW)
+
+
+def run(iterations, latency):
+    server = MockOpenAIServer(latency=latency).start()
+    client = OpenAI(api_key="mock", base_url=server.base_url)
+    frame = Image.effect_noise((1920, 1080), 64).convert("RGB")
+    image = ImagePreprocessor().prepare(frame, ImageProcessingInputDetail.LOW.value)
+
+    results = {}
+    try:
+        for name, path in (("two_pass", two_pass), ("combined", combined)):
+            path(client, image)
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                description, joke = path(client, image)
+                samples.append(time.perf_counter() - start)
+                assert description and joke
+            results[name] = samples
+    finally:
+        server.stop()
+
+    print(f"mock latency {latency * 1000:.0f} ms, {iterations} iterations")
+    for name, samples in results.items():
+        print(
+            f"{name:>9}: mean {statistics.mean(samples) * 1000:7.1f} ms  "
+            f"p50 {percentile(samples, 0.5) * 1000:7.1f} ms  "
+            f"p95 {percentile(samples, 0.95) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock server delay per request in seconds")
+    args = parser.parse_args()
+    run(args.iterations, args.latency)
@@ -0,0 +1,73 @@
+"""Main-thread cost of capturing in-process versus reading the capture worker's ring.
+
+Times, on the calling thread, everything between "I want a frame" and
+"I have an upload-ready JPEG": grab + prepare in-process, versus a
+zero-copy ring read + an encode request answered by the worker process,
+and versus a plain copy out of the ring (what SharedFrameBackend does):
+
+    python -m benchmarks.bench_capture_worker --backend synthetic --frames 30
+"""
+import argparse
+import json
+import time
+
+from src.capture import create_capture_backend
+from src.capture_worker import CaptureWorker, SharedFrameBackend
+from src.image_preprocess import ImagePreprocessor
+from benchmarks.bench_e2e import distribution, git_commit
+
+
+def timed(function, frames):
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return distribution(samples)
+
+
+def run(args):
+    options = {"pattern": args.pattern} if args.backend == "synthetic" else {}
+    backend = create_capture_backend(args.backend, **options)
+    preprocessor = ImagePreprocessor()
+    in_process = timed(lambda: preprocessor.prepare(backend.grab(), args.detail), args.frames)
+    backend.close()
+
+    worker = CaptureWorker(args.backend, options, interval=args.interval, slots=args.slots).start()
+    shared = SharedFrameBackend(worker)
+    try:
+        worker.wait_for_frame(timeout=10).release()
+
+        def encode():
+            frame = worker.latest()
+            try:
+                worker.encode(frame, args.detail)
+            finally:
+                frame.release()
+
+        worker_encode = timed(encode, args.frames)
+        ring_copy = timed(shared.grab, args.frames)
+        frames_written = worker.ring.latest_seq()
+    finally:
+        shared.close()
+
+    return {
+        "config": vars(args),
+        "commit": git_commit(),
+        "in_process_grab_and_prepare_ms": in_process,
+        "worker_encode_ms": worker_encode,
+        "ring_copy_ms": ring_copy,
+        "frames_written": frames_written,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="synthetic")
+    parser.add_argument("--pattern", default="bars", help="Synthetic backend pattern")
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between worker captures")
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--detail", choices=["low", "high", "auto"], default="high")
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,53 @@
+"""Count new connections made by a fresh client per cycle versus the shared pool.
+
+    python -m benchmarks.bench_client_pool --cycles 20 --error-rate 0.1
+"""
+import argparse
+import time
+
+from openai import OpenAI
+
+from src.openai_vision import (
+    ClientSettings,
+    configure_openai_client,
+    generate_joke_from_description,
+    load_openai_client,
+)
+from benchmarks.mock_openai import MockOpenAIServer
+
+
+def run_cycles(server, cycles, make_client):
+    start_connections = server.connections
+    start = time.perf_counter()
+    for _ in range(cycles):
+        generate_joke_from_description(make_client(), "A terminal running the same failing test again.")
+    elapsed = time.perf_counter() - start
+    return server.connections - start_connections, elapsed
+
+
+def run(cycles, latency, error_rate, http2):
+    server = MockOpenAIServer(latency=latency, error_rate=error_rate).start()
+    manager = configure_openai_client(ClientSettings(api_key="mock", base_url=server.base_url, http2=http2, backoff_base=0.05))
+    try:
+        fresh_connections, fresh_elapsed = run_cycles(
+            server, cycles, lambda: OpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+        )
+        shared_connections, shared_elapsed = run_cycles(server, cycles, load_openai_client)
+    finally:
+        manager.close()
+        server.stop()
+
+    print(f"{cycles} cycles, mock latency {latency * 1000:.0f} ms, error rate {error_rate:.0%}")
+    print(f"fresh client per cycle: {fresh_connections:3d} connections, {fresh_elapsed:6.2f} s")
+    print(f"shared pooled client  : {shared_connections:3d} connections, {shared_elapsed:6.2f} s")
+    print(f"retries performed     : {manager.retries}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--http2", action="store_true", help="Ask for HTTP/2 (the mock only speaks HTTP/1.1)")
+    args = parser.parse_args()
+    run(args.cycles, args.latency, args.error_rate, args.http2)
@@ -0,0 +1,241 @@
+"""End-to-end roast cycle benchmark with local stand-ins for every external dependency.
+
+Runs the real capture -> encode -> vision -> joke -> render -> TTS stages
+against the mock OpenAI server, a synthetic capture backend, the null speech
+engine and a headless SDL driver, and prints the results as JSON:
+
+    python -m benchmarks.bench_e2e --cycles 20 --latency 0.3 --output e2e.json
+    python -m benchmarks.bench_e2e --mode pipeline --cycles 20
+
+"serial" runs the stages back to back like testingTask; "pipeline" runs them
+through AsyncPipeline so cycles overlap. --allocations adds tracemalloc
+figures, at the cost of slower stages.
+"""
+import os
+
+# Must be set before pygame is first imported; the prompt would corrupt JSON on stdout
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image
+
+from src.capture import SyntheticBackend
+from src.frame_cache import FrameCache
+from src.metrics import configure_metrics
+from src.openai_vision import ClientSettings, ImageProcessingInputDetail, configure_openai_client
+from src.overlay import OverlayRenderer
+from src.pipeline import AsyncPipeline, CycleContext, build_roast_stages
+from src.screenshot import ScreenshotManager
+from src.tts import AdvancedTextToSpeech, SpeechMode
+from benchmarks.mock_openai import MockOpenAIServer
+from benchmarks.null_tts import NullEngine
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OVERLAY_IMAGE = os.path.join(REPO_ROOT, "src", "Morgan-Freeman-PNG-Photo.png")
+
+
+def distribution(samples, scale=1000):
+    """Summary of samples, by default seconds reported as milliseconds."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * scale
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered) * scale,
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1] * scale,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def overlay_image(path):
+    """The overlay PNG, or a generated stand-in when the asset is not checked out."""
+    if path and os.path.isfile(path):
+        return path
+    stand_in = os.path.join(tempfile.gettempdir(), "bench_e2e_overlay.png")
+    Image.new("RGBA", (400, 600), (200, 160, 120, 255)).save(stand_in)
+    return stand_in
+
+
+def build(args, server):
+    manager = configure_openai_client(ClientSettings(api_key="mock", base_url=server.base_url, backoff_base=0.05))
+    capture = ScreenshotManager(SyntheticBackend(size=tuple(args.resolution), pattern=args.pattern, frames=args.frames))
+    tts = AdvancedTextToSpeech(
+        mode=SpeechMode(args.tts_mode),
+        engine_factory=lambda: NullEngine(words_per_minute=args.words_per_minute)
+    )
+    image_path = overlay_image(args.overlay_image)
+    overlay = OverlayRenderer()
+    overlay.start()
+    overlay.preload(image_path)
+
+    def show_overlay(ctx):
+        overlay.show(image_path, (0, 0))
+        return overlay
+
+    def hide_overlay(handle):
+        handle.hide()
+
+    stages = build_roast_stages(
+        tts,
+        show_overlay,
+        hide_overlay,
+        detail=ImageProcessingInputDetail(args.detail),
+        screenshot_manager=capture,
+        frame_cache=FrameCache() if args.frame_cache else None,
+    )
+    return manager, tts, overlay, stages
+
+
+def run_serial(stages, cycles, allocations):
+    """Run each cycle through every stage before starting the next one."""
+    contexts = []
+    stage_allocations = {stage.name: [] for stage in stages}
+    for cycle in range(cycles):
+        ctx = CycleContext(cycle=cycle)
+        for stage in stages:
+            if allocations:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            ctx = stage.func(ctx)
+            elapsed = time.perf_counter() - start
+            if allocations:
+                stage_allocations[stage.name].append(tracemalloc.get_traced_memory()[1] - before)
+            if ctx is None:
+                break
+            ctx.timings[stage.name] = elapsed
+        if ctx is not None:
+            ctx.timings["end_to_end"] = ctx.elapsed
+            contexts.append(ctx)
+    return contexts, stage_allocations
+
+
+def run_pipeline(stages, cycles):
+    contexts = []
+
+    def on_complete(ctx):
+        ctx.timings["end_to_end"] = ctx.elapsed
+        contexts.append(ctx)
+
+    pipeline = AsyncPipeline(stages, max_cycles=cycles, on_complete=on_complete)
+    asyncio.run(pipeline.run())
+    return contexts, {}
+
+
+def run(args):
+    server = MockOpenAIServer(latency=args.latency, token_delay=args.token_delay, error_rate=args.error_rate)
+    if args.joke:
+        server.joke = args.joke
+    server.start()
+    registry = configure_metrics(enabled=args.metrics, jsonl_path=args.metrics_jsonl)
+    manager, tts, overlay, stages = build(args, server)
+
+    if args.allocations:
+        tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0] if args.allocations else 0
+    start = time.perf_counter()
+    try:
+        if args.mode == "pipeline":
+            contexts, stage_allocations = run_pipeline(stages, args.cycles)
+        else:
+            contexts, stage_allocations = run_serial(stages, args.cycles, args.allocations)
+    finally:
+        elapsed = time.perf_counter() - start
+        allocations = None
+        if args.allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            allocations = {
+                "net_bytes": current - start_memory,
+                "peak_bytes": peak - start_memory,
+                "stage_peak_bytes": {name: distribution(samples, scale=1)
+                                     for name, samples in stage_allocations.items() if samples},
+            }
+        # RenderStats.elapsed is only filled in once the render loop exits
+        overlay.shutdown()
+        render_stats = overlay.renderer.stats.as_dict() if overlay.renderer is not None else None
+        tts.close()
+        manager.close()
+        server.stop()
+        registry.close()
+
+    names = [stage.name for stage in stages] + ["end_to_end"]
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "config": vars(args),
+        "cycles_completed": len(contexts),
+        "elapsed_s": elapsed,
+        "throughput_cycles_per_s": len(contexts) / elapsed if elapsed else 0.0,
+        "latency_ms": {name: distribution([ctx.timings[name] for ctx in contexts if name in ctx.timings])
+                       for name in names},
+        "allocations": allocations,
+        "mock_server": {
+            "requests": server.requests,
+            "connections": server.connections,
+            "bytes_received": server.bytes_received,
+        },
+        "client_retries": manager.retries,
+        "tts": tts.metrics(),
+        "render": render_stats,
+        "metrics": registry.snapshot() if args.metrics else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--mode", choices=["serial", "pipeline"], default="serial")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock API seconds per request")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Mock seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock requests failing with 429/503")
+    parser.add_argument("--joke", default=None, help="Joke text returned by the mock (controls speech length)")
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1920, 1080], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--pattern", default="gradient", help="Synthetic capture pattern")
+    parser.add_argument("--frames", type=int, default=4, help="Distinct synthetic frames to cycle through")
+    parser.add_argument("--detail", choices=[d.value for d in ImageProcessingInputDetail], default="auto")
+    parser.add_argument("--frame-cache", action="store_true", help="Enable near-duplicate frame reuse")
+    parser.add_argument("--tts-mode", choices=[m.value for m in SpeechMode], default=SpeechMode.LIVE.value)
+    parser.add_argument("--words-per-minute", type=float, default=None,
+                        help="Simulated speaking rate; by default speech takes no time")
+    parser.add_argument("--overlay-image", default=OVERLAY_IMAGE,
+                        help="Overlay PNG; a generated stand-in is used if it does not exist")
+    parser.add_argument("--allocations", action="store_true", help="Trace Python allocations with tracemalloc")
+    parser.add_argument("--metrics", action="store_true", help="Enable the span/counter registry and include its snapshot")
+    parser.add_argument("--metrics-jsonl", default=None, help="Also append every span to this JSONL file")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
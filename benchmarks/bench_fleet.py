@@ -0,0 +1,153 @@
+"""Fleet mode throughput benchmark on one machine.
+
+Starts the mock OpenAI server as the upstream, a RoastService in front of it
+and many simulated RoastAgents (one thread and keep-alive connection each),
+which upload pre-compressed frames drawn from a pool of distinct scenes.
+Prints throughput, agent-side latency, how requests were answered
+(upstream, frame cache, coalesced) and the upstream load as JSON:
+
+    python -m benchmarks.bench_fleet --agents 120 --frames 5 --scenes 30
+    python -m benchmarks.bench_fleet --agents 200 --rate 20 --burst 40
+"""
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+
+from PIL import Image, ImageDraw
+
+from src.fleet import FleetError, RoastAgent, RoastService
+from src.frame_cache import FrameCache
+from src.image_preprocess import ImagePreprocessor
+from src.metrics import configure_metrics
+from src.openai_vision import AnalysisMode, ClientSettings, ImageProcessingInputDetail, configure_openai_client
+from src.rate_limit import TokenBucket
+from benchmarks.bench_e2e import distribution, git_commit
+from benchmarks.mock_openai import MockOpenAIServer
+
+
+def make_scenes(count, size=(1920, 1080), seed=0):
+    """Perceptually distinct desktop-like frames, compressed as an agent would upload them."""
+    rng = random.Random(seed)
+    preprocessor = ImagePreprocessor()
+    scenes = []
+    for _ in range(count):
+        image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            w, h = rng.randrange(100, size[0] // 2), rng.randrange(60, size[1] // 2)
+            draw.rectangle((x, y, x + w, y + h), fill=tuple(rng.randrange(256) for _ in range(3)))
+        scenes.append(preprocessor.prepare(image, ImageProcessingInputDetail.LOW.value))
+    return scenes
+
+
+def run_agent(index, service_url, token, scenes, frames, think_time, start_barrier, latencies, errors, lock):
+    rng = random.Random(index)
+    agent = RoastAgent(service_url, agent_id=f"agent-{index}", token=token, max_retries=5)
+    start_barrier.wait()
+    try:
+        for _ in range(frames):
+            start = time.perf_counter()
+            try:
+                agent.submit(rng.choice(scenes))
+            except FleetError as e:
+                with lock:
+                    errors[e.status] = errors.get(e.status, 0) + 1
+            else:
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            if think_time:
+                time.sleep(rng.uniform(0, 2 * think_time))
+    finally:
+        agent.close()
+
+
+def run(args):
+    upstream = MockOpenAIServer(latency=args.latency, token_delay=0.0).start()
+    registry = configure_metrics(enabled=args.metrics)
+    manager = configure_openai_client(ClientSettings(
+        api_key="mock",
+        base_url=upstream.base_url,
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections,
+        backoff_base=0.05,
+    ))
+    service = RoastService(
+        mode=AnalysisMode(args.mode),
+        frame_cache=None if args.frame_cache else FrameCache(max_entries=0),
+        rate_limiter=TokenBucket(args.rate, args.burst) if args.rate else None,
+        rate_limit_timeout=args.rate_limit_timeout,
+        token=secrets.token_hex(16),
+    ).start(port=0)
+
+    scenes = make_scenes(args.scenes)
+    latencies, errors, lock = [], {}, threading.Lock()
+    barrier = threading.Barrier(args.agents + 1)
+    threads = [
+        threading.Thread(target=run_agent, args=(i, service.url, service.token, scenes, args.frames, args.think_time,
+                                                 barrier, latencies, errors, lock), daemon=True)
+        for i in range(args.agents)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = service.stats()
+    service.stop()
+    manager.close()
+    upstream.stop()
+    registry.close()
+
+    return {
+        "commit": git_commit(),
+        "config": vars(args),
+        "agents": args.agents,
+        "frames_completed": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_frames_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "agent_latency_ms": distribution(latencies),
+        "upload_bytes_mean": sum(scene.encoded_bytes for scene in scenes) / len(scenes),
+        "service": stats,
+        "upstream": {
+            "requests": upstream.requests,
+            "connections": upstream.connections,
+            "bytes_received": upstream.bytes_received,
+        },
+        "client_retries": manager.retries,
+        "metrics": registry.snapshot() if args.metrics else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=120, help="Simulated desktop agents")
+    parser.add_argument("--frames", type=int, default=5, help="Frames each agent submits")
+    parser.add_argument("--scenes", type=int, default=30, help="Distinct screens the agents' frames are drawn from")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds an agent waits between frames")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock API seconds per request")
+    parser.add_argument("--mode", choices=[m.value for m in AnalysisMode], default=AnalysisMode.TWO_PASS.value)
+    parser.add_argument("--max-connections", type=int, default=32, help="Upstream connection pool size")
+    parser.add_argument("--rate", type=float, default=None, help="Global upstream requests per second")
+    parser.add_argument("--burst", type=float, default=None, help="Upstream requests allowed in a burst")
+    parser.add_argument("--rate-limit-timeout", type=float, default=10.0,
+                        help="Longest a request may queue for the rate limiter before a 429")
+    parser.add_argument("--no-frame-cache", dest="frame_cache", action="store_false",
+                        help="Disable the shared near-duplicate cache (coalescing still applies)")
+    parser.add_argument("--metrics", action="store_true", help="Enable the span/counter registry and include its snapshot")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
@@ -0,0 +1,114 @@
+"""Payload and vision-token savings of incremental frame analysis.
+
+Replays a generated desktop session (typing in an editor, a ticking clock,
+a notification popping up, occasionally switching to another window) and
+compares uploading every frame in full with IncrementalAnalyzer's crops.
+No API calls are made; sizes come from the real preprocessor and tokens
+from the governor's estimate:
+
+    python -m benchmarks.bench_incremental --frames 60 --detail high
+"""
+import argparse
+import json
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from src.governor import estimate_image_tokens
+from src.image_preprocess import ImagePreprocessor
+from src.incremental import FrameChange, IncrementalAnalyzer
+from benchmarks.bench_e2e import distribution
+
+
+class DesktopSession:
+    """Generates successive frames of a plausible, mostly static desktop."""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = random.Random(seed)
+        self.lines = 0
+        self.window = 0
+        self.tick = 0
+
+    def _background(self):
+        width, height = self.size
+        image = Image.new("RGB", self.size, (30, 30, 40) if self.window == 0 else (235, 235, 240))
+        draw = ImageDraw.Draw(image)
+        rng = random.Random(self.window)
+        for _ in range(40):
+            x, y = rng.randrange(width), rng.randrange(40, height)
+            draw.rectangle((x, y, x + rng.randrange(40, 400), y + 14), fill=tuple(rng.randrange(80, 255) for _ in range(3)))
+        draw.rectangle((0, height - 40, width, height), fill=(20, 20, 20))
+        return image, draw
+
+    def next_frame(self):
+        self.tick += 1
+        event = self.rng.random()
+        if event < 0.05:
+            self.window = 1 - self.window
+            self.lines = 0
+        elif event < 0.7:
+            self.lines += 1
+
+        image, draw = self._background()
+        width, height = self.size
+        for line in range(min(self.lines, 60)):
+            y = 80 + line * 18
+            draw.rectangle((120, y, 120 + 30 + (line * 97) % 600, y + 12), fill=(200, 200, 120))
+        # Taskbar clock
+        draw.text((width - 90, height - 30), f"12:{self.tick % 60:02d}", fill=(255, 255, 255))
+        if self.tick % 10 == 0:
+            draw.rectangle((width - 380, height - 160, width - 20, height - 60), fill=(60, 60, 90))
+        return image
+
+
+def run(args):
+    session = DesktopSession(tuple(args.resolution), seed=args.seed)
+    preprocessor = ImagePreprocessor()
+    analyzer = IncrementalAnalyzer(tile_size=args.tile_size, max_changed_fraction=args.max_changed_fraction)
+    full_bytes, full_tokens, sent_bytes, sent_tokens, diff_times = 0, 0, 0, 0, []
+    changes = {change.value: 0 for change in FrameChange}
+
+    for _ in range(args.frames):
+        frame = session.next_frame()
+        full = preprocessor.prepare(frame, args.detail)
+        full_bytes += full.encoded_bytes
+        full_tokens += estimate_image_tokens((full.width, full.height), args.detail)
+
+        start = time.perf_counter()
+        plan = analyzer.plan(frame)
+        diff_times.append(time.perf_counter() - start)
+        changes[plan.change.value] += 1
+
+        if plan.change == FrameChange.FULL:
+            sent = full
+        elif plan.change == FrameChange.CROP:
+            sent = preprocessor.prepare(plan.image, args.detail)
+        else:
+            continue
+        sent_bytes += sent.encoded_bytes
+        sent_tokens += estimate_image_tokens((sent.width, sent.height), args.detail)
+        analyzer.commit(frame, "previous description", plan)
+
+    return {
+        "config": vars(args),
+        "changes": changes,
+        "full_upload": {"bytes": full_bytes, "image_tokens": full_tokens},
+        "incremental": {"bytes": sent_bytes, "image_tokens": sent_tokens},
+        "bytes_saved_fraction": 1 - sent_bytes / full_bytes if full_bytes else 0.0,
+        "tokens_saved_fraction": 1 - sent_tokens / full_tokens if full_tokens else 0.0,
+        "diff_ms": distribution(diff_times),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1920, 1080], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--detail", choices=["low", "high", "auto"], default="high")
+    parser.add_argument("--tile-size", type=int, default=64)
+    parser.add_argument("--max-changed-fraction", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,79 @@
+"""Cold-start import budget check.
+
+Starts fresh interpreters and times the imports main.py needs before its first
+capture, next to `import src` alone and to loading every subsystem. Exits with
+status 1 when the median first-capture import time exceeds the budget, so it
+can gate CI:
+
+    python -m benchmarks.bench_startup --runs 7 --budget-ms 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "import src": "import src",
+    "first capture path": (
+        "from src import FrameCache, ResponseCache, ScreenshotManager, CaptureRegion, "
+        "default_geometry_provider, AdaptiveScheduler, frame_signature, configure_metrics, "
+        "get_metrics, setup_logging, BudgetExceeded, GovernorLimits, configure_governor, "
+        "get_governor, IncrementalAnalyzer\n"
+        "import src.startup"
+    ),
+    "every subsystem": (
+        "import src.openai_vision, src.tts, src.overlay, src.pipeline, src.animation\n"
+        "import openai, pyttsx3"
+    ),
+}
+
+PROBE = """
+import time
+start = time.perf_counter()
+{body}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(body, runs):
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", PROBE.format(body=body)], cwd=REPO_ROOT, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        samples.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def run(runs, budget_ms):
+    report = {}
+    for name, body in SCENARIOS.items():
+        try:
+            samples = measure(body, runs)
+        except RuntimeError as e:
+            print(f"{name:<20} unavailable: {e}")
+            continue
+        report[name] = {"median_ms": statistics.median(samples), "min_ms": min(samples), "max_ms": max(samples)}
+        print(f"{name:<20} median {report[name]['median_ms']:7.1f} ms  "
+              f"(min {report[name]['min_ms']:.1f}, max {report[name]['max_ms']:.1f})")
+
+    first_capture = report["first capture path"]["median_ms"]
+    within_budget = first_capture <= budget_ms
+    print(json.dumps({"budget_ms": budget_ms, "within_budget": within_budget, "scenarios": report}))
+    if not within_budget:
+        print(f"FAIL: first-capture imports took {first_capture:.1f} ms, budget is {budget_ms:.1f} ms", file=sys.stderr)
+    return within_budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.runs, args.budget_ms) else 1)
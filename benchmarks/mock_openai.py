@@ -0,0 +1,156 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions after a configurable delay with a canned
+completion (streamed as server-sent events when the request asks for it), so the real client code paths can be timed without an API key.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DESCRIPTION = "A code editor full of TODO comments next to a browser with 40 open tabs."
+JOKE = "As Morgan Freeman would say, those tabs are not research, they are a cry for help."
+
+
+def completion_body(model, content):
+    """Build a chat completion response with a rough usage estimate."""
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": len(content) // 4, "total_tokens": 100 + len(content) // 4},
+    }
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.record_request(length)
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        time.sleep(self.server.latency)
+
+        if random.random() < self.server.error_rate:
+            self._send_json(random.choice((429, 503)), {"error": {"message": "Mock transient failure"}})
+            return
+
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps({"description": self.server.description, "joke": self.server.joke})
+        elif isinstance(request["messages"][0]["content"], list):
+            content = self.server.description
+        else:
+            content = self.server.joke
+        if request.get("stream"):
+            self._send_stream(request.get("model", "mock"), content)
+        else:
+            self._send_json(200, completion_body(request.get("model", "mock"), content))
+
+    def _send_stream(self, model, content):
+        """Send the content as server-sent chat.completion.chunk events, a few words at a time."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = content.split(" ")
+        for i in range(0, len(words), 3):
+            text = " ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else "")
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(self.server.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server that counts requests and accepted connections."""
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, token_delay=0.02, error_rate=0.0,
+                 description=DESCRIPTION, joke=JOKE):
+        super().__init__((host, port), MockOpenAIHandler)
+        self.description = description
+        self.joke = joke
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.requests = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def get_request(self):
+        conn = super().get_request()
+        with self._counter_lock:
+            self.connections += 1
+        return conn
+
+    def record_request(self, nbytes):
+        with self._counter_lock:
+            self.requests += 1
+            self.bytes_received += nbytes
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds to wait before each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/503")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"Mock OpenAI listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,80 @@
+"""Null pyttsx3 engine that records utterances instead of speaking them.
+
+Pass `engine_factory=lambda: NullEngine(...)` to AdvancedTextToSpeech. It fires
+the same callbacks as a real driver, takes as long as speaking at
+`words_per_minute` would (or no time at all when that is None), and writes
+silent WAV files of the matching length for save_to_file.
+"""
+import threading
+import wave
+
+
+class NullEngine:
+    def __init__(self, words_per_minute=None, sample_rate=22050):
+        self.words_per_minute = words_per_minute
+        self.sample_rate = sample_rate
+        self.spoken = []
+        self.saved = []
+        self._callbacks = {}
+        self._properties = {"rate": 200, "volume": 1.0, "voice": None, "voices": []}
+        self._pending = []
+        self._stopped = threading.Event()
+
+    def connect(self, topic, callback):
+        self._callbacks.setdefault(topic, []).append(callback)
+
+    def _notify(self, topic, *args):
+        for callback in self._callbacks.get(topic, []):
+            callback(*args)
+
+    def getProperty(self, name):
+        return self._properties.get(name)
+
+    def setProperty(self, name, value):
+        self._properties[name] = value
+
+    def _word_time(self):
+        if not self.words_per_minute:
+            return 0.0
+        return 60.0 / self.words_per_minute
+
+    def say(self, text, name=None):
+        self._pending.append(("say", text, name))
+
+    def save_to_file(self, text, filename, name=None):
+        self._pending.append(("save", text, filename))
+
+    def stop(self):
+        self._stopped.set()
+
+    def runAndWait(self):
+        pending, self._pending = self._pending, []
+        self._stopped.clear()
+        for kind, text, target in pending:
+            if kind == "save":
+                self._write_silence(text, target)
+                continue
+
+            self._notify("started-utterance", target)
+            location = 0
+            for word in text.split():
+                if self._stopped.is_set():
+                    break
+                self._notify("started-word", target, location, len(word))
+                location += len(word) + 1
+                delay = self._word_time()
+                if delay:
+                    self._stopped.wait(delay)
+            completed = not self._stopped.is_set()
+            self.spoken.append(text)
+            self._notify("finished-utterance", target, completed)
+
+    def _write_silence(self, text, filename):
+        seconds = len(text.split()) * (self._word_time() or 0.3)
+        frames = int(seconds * self.sample_rate)
+        with wave.open(filename, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b"\x00\x00" * frames)
+        self.saved.append(text)
@@ -1,82 +1,292 @@
-import schedule
 import time
+_PROCESS_START = time.perf_counter()
+
+import sys
+_import_timer = None
+if "--profile-startup" in sys.argv:
+    from src.startup import ImportTimer
+    _import_timer = ImportTimer().install()
+
+import argparse
 import random
 import os
-import threading
-import win32api
+# Only what the first capture needs is imported up front; the OpenAI SDK,
+# pyttsx3 and pygame are imported where they are used (and warmed up in the
+# background by start_background_imports).
 from src import (
-    take_screenshot_and_analyze,
-    AdvancedTextToSpeech,
-    SpeechConfig,
-    ImageRenderer,
-    WindowMode,
-    SpeechState
+    FrameCache,
+    ResponseCache,
+    ScreenshotManager,
+    CaptureRegion,
+    default_geometry_provider,
+    AdaptiveScheduler,
+    frame_signature,
+    configure_metrics,
+    get_metrics,
+    setup_logging,
+    BudgetExceeded,
+    GovernorLimits,
+    configure_governor,
+    get_governor,
+    IncrementalAnalyzer
 )
+from src.startup import profile_startup, start_background_imports
+
+frame_cache = FrameCache(threshold=4, max_entries=16, ttl=15 * 60)
+geometry = default_geometry_provider()
+# Created in main(), so no capture backend or cache database is opened at import time
+screenshot_manager = None
+response_cache = None
+_overlay_renderer = None
+_tts = None
+_fleet_agent = None
+incremental = None
+capture_worker = None
+
+def get_overlay():
+    """Return the long-lived overlay window, created on first use."""
+    global _overlay_renderer
+    if _overlay_renderer is None:
+        from src import OverlayRenderer
+        _overlay_renderer = OverlayRenderer()
+    return _overlay_renderer
+
+def get_tts():
+    """Return the long-lived speech engine, starting its worker thread on first use."""
+    global _tts
+    if _tts is None:
+        from src import AdvancedTextToSpeech, SpeechConfig
+        _tts = AdvancedTextToSpeech()
+        _tts.configure(SpeechConfig(rate=150, volume=0.8))
+    return _tts
+
+def show_overlay(ctx=None):
+    """Show the Morgan Freeman overlay at a random spot.
+
+    Returns:
+        The overlay renderer, or None if the overlay could not be shown
+    """
+    script_dir = os.path.dirname(__file__)
+    image_path = os.path.join(script_dir, "src", "Morgan-Freeman-PNG-Photo.png") 
+    overlay_renderer = get_overlay()
+    try:
+        width, height = overlay_renderer.preload(image_path)
+    except Exception as e:
+        print(f"Failed to load image: {e}")
+        return None
+    # Pop up on whichever monitor the user is looking at
+    monitor = geometry.active_monitor() if geometry is not None else None
+    if monitor is None:
+        position = (0, 0)
+    else:
+        x = random.randint(monitor.left, max(monitor.left, monitor.right - width))
+        y = random.randint(monitor.top, max(monitor.top, monitor.bottom - height))
+        position = (x, y)
+
+    try:
+        overlay_renderer.show(image_path, position)
+    except Exception as e:
+        print(f"Failed to show window: {e}")
+        return None
+
+    print(f"Window shown at position: {position} with size: ({width}, {height})")
+    return overlay_renderer
+
+def hide_overlay(overlay):
+    """Hide the overlay once speech has finished."""
+    time.sleep(0.5)
+    overlay.hide()
 
 def testingTask():
+    from src import take_screenshot_and_analyze
     try:
         time.sleep(3)
         print("=== ScrapyardNoVa Demo ===\n")
-        tts = AdvancedTextToSpeech()
-        tts.configure(SpeechConfig(rate=150, volume=0.8))
+        if get_governor().should_skip():
+            print("Daily budget spent, skipping this run.")
+            return
+        tts = get_tts()
 
         print("Taking a screenshot and analyzing...")
-        result, joke = take_screenshot_and_analyze("What can you see in this screenshot?", generate_joke=True)
+        if _fleet_agent is not None:
+            result, joke = _fleet_agent.roast()
+            joke_sentences = [joke]
+        else:
+            result, joke_sentences = take_screenshot_and_analyze(
+                "What can you see in this screenshot?",
+                generate_joke=True,
+                frame_cache=frame_cache,
+                response_cache=response_cache,
+                stream_joke=True,
+                screenshot_manager=screenshot_manager,
+                incremental=incremental,
+                capture_worker=capture_worker
+            )
 
         print(f"\nOpenAI Description:\n{result}\n")
-        print(f"\nOpenAI Joke:\n{joke}\n")
-
-        image_renderer = ImageRenderer()
-        script_dir = os.path.dirname(__file__)
-        image_path = os.path.join(script_dir, "src", "Morgan-Freeman-PNG-Photo.png") 
-        if not image_renderer.load_image(image_path):
-            print("Failed to load image.")
-            return
-        # TODO MAKE THIS WORK WITH ALL SCREEN SIZES?
-        screen_width, screen_height = win32api.GetSystemMetrics(0), win32api.GetSystemMetrics(1)
-        x = random.randint(0, screen_width - image_renderer.width) 
-        y = random.randint(0, screen_height - image_renderer.height)
-        position = (x, y)
 
-        if not image_renderer.create_window(position=position, mode=WindowMode.NOFRAME):
-            print("Failed to create window.")
+        overlay = show_overlay()
+        if overlay is None:
             return
 
-
-        print(f"Window created at position: {position} with size: ({image_renderer.width}, {image_renderer.height})")
-        
         print("Speaking the joke and showing image...")
-        render_thread = threading.Thread(
-            target=image_renderer.start_render_loop
-        )
-        render_thread.daemon = True 
-        render_thread.start()
+        spoken = []
+        for sentence in joke_sentences:
+            spoken.append(sentence)
+            tts.speak_async(sentence)
 
-        tts.speak_async(joke)
+        print(f"\nOpenAI Joke:\n{' '.join(spoken)}\n")
 
-        while tts.state == SpeechState.SPEAKING:
-            time.sleep(0.1)
+        tts.wait_until_idle()
 
-        time.sleep(0.5)
-        
-        image_renderer.close_window()
+        hide_overlay(overlay)
         
-        render_thread.join(timeout=0.5)
-        
-        print(f"Task completed at {time.strftime('%H:%M:%S')}. Next run in 1-2 minutes...")
+        print(f"Task completed at {time.strftime('%H:%M:%S')}. Next run when the screen changes (1-2 minutes)...")
+    except BudgetExceeded as e:
+        print(f"Skipping this run: {e}")
     except Exception as e:
         print(f"Error in task: {e}")
-schedule.every(1).to(2).minutes.do(testingTask)
+        raise
+
+def sample_signature():
+    """Change signature of the capture region; with a capture worker, read from shared memory instead of capturing."""
+    if capture_worker is not None:
+        rect = screenshot_manager.resolve()
+        return capture_worker.signature(rect.bbox if rect is not None else None)
+    return frame_signature(screenshot_manager.peek())
+
+def run_scheduler(min_interval=60, max_interval=120, sample_interval=2.0):
+    """Run testingTask when the screen changes, at most every min_interval and at least every max_interval seconds."""
+    scheduler = AdaptiveScheduler(
+        testingTask,
+        sample_signature,
+        sample_interval=sample_interval,
+        min_interval=min_interval,
+        max_interval=max_interval
+    )
+    scheduler.start()
+    try:
+        scheduler.join()
+    finally:
+        scheduler.stop()
+        print(f"Scheduler stats: {scheduler.metrics()}")
+
+def print_cycle(ctx):
+    print(f"\nOpenAI Description:\n{ctx.description}\n")
+    print(f"\nOpenAI Joke:\n{ctx.joke}\n")
+    print(f"Cycle {ctx.cycle} completed at {time.strftime('%H:%M:%S')} in {ctx.elapsed:.1f}s")
+
+def run_pipeline(max_cycles=None, interval=60):
+    """Run capture, analysis, speech and overlay as overlapping asyncio pipeline stages."""
+    import asyncio
+    from src import AdvancedTextToSpeech, AsyncPipeline, SpeechConfig, SpeechMode, build_roast_stages
+
+    tts = AdvancedTextToSpeech(mode=SpeechMode.PRERENDERED)
+    tts.configure(SpeechConfig(rate=150, volume=0.8))
+    stages = build_roast_stages(
+        tts,
+        show_overlay,
+        hide_overlay,
+        screenshot_manager=screenshot_manager,
+        frame_cache=frame_cache,
+        response_cache=response_cache,
+        incremental=incremental,
+        capture_worker=capture_worker
+    )
+    pipeline = AsyncPipeline(stages, interval=interval, max_cycles=max_cycles, on_complete=print_cycle)
+    asyncio.run(pipeline.run())
 
 def main():
+    parser = argparse.ArgumentParser(description="ScrapyardNoVa screen roaster")
+    parser.add_argument("--pipeline", action="store_true", help="Run the stages as an overlapping asyncio pipeline")
+    parser.add_argument("--cycles", type=int, default=None, help="Stop after this many pipeline cycles")
+    parser.add_argument("--interval", type=float, default=60, help="Minimum seconds between pipeline cycles")
+    parser.add_argument("--min-interval", type=float, default=60, help="Minimum seconds between scheduled runs")
+    parser.add_argument("--max-interval", type=float, default=120, help="Run at least this often even if the screen is unchanged")
+    parser.add_argument("--sample-interval", type=float, default=2.0, help="Seconds between cheap screen change samples")
+    parser.add_argument("--capture-backend", choices=["auto", "pil", "mss", "synthetic"], default=None,
+                        help="Screen capture backend (default: $SCRAPYARD_CAPTURE_BACKEND or auto)")
+    parser.add_argument("--capture-region", choices=[region.value for region in CaptureRegion if region != CaptureRegion.BBOX],
+                        default=CaptureRegion.ALL_SCREENS.value,
+                        help="Part of the desktop to capture: every screen, the active monitor, the focused window or around the cursor")
+    parser.add_argument("--capture-worker", action="store_true",
+                        help="Capture in a separate process that shares frames through a shared-memory ring buffer")
+    parser.add_argument("--metrics", action="store_true", help="Record per-stage spans, latency histograms and counters")
+    parser.add_argument("--metrics-jsonl", default=None, help="Append every span to this JSONL file (implies --metrics)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this local port (implies --metrics)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="When little changed, send only the changed region with the previous description")
+    parser.add_argument("--rpm", type=float, default=None, help="OpenAI requests per minute per model (default: $SCRAPYARD_RPM)")
+    parser.add_argument("--tpm", type=float, default=None, help="OpenAI tokens per minute per model (default: $SCRAPYARD_TPM)")
+    parser.add_argument("--daily-budget", type=float, default=None,
+                        help="USD to spend per day before degrading and skipping runs (default: $SCRAPYARD_DAILY_BUDGET)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Report per-module import times and the time to first capture, then exit")
+    parser.add_argument("--fleet-url", default=os.environ.get("SCRAPYARD_FLEET_URL"),
+                        help="Scheduler mode: send frames to this roast service instead of calling OpenAI directly "
+                             "(default: $SCRAPYARD_FLEET_URL)")
+    parser.add_argument("--fleet-token", default=os.environ.get("SCRAPYARD_FLEET_TOKEN"),
+                        help="Shared token for the roast service (default: $SCRAPYARD_FLEET_TOKEN)")
+    parser.add_argument("--log-file", default=None, help="Also append JSON log lines to this file")
+    parser.add_argument("--log-format", choices=["json", "text"], default="json", help="Console log format")
+    args = parser.parse_args()
+
+    setup_logging(path=args.log_file, console_format=args.log_format)
+
+    metrics = get_metrics()
+    if args.metrics or args.metrics_jsonl or args.metrics_port is not None or metrics.enabled:
+        configure_metrics(jsonl_path=args.metrics_jsonl, prometheus_port=args.metrics_port)
+
+    if args.rpm is not None or args.tpm is not None or args.daily_budget is not None:
+        limits = GovernorLimits.from_env()
+        limits.rpm = args.rpm if args.rpm is not None else limits.rpm
+        limits.tpm = args.tpm if args.tpm is not None else limits.tpm
+        limits.daily_budget = args.daily_budget if args.daily_budget is not None else limits.daily_budget
+        configure_governor(limits)
+
+    global screenshot_manager, response_cache, _fleet_agent, incremental, capture_worker
+    if args.incremental:
+        incremental = IncrementalAnalyzer()
+    backend = args.capture_backend
+    if args.capture_worker:
+        from src import CaptureWorker, SharedFrameBackend
+        # Analysis goes through capture_worker.encode(); the backend serves
+        # whatever still needs pixels here (incremental diffs, saved PNGs)
+        capture_worker = CaptureWorker(args.capture_backend, interval=min(args.sample_interval, 1.0))
+        backend = SharedFrameBackend(capture_worker)
+    screenshot_manager = ScreenshotManager(backend, region=CaptureRegion(args.capture_region), geometry=geometry)
+
+    if args.profile_startup:
+        profile_startup(_PROCESS_START, _import_timer, screenshot_manager.take)
+        screenshot_manager.backend.close()
+        return
+
+    response_cache = ResponseCache()
+
+    if args.fleet_url:
+        from src import RoastAgent
+        _fleet_agent = RoastAgent(args.fleet_url, screenshot_manager=screenshot_manager, token=args.fleet_token,
+                                  capture_worker=capture_worker)
+        print(f"Fleet mode: roasting through {args.fleet_url}")
+
+    start_background_imports()
     print("ScrapyardNoVa running. Press Ctrl+C to exit.")
     try:
-        testingTask()
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        if args.pipeline:
+            run_pipeline(args.cycles, args.interval)
+            return
+        run_scheduler(args.min_interval, args.max_interval, args.sample_interval)
     except KeyboardInterrupt:
         print("\nProgram terminated by user.")
+    finally:
+        if _overlay_renderer is not None:
+            _overlay_renderer.shutdown()
+        screenshot_manager.backend.close()
+        print(f"Spend: {get_governor().stats()}")
+        if metrics.enabled:
+            print(f"Metrics: {metrics.snapshot()}")
+            metrics.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,6 +2,8 @@
 
 import os
 
+from PyInstaller.utils.hooks import collect_submodules
+
 # Change the path to look for PNG files directly in the src directory
 image_source_dir = os.path.abspath("src")  # Get absolute path to src directory
 image_files = [(os.path.join(image_source_dir, f), "src") for f in os.listdir(image_source_dir) if f.endswith(".png")]
@@ -11,7 +13,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=image_files,
-    hiddenimports=[],
+    # src exports its API lazily via importlib, which the analysis cannot follow
+    hiddenimports=collect_submodules("src"),
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,38 +1,275 @@
-from .screenshot import ScreenshotManager, PathType
-from .openai_vision import (
-    ImageProcessingOpenAIModelTypes,
-    ImageProcessingInputDetail,
-    load_openai_client,
-    encode_image,
-    process_image_with_openai,
-    take_screenshot_and_analyze
-)
-from .tts import AdvancedTextToSpeech, SpeechConfig, SpeechState
-from .image_render import ImageRenderer, WindowMode
-from .resource_path import get_resource_path  # Add this line
+"""
+Public API of the package.
+
+Names are imported from their submodule on first access, so `import src` and
+`from src import ScreenshotManager` only pay for the subsystems actually used
+instead of loading pygame, pyttsx3 and the OpenAI SDK up front.
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+_SUBMODULE_EXPORTS = {
+    ".screenshot": ("ScreenshotManager", "PathType"),
+    ".capture": (
+        "CaptureBackend",
+        "CaptureBackendType",
+        "PILGrabBackend",
+        "MSSBackend",
+        "SyntheticBackend",
+        "create_capture_backend",
+    ),
+    ".geometry": (
+        "Rect",
+        "CaptureRegion",
+        "GeometryProvider",
+        "Win32GeometryProvider",
+        "FakeGeometryProvider",
+        "default_geometry_provider",
+        "resolve_region",
+    ),
+    ".capture_worker": ("CaptureWorker", "FrameRing", "SharedFrame", "EncodedFrame", "SharedFrameBackend", "FrameOverwritten"),
+    ".image_encoder": ("ImageEncoder", "ImageFormat"),
+    ".image_preprocess": ("ImagePreprocessor", "PreparedImage", "target_size_for_detail"),
+    ".incremental": ("IncrementalAnalyzer", "IncrementalPlan", "FrameChange", "changed_tiles"),
+    ".frame_cache": ("FrameCache", "FrameCacheEntry", "dhash", "hamming_distance"),
+    ".response_cache": ("ResponseCache",),
+    ".openai_vision": (
+        "ImageProcessingOpenAIModelTypes",
+        "ImageProcessingInputDetail",
+        "AnalysisMode",
+        "ClientSettings",
+        "OpenAIClientManager",
+        "get_client_manager",
+        "configure_openai_client",
+        "load_openai_client",
+        "encode_image",
+        "image_to_data_url",
+        "process_image_with_openai",
+        "generate_joke_from_description",
+        "stream_joke_from_description",
+        "SentenceSplitter",
+        "analyze_and_roast",
+        "take_screenshot_and_analyze",
+    ),
+    ".tts": ("AdvancedTextToSpeech", "SpeechConfig", "SpeechState", "SpeechMode", "SpeechPriority", "SpeechHandle", "UtteranceCache"),
+    ".image_render": ("ImageRenderer", "WindowMode", "RenderMode", "RenderStats"),
+    ".overlay": ("OverlayRenderer", "SurfaceCache"),
+    ".animation": ("SpriteAtlas", "FrameTrack", "amplitude_envelope", "lip_sync_frames", "speak_with_lip_sync"),
+    ".pipeline": ("AsyncPipeline", "PipelineStage", "CycleContext", "build_roast_stages"),
+    ".log": ("setup_logging", "shutdown_logging", "JsonFormatter"),
+    ".metrics": ("MetricsRegistry", "Histogram", "get_metrics", "configure_metrics"),
+    ".scheduler": ("AdaptiveScheduler", "frame_signature"),
+    ".batch": ("BatchAnalyzer", "BatchStats", "iter_image_paths"),
+    ".rate_limit": ("TokenBucket",),
+    ".governor": (
+        "SpendGovernor",
+        "GovernorLimits",
+        "CallPlan",
+        "BudgetExceeded",
+        "get_governor",
+        "configure_governor",
+        "estimate_image_tokens",
+    ),
+    ".fleet": ("RoastService", "RoastAgent", "FleetError"),
+    ".startup": ("ImportTimer", "start_background_imports", "profile_startup"),
+    ".resource_path": ("get_resource_path",),
+}
+
+_EXPORTS = {name: module for module, names in _SUBMODULE_EXPORTS.items() for name in names}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+if TYPE_CHECKING:
+    from .screenshot import ScreenshotManager, PathType
+    from .capture import CaptureBackend, CaptureBackendType, PILGrabBackend, MSSBackend, SyntheticBackend, create_capture_backend
+    from .geometry import Rect, CaptureRegion, GeometryProvider, Win32GeometryProvider, FakeGeometryProvider, default_geometry_provider, resolve_region
+    from .capture_worker import CaptureWorker, FrameRing, SharedFrame, EncodedFrame, SharedFrameBackend, FrameOverwritten
+    from .image_encoder import ImageEncoder, ImageFormat
+    from .image_preprocess import ImagePreprocessor, PreparedImage, target_size_for_detail
+    from .incremental import IncrementalAnalyzer, IncrementalPlan, FrameChange, changed_tiles
+    from .frame_cache import FrameCache, FrameCacheEntry, dhash, hamming_distance
+    from .response_cache import ResponseCache
+    from .openai_vision import (
+        ImageProcessingOpenAIModelTypes,
+        ImageProcessingInputDetail,
+        AnalysisMode,
+        ClientSettings,
+        OpenAIClientManager,
+        get_client_manager,
+        configure_openai_client,
+        load_openai_client,
+        encode_image,
+        image_to_data_url,
+        process_image_with_openai,
+        generate_joke_from_description,
+        stream_joke_from_description,
+        SentenceSplitter,
+        analyze_and_roast,
+        take_screenshot_and_analyze
+    )
+    from .tts import AdvancedTextToSpeech, SpeechConfig, SpeechState, SpeechMode, SpeechPriority, SpeechHandle, UtteranceCache
+    from .image_render import ImageRenderer, WindowMode, RenderMode, RenderStats
+    from .overlay import OverlayRenderer, SurfaceCache
+    from .animation import SpriteAtlas, FrameTrack, amplitude_envelope, lip_sync_frames, speak_with_lip_sync
+    from .log import setup_logging, shutdown_logging, JsonFormatter
+    from .metrics import MetricsRegistry, Histogram, get_metrics, configure_metrics
+    from .scheduler import AdaptiveScheduler, frame_signature
+    from .batch import BatchAnalyzer, BatchStats, iter_image_paths
+    from .rate_limit import TokenBucket
+    from .governor import SpendGovernor, GovernorLimits, CallPlan, BudgetExceeded, get_governor, configure_governor, estimate_image_tokens
+    from .fleet import RoastService, RoastAgent, FleetError
+    from .startup import ImportTimer, start_background_imports, profile_startup
+    from .pipeline import AsyncPipeline, PipelineStage, CycleContext, build_roast_stages
+    from .resource_path import get_resource_path
 
 __all__ = [
     # Screenshot related
     "ScreenshotManager", 
     "PathType",
+    "CaptureBackend",
+    "CaptureBackendType",
+    "PILGrabBackend",
+    "MSSBackend",
+    "SyntheticBackend",
+    "create_capture_backend",
+    "Rect",
+    "CaptureRegion",
+    "GeometryProvider",
+    "Win32GeometryProvider",
+    "FakeGeometryProvider",
+    "default_geometry_provider",
+    "resolve_region",
+
+    # Image encoding related
+    "ImageEncoder",
+    "ImageFormat",
+    "ImagePreprocessor",
+    "PreparedImage",
+    "target_size_for_detail",
     
+    # Frame dedup related
+    "FrameCache",
+    "FrameCacheEntry",
+    "dhash",
+    "hamming_distance",
+
+    # Capture worker related
+    "CaptureWorker",
+    "FrameRing",
+    "SharedFrame",
+    "EncodedFrame",
+    "SharedFrameBackend",
+    "FrameOverwritten",
+
+    # Incremental analysis related
+    "IncrementalAnalyzer",
+    "IncrementalPlan",
+    "FrameChange",
+    "changed_tiles",
+
+    # Response cache related
+    "ResponseCache",
+
     # OpenAI vision related
     "ImageProcessingOpenAIModelTypes",
     "ImageProcessingInputDetail",
+    "AnalysisMode",
+    "ClientSettings",
+    "OpenAIClientManager",
+    "get_client_manager",
+    "configure_openai_client",
     "load_openai_client",
     "encode_image",
+    "image_to_data_url",
     "process_image_with_openai",
+    "generate_joke_from_description",
+    "stream_joke_from_description",
+    "SentenceSplitter",
+    "analyze_and_roast",
     "take_screenshot_and_analyze",
     
     # Text-to-speech related
     "AdvancedTextToSpeech",
     "SpeechConfig",
     "SpeechState",
+    "SpeechMode",
+    "SpeechPriority",
+    "SpeechHandle",
+    "UtteranceCache",
 
     # Image rendering related
     "ImageRenderer",
     "WindowMode",
+    "RenderMode",
+    "RenderStats",
+    "OverlayRenderer",
+    "SurfaceCache",
+
+    # Animation related
+    "SpriteAtlas",
+    "FrameTrack",
+    "amplitude_envelope",
+    "lip_sync_frames",
+    "speak_with_lip_sync",
     
+    # Pipeline related
+    "AsyncPipeline",
+    "PipelineStage",
+    "CycleContext",
+    "build_roast_stages",
+
+    # Logging related
+    "setup_logging",
+    "shutdown_logging",
+    "JsonFormatter",
+
+    # Metrics related
+    "MetricsRegistry",
+    "Histogram",
+    "get_metrics",
+    "configure_metrics",
+
+    # Scheduling related
+    "AdaptiveScheduler",
+    "frame_signature",
+
+    # Batch analysis related
+    "BatchAnalyzer",
+    "BatchStats",
+    "iter_image_paths",
+
+    # Spend governor related
+    "SpendGovernor",
+    "GovernorLimits",
+    "CallPlan",
+    "BudgetExceeded",
+    "get_governor",
+    "configure_governor",
+    "estimate_image_tokens",
+
+    # Fleet mode related
+    "RoastService",
+    "RoastAgent",
+    "FleetError",
+    "TokenBucket",
+
+    # Startup related
+    "ImportTimer",
+    "start_background_imports",
+    "profile_startup",
+
     # Resource path helper
     "get_resource_path"  # Add this line
 ]
\ No newline at end of file
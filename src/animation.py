@@ -0,0 +1,198 @@
+import io
+import logging
+import math
+import time
+import wave
+from array import array
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import pygame
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpriteAtlas:
+    """
+    A grid of equally sized animation frames stored in one image.
+
+    Frames are numbered left to right, top to bottom. Rects are computed once
+    from the atlas size, so the render loop only has to pick a rect and blit.
+    """
+    image_path: str
+    frame_width: int
+    frame_height: int
+    frame_count: Optional[int] = None
+    frame_rects: List[pygame.Rect] = field(default_factory=list)
+
+    def layout(self, atlas_size: Tuple[int, int]) -> List[pygame.Rect]:
+        """
+        Compute the frame rects for an atlas of the given size.
+
+        Args:
+            atlas_size: (width, height) of the loaded atlas surface
+
+        Returns:
+            The frame rects, also stored on `frame_rects`
+
+        Raises:
+            ValueError: If the atlas does not hold the requested frames
+        """
+        columns = atlas_size[0] // self.frame_width
+        rows = atlas_size[1] // self.frame_height
+        available = columns * rows
+        count = self.frame_count if self.frame_count is not None else available
+        if count < 1 or count > available:
+            raise ValueError(f"Atlas {self.image_path} holds {available} frames, {count} requested")
+
+        self.frame_rects = [
+            pygame.Rect((i % columns) * self.frame_width, (i // columns) * self.frame_height,
+                        self.frame_width, self.frame_height)
+            for i in range(count)
+        ]
+        return self.frame_rects
+
+    @property
+    def frame_size(self) -> Tuple[int, int]:
+        return self.frame_width, self.frame_height
+
+
+def amplitude_envelope(wav_bytes: bytes, fps: int = 60) -> List[float]:
+    """
+    RMS loudness of WAV audio per animation frame, normalized to 0..1.
+
+    Args:
+        wav_bytes: Contents of a PCM WAV file (8, 16 or 32 bit)
+        fps: Animation frames per second of audio
+
+    Returns:
+        One level per frame of audio
+    """
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = array("B", raw)
+        offset = 128
+    elif width == 2:
+        samples = array("h", raw)
+        offset = 0
+    elif width == 4:
+        samples = array("i", raw)
+        offset = 0
+    else:
+        raise ValueError(f"Unsupported sample width: {width} bytes")
+
+    # Only the first channel is needed to drive a mouth
+    samples = samples[::channels]
+    window = max(1, rate // fps)
+
+    levels = []
+    for start in range(0, len(samples), window):
+        chunk = samples[start:start + window]
+        total = 0
+        for sample in chunk:
+            value = sample - offset
+            total += value * value
+        levels.append(math.sqrt(total / len(chunk)))
+
+    peak = max(levels, default=0.0)
+    if peak == 0:
+        return [0.0] * len(levels)
+    return [level / peak for level in levels]
+
+
+def lip_sync_frames(envelope: Sequence[float],
+                    mouth_frames: Sequence[int],
+                    silence: float = 0.08,
+                    smoothing: float = 0.5) -> List[int]:
+    """
+    Map an amplitude envelope onto atlas frame indices.
+
+    Args:
+        envelope: Levels from amplitude_envelope
+        mouth_frames: Atlas frames from closed to fully open mouth
+        silence: Levels below this show the first (closed) frame
+        smoothing: Exponential smoothing factor (0 = none) to avoid flicker
+
+    Returns:
+        One atlas frame index per envelope entry
+    """
+    if not mouth_frames:
+        raise ValueError("At least one mouth frame is required")
+
+    open_frames = len(mouth_frames) - 1
+    frames = []
+    level = 0.0
+    for value in envelope:
+        level = smoothing * level + (1 - smoothing) * value
+        if level < silence or open_frames == 0:
+            frames.append(mouth_frames[0])
+        else:
+            step = min(open_frames, 1 + int((level - silence) / (1 - silence) * open_frames))
+            frames.append(mouth_frames[step])
+    return frames
+
+
+class FrameTrack:
+    """
+    Precomputed frame schedule played back against the wall clock.
+
+    The frame shown is chosen from the time elapsed since `start`, so a late
+    tick skips ahead instead of drifting out of sync with the audio.
+    """
+
+    def __init__(self, frames: Sequence[int], fps: int = 60, rest_frame: Optional[int] = None):
+        self.frames = list(frames)
+        self.fps = fps
+        self.rest_frame = rest_frame if rest_frame is not None else (self.frames[0] if self.frames else 0)
+        self.started: Optional[float] = None
+
+    def start(self, at: Optional[float] = None) -> None:
+        self.started = time.perf_counter() if at is None else at
+
+    def frame_at(self, now: float) -> Optional[int]:
+        """Atlas frame for a point in time, or None once the track has finished."""
+        if self.started is None:
+            return self.rest_frame
+        index = int((now - self.started) * self.fps)
+        if index >= len(self.frames):
+            return None
+        return self.frames[max(0, index)]
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) / self.fps
+
+
+def speak_with_lip_sync(tts, overlay, atlas: SpriteAtlas, text: str, position: Tuple[int, int],
+                        mouth_frames: Sequence[int], fps: int = 60) -> None:
+    """
+    Speak text while the overlay animates the atlas in time with the audio.
+
+    The speech is synthesized first so the whole mouth track can be computed
+    before playback; nothing is decoded or scaled while the animation runs.
+
+    Args:
+        tts: AdvancedTextToSpeech in PRERENDERED mode
+        overlay: Started OverlayRenderer
+        atlas: Sprite atlas holding the mouth frames
+        text: Text to speak
+        position: Overlay position on screen
+        mouth_frames: Atlas frames from closed to fully open mouth
+        fps: Animation frame rate
+    """
+    audio = tts.synthesize(text)
+    track = FrameTrack(lip_sync_frames(amplitude_envelope(audio, fps), mouth_frames), fps)
+    logger.info(f"Lip sync track: {len(track.frames)} frames, {track.duration:.2f}s")
+
+    handle = tts.speak_async(text)
+    overlay.play_animation(atlas, track, position, started_at=lambda: handle.started)
+    try:
+        handle.wait()
+    finally:
+        overlay.stop_animation()
@@ -0,0 +1,336 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+from PIL import Image
+
+from .image_preprocess import ImagePreprocessor, PreparedImage
+from .log import setup_logging
+from .metrics import Histogram, get_metrics
+from .openai_vision import (
+    ImageProcessingInputDetail,
+    ImageProcessingOpenAIModelTypes,
+    generate_joke_from_description,
+    load_openai_client,
+    process_image_with_openai,
+)
+from .response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+# Preprocessor of each worker process, created once by _init_worker.
+_worker_preprocessor: Optional[ImagePreprocessor] = None
+
+
+def iter_image_paths(source: str, recursive: bool = True) -> Iterator[str]:
+    """
+    Stream image paths from a directory or a manifest file.
+
+    A manifest lists one path per line, either plain or as a JSON object with a
+    "path" field (e.g. a previous results file). Relative paths are resolved
+    against the manifest's directory. Blank lines and lines starting with "#"
+    are skipped.
+    """
+    if os.path.isdir(source):
+        if recursive:
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(source, name)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            yield path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Paths already analyzed successfully according to an existing results file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as results:
+        for line in results:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a truncated last line behind.
+                continue
+            if "error" not in record:
+                done.add(record["path"])
+    return done
+
+
+def _init_worker(target_bytes: int) -> None:
+    global _worker_preprocessor
+    _worker_preprocessor = ImagePreprocessor(target_bytes=target_bytes)
+
+
+def _prepare_file(path: str, detail: str) -> PreparedImage:
+    """Load and preprocess one image; runs in a worker process."""
+    with Image.open(path) as image:
+        return _worker_preprocessor.prepare(image.convert("RGB"), detail)
+
+
+@dataclass
+class BatchStats:
+    """Throughput and per-item latency of a batch run.
+
+    `latency` runs from when a pool thread picks an item up to when it
+    finishes; the time spent queued for a thread before that is in `queue_wait`.
+    """
+    processed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    latency: Histogram = field(default_factory=Histogram)
+    queue_wait: Histogram = field(default_factory=Histogram)
+
+    @property
+    def items_per_second(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'elapsed_s': self.elapsed,
+            'items_per_sec': self.items_per_second,
+            'p50_ms': self.latency.percentile(0.50) * 1000,
+            'p95_ms': self.latency.percentile(0.95) * 1000,
+            'max_ms': (self.latency.max or 0.0) * 1000,
+            'queue_wait_p50_ms': self.queue_wait.percentile(0.50) * 1000,
+            'queue_wait_p95_ms': self.queue_wait.percentile(0.95) * 1000,
+        }
+
+
+class BatchAnalyzer:
+    """
+    Describe (and optionally roast) archives of screenshots offline.
+
+    Images are decoded, downscaled and compressed in a process pool, while a
+    bounded thread pool makes the API calls. Only a limited number of items is
+    in flight at once, so a directory of any size is streamed rather than
+    loaded up front. Each result is appended to a JSONL file as soon as it
+    finishes; that file is also the checkpoint, so rerunning after a crash
+    skips everything already written and retries the failures.
+    """
+
+    def __init__(self,
+                 prompt: str = "Describe this image",
+                 model_type: ImageProcessingOpenAIModelTypes = ImageProcessingOpenAIModelTypes.GPT_4_O,
+                 detail: ImageProcessingInputDetail = ImageProcessingInputDetail.LOW,
+                 generate_joke: bool = True,
+                 concurrency: int = 8,
+                 processes: Optional[int] = None,
+                 target_bytes: int = 300 * 1024,
+                 response_cache: Optional[ResponseCache] = None,
+                 client=None):
+        """
+        Args:
+            prompt: Vision prompt sent with every image
+            model_type: Model used for both calls
+            detail: Vision detail level the images are prepared for
+            generate_joke: Also generate a roast from each description
+            concurrency: Maximum number of items being sent to the API at once
+            processes: Preprocessing worker processes (CPU count by default)
+            target_bytes: Upper bound for each encoded upload
+            response_cache: Persistent cache passed to both API calls
+            client: OpenAI client; the shared one by default
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.prompt = prompt
+        self.model_type = model_type
+        self.detail = detail
+        self.generate_joke = generate_joke
+        self.concurrency = concurrency
+        self.processes = processes
+        self.target_bytes = target_bytes
+        self.response_cache = response_cache
+        self.client = client
+
+    def _analyze(self, path: str, prepared: Future, timing: Dict[str, float]) -> Dict:
+        """
+        Wait for the preprocessed image and run the API calls; runs on a pool thread.
+
+        Stores when the item was picked up and finished in `timing`, whether or not it fails.
+        """
+        start = timing['started'] = time.perf_counter()
+        try:
+            return self._analyze_item(path, prepared, start)
+        finally:
+            timing['finished'] = time.perf_counter()
+
+    def _analyze_item(self, path: str, prepared: Future, start: float) -> Dict:
+        image = prepared.result()
+        preprocess_done = time.perf_counter()
+
+        client = self.client or load_openai_client()
+        completion = process_image_with_openai(
+            client,
+            image,
+            self.prompt,
+            model_type=self.model_type,
+            detail=self.detail,
+            cache=self.response_cache,
+        )
+        record = {
+            'path': path,
+            'description': completion.choices[0].message.content,
+        }
+        if self.generate_joke:
+            record['joke'] = generate_joke_from_description(client, record['description'], self.model_type, cache=self.response_cache)
+        record['preprocess_wait_ms'] = (preprocess_done - start) * 1000
+        record['api_ms'] = (time.perf_counter() - preprocess_done) * 1000
+        return record
+
+    def run(self, paths: Iterable[str], output_path: str, resume: bool = True, limit: Optional[int] = None) -> BatchStats:
+        """
+        Analyze `paths` and append one JSON line per image to `output_path`.
+
+        Args:
+            paths: Image paths, consumed lazily
+            output_path: Results file, doubling as the checkpoint
+            resume: Skip paths already recorded successfully in `output_path`
+            limit: Stop after submitting this many new items
+
+        Returns:
+            Throughput and latency stats
+        """
+        done = load_checkpoint(output_path) if resume else set()
+        if done:
+            logger.info(f"Resuming: {len(done)} items already in {output_path}")
+
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        stats = BatchStats()
+        max_in_flight = self.concurrency * 2
+        pending: Dict[Future, tuple] = {}
+        submitted = 0
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker, initargs=(self.target_bytes,)) as preprocess_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-api") as api_pool, \
+                open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+
+            def write(finished):
+                for future in finished:
+                    path, submitted_at, timing = pending.pop(future)
+                    elapsed = timing['finished'] - timing['started']
+                    queue_wait = timing['started'] - submitted_at
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        logger.warning(f"Failed to analyze {path}: {e}")
+                        record = {'path': path, 'error': f"{type(e).__name__}: {e}"}
+                        stats.failed += 1
+                    else:
+                        stats.processed += 1
+                        stats.latency.record(elapsed)
+                        stats.queue_wait.record(queue_wait)
+                        registry.observe("batch_item", elapsed)
+                    record['latency_ms'] = elapsed * 1000
+                    record['queue_wait_ms'] = queue_wait * 1000
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+
+            for path in paths:
+                if path in done:
+                    stats.skipped += 1
+                    continue
+                if limit is not None and submitted >= limit:
+                    break
+                prepared = preprocess_pool.submit(_prepare_file, path, self.detail.value)
+                timing = {}
+                submitted_at = time.perf_counter()
+                future = api_pool.submit(self._analyze, path, prepared, timing)
+                pending[future] = (path, submitted_at, timing)
+                submitted += 1
+
+                if len(pending) >= max_in_flight:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                else:
+                    finished = [f for f in pending if f.done()]
+                write(finished)
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished)
+
+        stats.elapsed = time.perf_counter() - start
+        summary = stats.summary()
+        logger.info(
+            f"Batch finished: {stats.processed} ok, {stats.failed} failed, {stats.skipped} skipped "
+            f"in {stats.elapsed:.1f}s ({summary['items_per_sec']:.2f} items/s, "
+            f"p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, "
+            f"queue wait p95 {summary['queue_wait_p95_ms']:.0f} ms)"
+        )
+        return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Describe and roast a directory or manifest of screenshots.")
+    parser.add_argument("source", help="Directory of images or a manifest file with one path per line")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="Results JSONL file, also used as the checkpoint")
+    parser.add_argument("--prompt", default="Describe this image")
+    parser.add_argument("--model", choices=[m.value for m in ImageProcessingOpenAIModelTypes],
+                        default=ImageProcessingOpenAIModelTypes.GPT_4_O.value)
+    parser.add_argument("--detail", choices=[d.value for d in ImageProcessingInputDetail],
+                        default=ImageProcessingInputDetail.LOW.value)
+    parser.add_argument("--no-joke", action="store_true", help="Only describe the images")
+    parser.add_argument("--concurrency", type=int, default=8, help="Items sent to the API at once")
+    parser.add_argument("--processes", type=int, default=None, help="Preprocessing worker processes")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many new items")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming from it")
+    parser.add_argument("--no-recursive", action="store_true", help="Only read the top level of a directory")
+    parser.add_argument("--response-cache", action="store_true", help="Answer repeated requests from the response cache")
+    parser.add_argument("--log-file", default=None, help="Also append JSON log lines to this file")
+    parser.add_argument("--log-format", choices=["json", "text"], default="json", help="Console log format")
+    args = parser.parse_args(argv)
+
+    setup_logging(path=args.log_file, console_format=args.log_format)
+
+    analyzer = BatchAnalyzer(
+        prompt=args.prompt,
+        model_type=ImageProcessingOpenAIModelTypes(args.model),
+        detail=ImageProcessingInputDetail(args.detail),
+        generate_joke=not args.no_joke,
+        concurrency=args.concurrency,
+        processes=args.processes,
+        response_cache=ResponseCache(enabled=True) if args.response_cache else None,
+    )
+    stats = analyzer.run(
+        iter_image_paths(args.source, recursive=not args.no_recursive),
+        args.output,
+        resume=not args.no_resume,
+        limit=args.limit,
+    )
+    print(json.dumps(stats.summary()))
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import glob
+import logging
+import os
+import threading
+from enum import Enum
+from typing import List, Optional, Sequence, Tuple, Union
+
+from PIL import Image, ImageDraw, ImageGrab
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_BACKEND_ENV = "SCRAPYARD_CAPTURE_BACKEND"
+
+BBox = Tuple[int, int, int, int]
+
+
+class CaptureBackendType(Enum):
+    AUTO = "auto"
+    PIL = "pil"
+    MSS = "mss"
+    SYNTHETIC = "synthetic"
+
+
+class CaptureBackend:
+    """
+    Source of screen frames for ScreenshotManager.
+
+    Backends return RGB images. `bbox` is (left, top, right, bottom) in virtual
+    desktop coordinates; None captures every screen.
+    """
+    name = "base"
+
+    def grab(self, bbox: Optional[BBox] = None) -> Image.Image:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class PILGrabBackend(CaptureBackend):
+    """PIL ImageGrab, the original capture path."""
+    name = "pil"
+
+    def grab(self, bbox: Optional[BBox] = None) -> Image.Image:
+        image = ImageGrab.grab(bbox=bbox, all_screens=True)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
+
+
+class MSSBackend(CaptureBackend):
+    """
+    Shared-memory grabber backed by `mss` (XShm on X11, BitBlt into a reused
+    DIB section on Windows, CoreGraphics on macOS).
+
+    The raw BGRA buffer is handed to PIL's raw decoder, which drops the
+    padding byte while building the RGB image, so there is no intermediate
+    RGBA frame. mss handles are not thread-safe, so each thread gets its own.
+
+    Raises:
+        ImportError: If mss is not installed
+    """
+    name = "mss"
+
+    def __init__(self):
+        import mss
+
+        self._mss = mss
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    def _handle(self):
+        handle = getattr(self._local, "handle", None)
+        if handle is None:
+            handle = self._mss.mss()
+            self._local.handle = handle
+            with self._lock:
+                self._handles.append(handle)
+        return handle
+
+    def grab(self, bbox: Optional[BBox] = None) -> Image.Image:
+        handle = self._handle()
+        if bbox is None:
+            # Monitor 0 is the bounding box of every screen
+            region = handle.monitors[0]
+        else:
+            left, top, right, bottom = bbox
+            region = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+        shot = handle.grab(region)
+        return Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX", 0, 1)
+
+    def close(self) -> None:
+        with self._lock:
+            for handle in self._handles:
+                handle.close()
+            self._handles.clear()
+        self._local = threading.local()
+
+
+class SyntheticBackend(CaptureBackend):
+    """
+    Frames from image files or generated patterns, for headless runs and
+    benchmarks.
+
+    All frames are decoded or generated up front and returned in a cycle. The
+    returned images are shared between calls and must be treated as read-only.
+    """
+    name = "synthetic"
+
+    PATTERNS = ("gradient", "bars", "noise", "solid")
+
+    def __init__(self,
+                 source: Union[None, str, Sequence[str]] = None,
+                 size: Tuple[int, int] = (1920, 1080),
+                 pattern: str = "gradient",
+                 frames: int = 4):
+        """
+        Args:
+            source: An image file, a directory or glob of images, or a list of
+                paths. When None, frames are generated from `pattern`.
+            size: Size of generated frames
+            pattern: One of PATTERNS
+            frames: Number of distinct generated frames to cycle through
+        """
+        self.size = size
+        self._frames = self._load(source) if source is not None else self._generate(size, pattern, frames)
+        if not self._frames:
+            raise ValueError(f"No frames found for synthetic capture source {source!r}")
+        self._index = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(source: Union[str, Sequence[str]]) -> List[Image.Image]:
+        if isinstance(source, str):
+            if os.path.isdir(source):
+                paths = sorted(glob.glob(os.path.join(source, "*")))
+            else:
+                paths = sorted(glob.glob(source))
+        else:
+            paths = list(source)
+
+        frames = []
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            with Image.open(path) as image:
+                frames.append(image.convert('RGB'))
+        logger.info(f"Loaded {len(frames)} synthetic frames from {source}")
+        return frames
+
+    @classmethod
+    def _generate(cls, size: Tuple[int, int], pattern: str, count: int) -> List[Image.Image]:
+        if pattern not in cls.PATTERNS:
+            raise ValueError(f"Unknown synthetic pattern {pattern!r}, expected one of {cls.PATTERNS}")
+
+        width, height = size
+        frames = []
+        for i in range(max(1, count)):
+            if pattern == "gradient":
+                ramp = Image.linear_gradient("L").resize(size)
+                shift = Image.linear_gradient("L").rotate(90).resize(size)
+                frame = Image.merge("RGB", (ramp, shift, ramp.point(lambda v, i=i: (v + 64 * i) % 256)))
+            elif pattern == "bars":
+                frame = Image.new("RGB", size)
+                draw = ImageDraw.Draw(frame)
+                bar = max(1, width // 8)
+                for b in range(8):
+                    colour = ((b * 32 + i * 40) % 256, (b * 64) % 256, (255 - b * 32) % 256)
+                    draw.rectangle([b * bar, 0, (b + 1) * bar, height], fill=colour)
+            elif pattern == "noise":
+                frame = Image.effect_noise(size, 64 + 16 * i).convert("RGB")
+            else:
+                frame = Image.new("RGB", size, ((i * 60) % 256, 128, 200))
+            frames.append(frame)
+        return frames
+
+    def grab(self, bbox: Optional[BBox] = None) -> Image.Image:
+        with self._lock:
+            frame = self._frames[self._index]
+            self._index = (self._index + 1) % len(self._frames)
+        if bbox is not None:
+            return frame.crop(bbox)
+        return frame
+
+
+def create_capture_backend(backend: Union[None, str, CaptureBackendType] = None, **kwargs) -> CaptureBackend:
+    """
+    Build a capture backend by name.
+
+    Args:
+        backend: Backend type or its name. Defaults to the
+            SCRAPYARD_CAPTURE_BACKEND environment variable, then AUTO, which
+            prefers mss and falls back to PIL when it is not installed.
+        **kwargs: Passed to the backend constructor (SyntheticBackend options)
+
+    Returns:
+        The capture backend
+    """
+    if backend is None:
+        backend = os.environ.get(CAPTURE_BACKEND_ENV, CaptureBackendType.AUTO.value)
+    backend = CaptureBackendType(backend)
+
+    if backend == CaptureBackendType.AUTO:
+        try:
+            return MSSBackend()
+        except ImportError:
+            logger.info("mss is not installed, using PIL ImageGrab for capture")
+            return PILGrabBackend()
+    if backend == CaptureBackendType.MSS:
+        return MSSBackend()
+    if backend == CaptureBackendType.SYNTHETIC:
+        return SyntheticBackend(**kwargs)
+    return PILGrabBackend()
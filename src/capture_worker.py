@@ -0,0 +1,562 @@
+import logging
+import multiprocessing
+import pickle
+import struct
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from .capture import BBox, CaptureBackend, CaptureBackendType, create_capture_backend
+from .frame_cache import dhash
+from .geometry import Rect, default_geometry_provider
+from .image_encoder import ImageFormat
+from .image_preprocess import ImagePreprocessor, PreparedImage
+from .scheduler import frame_signature
+
+logger = logging.getLogger(__name__)
+
+# Shared memory layout: a 64 byte ring header followed by `slots` slots, each
+# a 64 byte slot header and `capacity` bytes of RGBX pixels. RGBX is PIL's
+# in-memory layout for RGB, which is what lets readers map a slot as an image
+# without copying it.
+_MAGIC = b"SCRF"
+_LAYOUT_VERSION = 1
+_RING_HEADER = struct.Struct("<4sIIIQ")    # magic, layout version, slots, capacity, latest sequence
+_SLOT_HEADER = struct.Struct("<QQdiiiiI")  # version, sequence, timestamp, left, top, width, height, nbytes
+_VERSION = struct.Struct("<Q")
+_HEADER_SIZE = 64
+_BYTES_PER_PIXEL = 4
+# Rows copied into a slot at a time; bounds the writer's scratch memory
+_BAND_ROWS = 64
+
+
+class FrameOverwritten(Exception):
+    """The slot a SharedFrame points at was reused for a newer frame."""
+
+
+@dataclass(eq=False)
+class SharedFrame:
+    """
+    A frame living in a FrameRing slot.
+
+    `image` is an RGBX view straight onto shared memory; it stays correct
+    only until the writer wraps around the ring and reuses the slot, which
+    `valid()` detects. Use `copy()` for a frame that must outlive that.
+    """
+    ring: "FrameRing"
+    slot: int
+    version: int
+    seq: int
+    timestamp: float
+    rect: Rect
+    image: Optional[Image.Image]
+    _buffer: Optional[memoryview] = field(default=None, repr=False)
+
+    def valid(self) -> bool:
+        return self.ring._slot_version(self.slot) == self.version
+
+    def copy(self, bbox: Optional[BBox] = None) -> Image.Image:
+        """
+        Copy the frame, or a (left, top, right, bottom) part of it in frame pixels, into an RGB image.
+
+        Raises:
+            FrameOverwritten: The slot was reused while copying
+        """
+        image = self.image.crop(bbox) if bbox is not None else self.image
+        copied = image.convert("RGB")
+        if not self.valid():
+            raise FrameOverwritten(f"Frame {self.seq} was overwritten")
+        return copied
+
+    def release(self) -> None:
+        """Drop the view onto shared memory so the ring can be closed."""
+        self.image = None
+        if self._buffer is not None:
+            try:
+                self._buffer.release()
+            except BufferError:
+                # The image is still referenced elsewhere; it is released with it
+                return
+            self._buffer = None
+
+
+@dataclass
+class EncodedFrame:
+    """A frame, or a box of it, downscaled and compressed by the capture worker."""
+    seq: int
+    timestamp: float
+    rect: Rect
+    image: PreparedImage
+    fingerprint: Optional[int] = None
+
+
+class FrameRing:
+    """
+    Fixed-size ring of raw frames in shared memory.
+
+    One process writes, any number read. Every slot carries a seqlock
+    version: the writer makes it odd while it fills the slot and even again
+    once the slot is consistent, so readers can tell a torn or reused slot
+    from a good one without any cross-process lock. Writes copy the frame
+    into its slot band by band, so beyond a few hundred KB of scratch no
+    frame-sized buffer is allocated per frame.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        magic, layout, slots, capacity, _ = _RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or layout != _LAYOUT_VERSION:
+            raise ValueError(f"Shared memory {shm.name} does not hold a frame ring")
+        self.shm = shm
+        self.slots = slots
+        self.capacity = capacity
+        self._owner = owner
+        self._closed = False
+        self._frames = weakref.WeakSet()
+        self._seq = self.latest_seq()
+
+    @classmethod
+    def create(cls, slots: int, max_size: Tuple[int, int]) -> "FrameRing":
+        """Allocate a ring able to hold `slots` frames of up to `max_size` pixels."""
+        if slots < 2:
+            raise ValueError("A frame ring needs at least two slots")
+        capacity = max_size[0] * max_size[1] * _BYTES_PER_PIXEL
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + slots * (_HEADER_SIZE + capacity))
+        _RING_HEADER.pack_into(shm.buf, 0, _MAGIC, _LAYOUT_VERSION, slots, capacity, 0)
+        logger.info(f"Allocated {slots} x {max_size[0]}x{max_size[1]} frame ring ({shm.size / 1e6:.1f} MB) as {shm.name}")
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _offset(self, slot: int) -> int:
+        return _HEADER_SIZE + slot * (_HEADER_SIZE + self.capacity)
+
+    def _slot_version(self, slot: int) -> int:
+        return _VERSION.unpack_from(self.shm.buf, self._offset(slot))[0]
+
+    def latest_seq(self) -> int:
+        """Sequence number of the newest complete frame, 0 before the first."""
+        return _RING_HEADER.unpack_from(self.shm.buf, 0)[4]
+
+    def fits(self, size: Tuple[int, int]) -> bool:
+        return size[0] * size[1] * _BYTES_PER_PIXEL <= self.capacity
+
+    def _copy_into(self, slot: int, image: Image.Image) -> None:
+        """Copy an RGB image into a slot as RGBX rows through a writable slice of the segment."""
+        width, height = image.size
+        row = width * _BYTES_PER_PIXEL
+        start = self._offset(slot) + _HEADER_SIZE
+        pixels = self.shm.buf[start:start + row * height]
+        try:
+            for top in range(0, height, _BAND_ROWS):
+                bottom = min(height, top + _BAND_ROWS)
+                pixels[top * row:bottom * row] = image.crop((0, top, width, bottom)).tobytes("raw", "RGBX")
+        finally:
+            pixels.release()
+
+    def write(self, image: Image.Image, rect: Rect, timestamp: Optional[float] = None) -> int:
+        """
+        Store a frame in the next slot.
+
+        Args:
+            image: RGB frame; must fit the ring's capacity
+            rect: Where the frame lies in virtual desktop coordinates
+            timestamp: Capture time (time.time()), now by default
+
+        Returns:
+            The frame's sequence number
+        """
+        if not self.fits(image.size):
+            raise ValueError(f"Frame {image.size} does not fit a slot of {self.capacity} bytes")
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        seq = self._seq + 1
+        slot = seq % self.slots
+        offset = self._offset(slot)
+        version = self._slot_version(slot)
+        if version % 2:
+            # A previous writer died mid-write
+            version += 1
+
+        buf = self.shm.buf
+        _VERSION.pack_into(buf, offset, version + 1)
+        self._copy_into(slot, image)
+        width, height = image.size
+        _SLOT_HEADER.pack_into(buf, offset, version + 1, seq, timestamp or time.time(),
+                               rect.left, rect.top, width, height, width * height * _BYTES_PER_PIXEL)
+        _VERSION.pack_into(buf, offset, version + 2)
+        struct.pack_into("<Q", buf, _RING_HEADER.size - 8, seq)
+        self._seq = seq
+        return seq
+
+    def read(self, seq: Optional[int] = None) -> Optional[SharedFrame]:
+        """
+        Map a frame without copying it.
+
+        Args:
+            seq: Sequence number to read; the newest frame by default
+
+        Returns:
+            The frame, or None if there is none yet or it has been overwritten
+        """
+        seq = self.latest_seq() if seq is None else seq
+        if seq <= 0:
+            return None
+        slot = seq % self.slots
+        offset = self._offset(slot)
+        buf = self.shm.buf
+        for _ in range(3):
+            version, slot_seq, timestamp, left, top, width, height, nbytes = _SLOT_HEADER.unpack_from(buf, offset)
+            if version % 2:
+                time.sleep(0)
+                continue
+            if slot_seq != seq:
+                return None
+            if nbytes != width * height * _BYTES_PER_PIXEL or nbytes > self.capacity:
+                continue
+            start = offset + _HEADER_SIZE
+            pixels = buf[start:start + nbytes]
+            image = Image.frombuffer("RGBX", (width, height), pixels, "raw", "RGBX", 0, 1)
+            if self._slot_version(slot) != version:
+                image = None
+                pixels.release()
+                continue
+            frame = SharedFrame(self, slot, version, seq, timestamp, Rect.from_size(left, top, width, height), image, pixels)
+            self._frames.add(frame)
+            return frame
+        return None
+
+    def close(self) -> None:
+        """Release every frame still mapped, detach and, for the creating process, remove the segment."""
+        if self._closed:
+            return
+        self._closed = True
+        for frame in list(self._frames):
+            frame.release()
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning(f"Frame ring {self.name} still has images referenced; the mapping stays until they are dropped")
+        finally:
+            if self._owner:
+                self.shm.unlink()
+
+
+def _run_worker(ring_name: str,
+                backend: Optional[str],
+                backend_options: Dict,
+                interval: float,
+                connection,
+                stop) -> None:
+    """Capture loop of the worker process; also answers encode requests between captures."""
+    ring = FrameRing.attach(ring_name)
+    capture = create_capture_backend(backend, **backend_options)
+    geometry = default_geometry_provider()
+    preprocessors: Dict[Tuple, ImagePreprocessor] = {}
+    next_capture = 0.0
+    try:
+        while not stop.is_set():
+            # A due capture goes first so a steady stream of encode requests cannot starve it
+            wait = next_capture - time.monotonic()
+            if wait > 0 and connection.poll(wait):
+                request_id, seq, bbox, detail, settings, hash_size = connection.recv()
+                try:
+                    if settings not in preprocessors:
+                        image_format, target_bytes, max_quality, min_quality = settings
+                        preprocessors[settings] = ImagePreprocessor(ImageFormat(image_format), target_bytes, max_quality, min_quality)
+                    reply = (request_id, _encode_frame(ring, seq, bbox, detail, preprocessors[settings], hash_size), None)
+                except Exception as e:
+                    reply = (request_id, None, e)
+                try:
+                    connection.send(reply)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    # The exception itself could not be pickled; send its description instead
+                    connection.send((request_id, None, RuntimeError(f"{type(reply[2]).__name__}: {reply[2]}")))
+                continue
+
+            next_capture = time.monotonic() + interval
+            try:
+                image = capture.grab()
+            except Exception as e:
+                # e.g. OSError("screen grab failed") while the workstation is locked;
+                # skip this cycle and try again on the next one
+                logger.warning(f"Screen capture failed: {e}")
+                continue
+            if not ring.fits(image.size):
+                logger.warning(f"Captured frame {image.size} does not fit the ring, skipping it")
+                continue
+            origin = geometry.virtual_screen() if geometry is not None else Rect(0, 0, *image.size)
+            ring.write(image, Rect.from_size(origin.left, origin.top, *image.size))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        capture.close()
+        ring.close()
+
+
+def _encode_frame(ring: FrameRing,
+                  seq: Optional[int],
+                  bbox: Optional[BBox],
+                  detail: str,
+                  preprocessor: ImagePreprocessor,
+                  hash_size: Optional[int]) -> EncodedFrame:
+    """Prepare a ring frame in the worker. Only this process writes, so the slot cannot change underneath."""
+    frame = ring.read(seq)
+    if frame is None:
+        raise FrameOverwritten(f"Frame {seq} is no longer in the ring" if seq else "No frame captured yet")
+    try:
+        image, rect = frame.image, frame.rect
+        if bbox is not None:
+            rect = Rect(*bbox).intersect(frame.rect)
+            if rect.empty:
+                raise ValueError(f"{bbox} lies outside the captured desktop {frame.rect.bbox}")
+            image = image.crop((rect.left - frame.rect.left, rect.top - frame.rect.top,
+                                rect.right - frame.rect.left, rect.bottom - frame.rect.top))
+        fingerprint = dhash(image, hash_size) if hash_size else None
+        prepared = preprocessor.prepare(image, detail)
+        return EncodedFrame(frame.seq, frame.timestamp, rect, prepared, fingerprint)
+    finally:
+        image = None
+        frame.release()
+
+
+class CaptureWorker:
+    """
+    Capture (and encode on request) in a separate process.
+
+    The worker grabs every screen every `interval` seconds and writes the
+    frames into a shared-memory FrameRing, so capture and RGB conversion
+    never hold this interpreter's GIL while the render loop or speech
+    callbacks need it. `encode` has the worker crop, fingerprint, downscale
+    and compress a frame, so only the upload-ready bytes cross the process
+    boundary; readers that need pixels can map a frame without copying it.
+    """
+
+    def __init__(self,
+                 backend: Union[None, str, CaptureBackendType] = None,
+                 backend_options: Optional[Dict] = None,
+                 interval: float = 0.5,
+                 slots: int = 4,
+                 max_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            backend: Capture backend type or name used by the worker
+            backend_options: Passed to create_capture_backend in the worker
+            interval: Seconds between captures
+            slots: Frames kept in the ring; readers must finish with a mapped
+                frame before `slots` newer ones have been captured
+            max_size: Largest frame the ring can hold; the virtual screen size by default
+        """
+        self.backend = backend.value if isinstance(backend, CaptureBackendType) else backend
+        self.backend_options = backend_options or {}
+        self.interval = interval
+        self.slots = slots
+        self.max_size = max_size
+        self.ring: Optional[FrameRing] = None
+        self._process = None
+        self._connection = None
+        self._stop = None
+        self._lock = threading.Lock()
+        self._request_id = 0
+
+    def _detect_max_size(self) -> Tuple[int, int]:
+        geometry = default_geometry_provider()
+        if geometry is not None:
+            return geometry.virtual_screen().size
+        probe = create_capture_backend(self.backend, **self.backend_options)
+        try:
+            return probe.grab().size
+        finally:
+            probe.close()
+
+    def start(self) -> "CaptureWorker":
+        if self._process is not None:
+            return self
+        self.ring = FrameRing.create(self.slots, self.max_size or self._detect_max_size())
+        self._spawn()
+        return self
+
+    def _spawn(self) -> None:
+        # spawn on every platform: forking a process with pygame, audio and
+        # logging threads running is not safe
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=_run_worker,
+            args=(self.ring.name, self.backend, self.backend_options, self.interval, child_connection, self._stop),
+            name="capture-worker",
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        logger.info(f"Capture worker started (pid {self._process.pid})")
+
+    def _ensure_alive(self) -> None:
+        """Restart the worker process on the same ring if it has died."""
+        if self._process is None:
+            raise RuntimeError("Capture worker is not running")
+        if self._process.is_alive():
+            return
+        logger.warning(f"Capture worker exited with code {self._process.exitcode}, restarting it")
+        self._connection.close()
+        self._spawn()
+
+    def latest(self) -> Optional[SharedFrame]:
+        """The newest frame, mapped without copying, or None before the first capture."""
+        return self.ring.read()
+
+    def wait_for_frame(self, after_seq: int = 0, timeout: Optional[float] = None) -> Optional[SharedFrame]:
+        """
+        Wait for a frame newer than `after_seq`.
+
+        Returns:
+            The frame, or None on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll = min(0.01, self.interval / 10)
+        while True:
+            if self.ring.latest_seq() > after_seq:
+                frame = self.ring.read()
+                if frame is not None:
+                    return frame
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            if not self._process.is_alive():
+                raise RuntimeError(f"Capture worker exited with code {self._process.exitcode}")
+            time.sleep(poll)
+
+    def encode(self,
+               frame: Union[None, SharedFrame, int] = None,
+               detail: str = "auto",
+               preprocessor: Optional[ImagePreprocessor] = None,
+               bbox: Optional[BBox] = None,
+               hash_size: Optional[int] = None,
+               timeout: float = 10.0) -> EncodedFrame:
+        """
+        Have the worker downscale and compress a frame for upload.
+
+        Args:
+            frame: A SharedFrame or its sequence number; the newest frame by default
+            detail: Vision detail level to prepare for
+            preprocessor: Settings (format, byte target, quality range) to encode
+                with; a default ImagePreprocessor's by default
+            bbox: Only encode this (left, top, right, bottom) box of the desktop
+            hash_size: Also return the box's difference hash at this size (see FrameCache)
+
+        Raises:
+            FrameOverwritten: The frame left the ring before it was encoded
+            ValueError: bbox lies outside the captured desktop
+            TimeoutError: The worker did not answer in time
+            RuntimeError: The worker is not running, or exited while encoding
+
+        Any other error raised while encoding in the worker is re-raised as is.
+        """
+        with self._lock:
+            self._ensure_alive()
+        seq = frame.seq if isinstance(frame, SharedFrame) else frame
+        if seq is None and self.ring.latest_seq() == 0:
+            first = self.wait_for_frame(timeout=timeout)
+            if first is None:
+                raise TimeoutError(f"Capture worker produced no frame within {timeout}s")
+            first.release()
+        preprocessor = preprocessor or ImagePreprocessor()
+        settings = (preprocessor.encoder.image_format.value, preprocessor.target_bytes,
+                    preprocessor.max_quality, preprocessor.min_quality)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._ensure_alive()
+            self._request_id += 1
+            request_id = self._request_id
+            try:
+                self._connection.send((request_id, seq, bbox, detail, settings, hash_size))
+                while True:
+                    if not self._connection.poll(max(0.0, deadline - time.monotonic())):
+                        raise TimeoutError(f"Capture worker did not encode frame {seq} within {timeout}s")
+                    reply_id, encoded, error = self._connection.recv()
+                    # Late replies to requests that already timed out are discarded
+                    if reply_id == request_id:
+                        break
+            except (EOFError, BrokenPipeError) as e:
+                raise RuntimeError(f"Capture worker exited with code {self._process.exitcode}") from e
+        if error is not None:
+            raise error
+        return encoded
+
+    def signature(self, bbox: Optional[BBox] = None, hash_size: int = 8) -> Optional[int]:
+        """
+        frame_signature of the newest frame, or a box of it, for AdaptiveScheduler sampling.
+
+        The frame is reduced straight from shared memory, so only the small
+        thumbnail is allocated here. None before the first capture.
+        """
+        frame = self.latest()
+        if frame is None:
+            return None
+        try:
+            box = None
+            if bbox is not None:
+                area = Rect(*bbox).intersect(frame.rect)
+                box = (area.left - frame.rect.left, area.top - frame.rect.top,
+                       area.right - frame.rect.left, area.bottom - frame.rect.top)
+            return frame_signature(frame.image, hash_size, box)
+        finally:
+            frame.release()
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+        self._process = None
+        self.ring.close()
+        logger.info("Capture worker stopped")
+
+
+class SharedFrameBackend(CaptureBackend):
+    """
+    CaptureBackend reading the newest frame of a CaptureWorker.
+
+    Lets ScreenshotManager (and everything built on it) run on top of the
+    worker: `grab` copies the requested box out of shared memory instead of
+    capturing in this process.
+    """
+    name = "worker"
+
+    def __init__(self, worker: CaptureWorker, timeout: float = 5.0):
+        self.worker = worker.start()
+        self.timeout = timeout
+
+    def grab(self, bbox: Optional[BBox] = None) -> Image.Image:
+        for _ in range(3):
+            frame = self.worker.latest() or self.worker.wait_for_frame(timeout=self.timeout)
+            if frame is None:
+                raise TimeoutError("Capture worker produced no frame")
+            try:
+                local = None
+                if bbox is not None:
+                    area = Rect(*bbox).intersect(frame.rect)
+                    local = (area.left - frame.rect.left, area.top - frame.rect.top,
+                             area.right - frame.rect.left, area.bottom - frame.rect.top)
+                return frame.copy(local)
+            except FrameOverwritten:
+                continue
+            finally:
+                frame.release()
+        raise FrameOverwritten("The capture worker kept overwriting frames before they could be copied")
+
+    def close(self) -> None:
+        self.worker.stop()
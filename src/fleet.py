@@ -0,0 +1,544 @@
+import argparse
+import hmac
+import http.client
+import io
+import ipaddress
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from .frame_cache import FrameCache
+from .governor import BudgetExceeded, get_governor
+from .image_preprocess import ImagePreprocessor, PreparedImage
+from .log import setup_logging
+from .metrics import get_metrics
+from .openai_vision import (
+    AnalysisMode,
+    ImageProcessingInputDetail,
+    ImageProcessingOpenAIModelTypes,
+    analyze_and_roast,
+    generate_joke_from_description,
+    load_openai_client,
+    process_image_with_openai,
+)
+from .rate_limit import TokenBucket
+from .response_cache import ResponseCache, digest
+from .screenshot import ScreenshotManager
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+FLEET_URL_ENV = "SCRAPYARD_FLEET_URL"
+FLEET_TOKEN_ENV = "SCRAPYARD_FLEET_TOKEN"
+DEFAULT_PORT = 8642
+
+_FRAME_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+}
+
+
+class FleetError(Exception):
+    """A roast request the service refused or could not complete."""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _FleetHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many agents may connect at once; the default backlog of 5 drops connections
+    request_queue_size = 256
+
+
+class RoastService:
+    """
+    Central roast service shared by many desktop agents.
+
+    Agents upload compressed frames; the service owns the API key and the one
+    pooled OpenAI client, and answers with a description and a joke. Requests
+    are answered in this order:
+
+    1. Byte-identical frames already being analyzed wait for that result
+       instead of starting another one (common when many desktops show the
+       same screen).
+    2. Perceptually identical frames are answered from the shared FrameCache.
+    3. Everything else waits for the global token bucket, then goes upstream
+       through the ResponseCache. A request that would wait longer than
+       `rate_limit_timeout` is refused with 429 and a Retry-After.
+
+    Every endpoint requires `Authorization: Bearer <token>` with the shared
+    fleet token, checked before the request body is read.
+    """
+
+    def __init__(self,
+                 prompt: str = "What can you see in this screenshot?",
+                 model_type: ImageProcessingOpenAIModelTypes = ImageProcessingOpenAIModelTypes.GPT_4_O,
+                 mode: AnalysisMode = AnalysisMode.TWO_PASS,
+                 frame_cache: Optional[FrameCache] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 rate_limit_timeout: float = 10.0,
+                 max_frame_bytes: int = 8 * 1024 * 1024,
+                 token: Optional[str] = None,
+                 client=None):
+        """
+        Args:
+            prompt: Vision prompt sent with every frame
+            model_type: Model used for both calls
+            mode: Two requests per frame or one combined request
+            frame_cache: Near-duplicate cache shared by all agents
+            response_cache: Persistent cache passed to the API calls
+            rate_limiter: Global limit on upstream requests per second, or None for no limit
+            rate_limit_timeout: Longest a request may queue for the rate limiter
+            max_frame_bytes: Largest accepted upload
+            token: Shared bearer token agents must send; defaults to $SCRAPYARD_FLEET_TOKEN
+            client: OpenAI client; the shared pooled one by default
+        """
+        self.prompt = prompt
+        self.model_type = model_type
+        self.mode = mode
+        self.frame_cache = frame_cache if frame_cache is not None else FrameCache(threshold=4, max_entries=256, ttl=15 * 60)
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.rate_limit_timeout = rate_limit_timeout
+        self.max_frame_bytes = max_frame_bytes
+        self.token = token or os.environ.get(FLEET_TOKEN_ENV)
+        self.client = client
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._server: Optional[_FleetHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'coalesced': 0,
+            'frame_cache_hits': 0,
+            'upstream': 0,
+            'rate_limited': 0,
+            'budget_exceeded': 0,
+            'unauthorized': 0,
+            'errors': 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+        registry.inc(f"fleet_{name}")
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['inflight'] = len(self._inflight)
+        stats['governor'] = get_governor().stats()
+        return stats
+
+    def roast(self, data: bytes, detail: ImageProcessingInputDetail = ImageProcessingInputDetail.LOW) -> Dict:
+        """
+        Describe and roast one uploaded frame.
+
+        Args:
+            data: Encoded JPEG, PNG or WebP frame
+            detail: Vision detail level the frame was prepared for
+
+        Returns:
+            A dict with "description", "joke" and "source" (upstream, frame_cache or coalesced)
+
+        Raises:
+            FleetError: The frame was rejected, rate limited or the upstream call failed
+        """
+        self._count('requests')
+        if len(data) > self.max_frame_bytes:
+            raise FleetError(413, f"Frame of {len(data)} bytes exceeds {self.max_frame_bytes}")
+
+        key = digest(data)
+        with self._inflight_lock:
+            leader = self._inflight.get(key)
+            if leader is None:
+                future = self._inflight[key] = Future()
+        if leader is not None:
+            self._count('coalesced')
+            return dict(leader.result(), source="coalesced")
+
+        try:
+            result = self._roast_frame(data, detail)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _roast_frame(self, data: bytes, detail: ImageProcessingInputDetail) -> Dict:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                mime_type = _FRAME_MIME_TYPES.get(image.format)
+                if mime_type is None:
+                    raise FleetError(415, f"Unsupported frame format {image.format}")
+                frame = image.convert("RGB")
+        except FleetError:
+            raise
+        except Exception as e:
+            raise FleetError(400, f"Could not decode frame: {e}")
+
+        with registry.span("fleet_fingerprint"):
+            frame_hash = self.frame_cache.fingerprint(frame)
+            cached = self.frame_cache.lookup(frame_hash)
+        if cached is not None and cached.joke is not None:
+            self._count('frame_cache_hits')
+            return {'description': cached.description, 'joke': cached.joke, 'source': "frame_cache"}
+
+        requests = 1 if self.mode == AnalysisMode.COMBINED else 2
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(requests, timeout=self.rate_limit_timeout):
+            self._count('rate_limited')
+            raise FleetError(429, "Upstream rate limit reached", retry_after=self.rate_limiter.retry_after(requests))
+
+        # Agents already downscaled and compressed the frame, so it is sent as is.
+        prepared = PreparedImage(
+            data=data,
+            mime_type=mime_type,
+            width=frame.width,
+            height=frame.height,
+            source_width=frame.width,
+            source_height=frame.height,
+            quality=None,
+            encode_time=0.0,
+        )
+        self._count('upstream')
+        client = self.client or load_openai_client()
+        try:
+            with registry.span("fleet_upstream", mode=self.mode.value):
+                if self.mode == AnalysisMode.COMBINED:
+                    description, joke = analyze_and_roast(
+                        client, prepared, self.prompt, model_type=self.model_type, detail=detail, cache=self.response_cache
+                    )
+                else:
+                    completion = process_image_with_openai(
+                        client, prepared, self.prompt, model_type=self.model_type, detail=detail, cache=self.response_cache
+                    )
+                    description = completion.choices[0].message.content
+                    joke = generate_joke_from_description(client, description, self.model_type, cache=self.response_cache)
+        except BudgetExceeded as e:
+            self._count('budget_exceeded')
+            raise FleetError(503, f"Spend governor refused the request: {e}")
+        except Exception as e:
+            self._count('errors')
+            logger.warning(f"Upstream analysis failed: {e}")
+            raise FleetError(502, f"Upstream analysis failed: {e}")
+
+        self.frame_cache.store(frame_hash, description, joke)
+        return {'description': description, 'joke': joke, 'source': "upstream"}
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=()):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _authorized(self):
+                scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+                if scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), service.token.encode()):
+                    return True
+                service._count('unauthorized')
+                # The body, if any, is left unread, so the connection cannot be reused
+                self.close_connection = True
+                self._send_json(401, {'error': "Missing or invalid fleet token"}, [("WWW-Authenticate", "Bearer")])
+                return False
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                path = urlsplit(self.path).path
+                if path == "/healthz":
+                    self._send_json(200, service.stats())
+                elif path == "/metrics":
+                    payload = registry.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                else:
+                    self._send_json(404, {'error': f"Unknown path {path}"})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                url = urlsplit(self.path)
+                # Anything refused before the body is read closes the connection,
+                # since the unread body would otherwise be parsed as the next request
+                if url.path != "/v1/roast":
+                    self.close_connection = True
+                    self._send_json(404, {'error': f"Unknown path {url.path}"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    self.close_connection = True
+                    self._send_json(400, {'error': "Invalid Content-Length"})
+                    return
+                if length > service.max_frame_bytes:
+                    service._count('requests')
+                    self.close_connection = True
+                    self._send_json(413, {'error': f"Frame of {length} bytes exceeds {service.max_frame_bytes}"})
+                    return
+                data = self.rfile.read(length)
+
+                start = time.perf_counter()
+                try:
+                    detail = ImageProcessingInputDetail(parse_qs(url.query).get("detail", ["low"])[0])
+                    result = service.roast(data, detail)
+                except ValueError as e:
+                    self._send_json(400, {'error': str(e)})
+                except FleetError as e:
+                    headers = [("Retry-After", f"{e.retry_after:.1f}")] if e.retry_after is not None else []
+                    self._send_json(e.status, {'error': str(e)}, headers)
+                else:
+                    elapsed = time.perf_counter() - start
+                    registry.observe("fleet_request", elapsed, source=result['source'])
+                    logger.debug(f"Roasted frame from {self.headers.get('X-Agent-Id', 'unknown')} "
+                                 f"({result['source']}) in {elapsed * 1000:.0f} ms")
+                    self._send_json(200, dict(result, server_ms=elapsed * 1000))
+
+        return Handler
+
+    def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> "RoastService":
+        """
+        Serve the roast endpoint from a background thread.
+
+        Raises:
+            ValueError: No fleet token is configured
+        """
+        if not self.token:
+            raise ValueError(f"The roast service needs a shared token; pass one or set ${FLEET_TOKEN_ENV}")
+        self._server = _FleetHTTPServer((host, port), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fleet-service", daemon=True)
+        self._thread.start()
+        logger.info(f"Roast service listening on {self.url}")
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class RoastAgent:
+    """
+    Thin desktop client of a RoastService.
+
+    Captures and compresses frames locally and uploads them over one
+    keep-alive connection; it needs neither an API key nor the OpenAI SDK.
+    Rate-limited requests are retried after the service's Retry-After.
+    The fleet token is only sent over HTTPS, or over plain HTTP to a
+    loopback address.
+    """
+
+    def __init__(self,
+                 service_url: Optional[str] = None,
+                 screenshot_manager: Optional[ScreenshotManager] = None,
+                 preprocessor: Optional[ImagePreprocessor] = None,
+                 detail: ImageProcessingInputDetail = ImageProcessingInputDetail.LOW,
+                 agent_id: Optional[str] = None,
+                 token: Optional[str] = None,
+                 capture_worker=None,
+                 timeout: float = 60.0,
+                 max_retries: int = 3):
+        """
+        Args:
+            service_url: Base URL of the service; defaults to $SCRAPYARD_FLEET_URL.
+                Must be https:// unless the service is on this machine
+            screenshot_manager: Capture source for `roast`
+            preprocessor: Downscales and compresses frames before upload
+            detail: Vision detail level frames are prepared for
+            agent_id: Sent with every request for the service's logs
+            token: Shared fleet token; defaults to $SCRAPYARD_FLEET_TOKEN
+            capture_worker: Running CaptureWorker that crops and compresses
+                frames out of process for `roast`
+            timeout: Socket timeout per request
+            max_retries: Retries after 429 or a dropped connection
+
+        Raises:
+            ValueError: No URL or token, or a plain http:// URL to another host
+        """
+        service_url = service_url or os.environ.get(FLEET_URL_ENV)
+        if not service_url:
+            raise ValueError(f"No roast service URL given and ${FLEET_URL_ENV} is not set")
+        url = urlsplit(service_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"Roast service URL must be http:// or https://, got {service_url!r}")
+        if url.scheme == "http" and not _is_loopback(url.hostname):
+            raise ValueError(f"Refusing to send the fleet token to {url.hostname} over plain HTTP; use https://")
+        self.https = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port or (443 if self.https else DEFAULT_PORT)
+        self.screenshot_manager = screenshot_manager
+        self.capture_worker = capture_worker
+        self.preprocessor = preprocessor or ImagePreprocessor()
+        self.detail = detail
+        self.agent_id = agent_id or uuid.uuid4().hex[:8]
+        self.token = token or os.environ.get(FLEET_TOKEN_ENV)
+        if not self.token:
+            raise ValueError(f"No fleet token given and ${FLEET_TOKEN_ENV} is not set")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._connection: Optional[http.client.HTTPConnection] = None
+        self._lock = threading.Lock()
+
+    def _post(self, body: bytes, content_type: str) -> Tuple[int, Dict, Optional[str]]:
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+        self._connection.request(
+            "POST",
+            f"/v1/roast?detail={self.detail.value}",
+            body=body,
+            headers={
+                "Content-Type": content_type,
+                "X-Agent-Id": self.agent_id,
+                "Authorization": f"Bearer {self.token}",
+            },
+        )
+        response = self._connection.getresponse()
+        payload = json.loads(response.read() or b"{}")
+        return response.status, payload, response.getheader("Retry-After")
+
+    def submit(self, frame) -> Tuple[str, str]:
+        """
+        Upload a frame and return its description and joke.
+
+        Args:
+            frame: A PIL image, or a PreparedImage that is already compressed
+
+        Raises:
+            FleetError: The service refused the frame or kept rate limiting it
+        """
+        prepared = frame if isinstance(frame, PreparedImage) else self.preprocessor.prepare(frame, self.detail.value)
+        registry.inc("fleet_upload_bytes", prepared.encoded_bytes)
+
+        with self._lock, registry.span("fleet_submit"):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    status, payload, retry_after = self._post(prepared.data, prepared.mime_type)
+                except (http.client.HTTPException, ConnectionError) as e:
+                    # The service may have closed an idle keep-alive connection
+                    self.close()
+                    if attempt == self.max_retries:
+                        raise FleetError(503, f"Roast service unreachable: {e}")
+                    continue
+
+                if status == 200:
+                    return payload['description'], payload['joke']
+                if status == 429 and attempt < self.max_retries:
+                    delay = float(retry_after or 1.0)
+                    logger.info(f"Roast service is rate limiting, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                raise FleetError(status, payload.get('error', f"HTTP {status}"),
+                                 float(retry_after) if retry_after else None)
+
+    def roast(self) -> Tuple[str, str]:
+        """Capture the screen and have the service describe and roast it."""
+        manager = self.screenshot_manager or ScreenshotManager()
+        with registry.span("capture"):
+            if self.capture_worker is not None:
+                rect = manager.resolve()
+                frame = self.capture_worker.encode(detail=self.detail.value, preprocessor=self.preprocessor,
+                                                   bbox=rect.bbox if rect is not None else None).image
+            else:
+                frame = manager.take()
+        return self.submit(frame)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Central roast service for fleet mode.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Interface to listen on; use 0.0.0.0 to accept agents from other machines, "
+                             "behind a TLS-terminating proxy (agents only send the token to remote hosts over HTTPS)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", choices=[m.value for m in ImageProcessingOpenAIModelTypes],
+                        default=ImageProcessingOpenAIModelTypes.GPT_4_O.value)
+    parser.add_argument("--mode", choices=[m.value for m in AnalysisMode], default=AnalysisMode.TWO_PASS.value)
+    parser.add_argument("--rate", type=float, default=None, help="Global upstream requests per second")
+    parser.add_argument("--burst", type=float, default=None, help="Upstream requests allowed in a burst")
+    parser.add_argument("--response-cache", action="store_true", help="Answer repeated requests from the response cache")
+    parser.add_argument("--token", default=os.environ.get(FLEET_TOKEN_ENV),
+                        help=f"Shared bearer token agents must send (default: ${FLEET_TOKEN_ENV})")
+    parser.add_argument("--log-file", default=None, help="Also append JSON log lines to this file")
+    parser.add_argument("--log-format", choices=["json", "text"], default="json", help="Console log format")
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error(f"a shared token is required: pass --token or set ${FLEET_TOKEN_ENV}")
+
+    setup_logging(path=args.log_file, console_format=args.log_format)
+
+    service = RoastService(
+        model_type=ImageProcessingOpenAIModelTypes(args.model),
+        mode=AnalysisMode(args.mode),
+        response_cache=ResponseCache(enabled=True) if args.response_cache else None,
+        rate_limiter=TokenBucket(args.rate, args.burst) if args.rate else None,
+        token=args.token,
+    )
+    service.start(args.host, args.port)
+    try:
+        service._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
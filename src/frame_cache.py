@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Compute a difference hash of an image.
+
+    The frame is shrunk to a (hash_size + 1) x hash_size grayscale thumbnail and
+    each bit records whether a pixel is brighter than its right-hand neighbour,
+    so small rendering noise leaves the hash unchanged.
+
+    Args:
+        image: Frame to fingerprint
+        hash_size: Number of rows and bits per row
+
+    Returns:
+        The hash as an integer of hash_size * hash_size bits
+    """
+    thumbnail = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0)
+    pixels = thumbnail.tobytes()
+    row_width = hash_size + 1
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * row_width
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+@dataclass
+class FrameCacheEntry:
+    """Analysis results stored for a frame fingerprint."""
+    description: str
+    joke: Optional[str] = None
+    created: float = field(default_factory=time.monotonic)
+
+
+class FrameCache:
+    """
+    LRU/TTL cache of analysis results keyed on perceptual frame hashes.
+
+    A lookup matches any stored frame whose hash is within `threshold` bits of
+    the new one, so an idle screen reuses the previous description and joke
+    instead of paying for another vision call.
+    """
+
+    def __init__(self, threshold: int = 4, max_entries: int = 32, ttl: Optional[float] = 600.0, hash_size: int = 8):
+        """
+        Args:
+            threshold: Maximum Hamming distance that still counts as the same frame
+            max_entries: Entries kept before the least recently used is evicted
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+            hash_size: dHash grid size (hash_size * hash_size bits)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hash_size = hash_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, FrameCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fingerprint(self, image: Image.Image) -> int:
+        """Hash a frame with this cache's settings."""
+        return dhash(image, self.hash_size)
+
+    def _expire(self) -> None:
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, entry in self._entries.items() if entry.created < cutoff]:
+            del self._entries[key]
+
+    def lookup(self, frame_hash: int) -> Optional[FrameCacheEntry]:
+        """
+        Find the closest stored frame within the threshold.
+
+        Args:
+            frame_hash: Fingerprint from `fingerprint`
+
+        Returns:
+            The matching entry, or None on a miss
+        """
+        with self._lock:
+            self._expire()
+            best_key, best_distance = None, self.threshold + 1
+            for key in self._entries:
+                distance = hamming_distance(key, frame_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            logger.info(f"Frame cache hit (distance {best_distance})")
+            return self._entries[best_key]
+
+    def store(self, frame_hash: int, description: str, joke: Optional[str] = None) -> None:
+        """Remember the analysis for a frame, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[frame_hash] = FrameCacheEntry(description, joke)
+            self._entries.move_to_end(frame_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,203 @@
+import logging
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class Rect:
+    """Screen rectangle in virtual desktop coordinates; right and bottom are exclusive."""
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+    @classmethod
+    def from_size(cls, left: int, top: int, width: int, height: int) -> "Rect":
+        return cls(left, top, left + width, top + height)
+
+    @property
+    def width(self) -> int:
+        return self.right - self.left
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    @property
+    def bbox(self) -> Tuple[int, int, int, int]:
+        return self.left, self.top, self.right, self.bottom
+
+    @property
+    def empty(self) -> bool:
+        return self.width <= 0 or self.height <= 0
+
+    def contains(self, point: Point) -> bool:
+        return self.left <= point[0] < self.right and self.top <= point[1] < self.bottom
+
+    def intersect(self, other: "Rect") -> "Rect":
+        return Rect(max(self.left, other.left), max(self.top, other.top),
+                    min(self.right, other.right), min(self.bottom, other.bottom))
+
+    def union(self, other: "Rect") -> "Rect":
+        return Rect(min(self.left, other.left), min(self.top, other.top),
+                    max(self.right, other.right), max(self.bottom, other.bottom))
+
+    def centered_on(self, point: Point, size: Tuple[int, int]) -> "Rect":
+        """A rect of `size` centered on `point`, shifted to stay inside this rect."""
+        width, height = min(size[0], self.width), min(size[1], self.height)
+        left = min(max(point[0] - width // 2, self.left), self.right - width)
+        top = min(max(point[1] - height // 2, self.top), self.bottom - height)
+        return Rect.from_size(left, top, width, height)
+
+
+class CaptureRegion(Enum):
+    ALL_SCREENS = "all"
+    MONITOR = "monitor"
+    BBOX = "bbox"
+    FOCUSED_WINDOW = "window"
+    CURSOR = "cursor"
+
+
+class GeometryProvider:
+    """Where the monitors, the focused window and the cursor are."""
+
+    def monitors(self) -> List[Rect]:
+        raise NotImplementedError
+
+    def focused_window(self) -> Optional[Rect]:
+        raise NotImplementedError
+
+    def cursor(self) -> Point:
+        raise NotImplementedError
+
+    def virtual_screen(self) -> Rect:
+        """Bounding box of every monitor."""
+        monitors = self.monitors()
+        screen = monitors[0]
+        for monitor in monitors[1:]:
+            screen = screen.union(monitor)
+        return screen
+
+    def monitor_at(self, point: Point) -> Rect:
+        """The monitor containing a point, or the first monitor if none does."""
+        monitors = self.monitors()
+        for monitor in monitors:
+            if monitor.contains(point):
+                return monitor
+        return monitors[0]
+
+    def active_monitor(self) -> Rect:
+        """The monitor under the cursor."""
+        return self.monitor_at(self.cursor())
+
+
+class Win32GeometryProvider(GeometryProvider):
+    """
+    Geometry from the Win32 API.
+
+    Raises:
+        ImportError: If pywin32 is not available
+    """
+
+    def __init__(self):
+        import win32api
+        import win32gui
+
+        self._win32api = win32api
+        self._win32gui = win32gui
+
+    def monitors(self) -> List[Rect]:
+        return [Rect(*self._win32api.GetMonitorInfo(handle)["Monitor"])
+                for handle, _, _ in self._win32api.EnumDisplayMonitors()]
+
+    def focused_window(self) -> Optional[Rect]:
+        hwnd = self._win32gui.GetForegroundWindow()
+        if not hwnd or self._win32gui.IsIconic(hwnd):
+            return None
+        rect = Rect(*self._win32gui.GetWindowRect(hwnd))
+        return None if rect.empty else rect
+
+    def cursor(self) -> Point:
+        return self._win32api.GetCursorPos()
+
+
+class FakeGeometryProvider(GeometryProvider):
+    """Fixed geometry for tests, benchmarks and headless runs."""
+
+    def __init__(self,
+                 monitors: Sequence[Rect] = (Rect(0, 0, 1920, 1080),),
+                 focused: Optional[Rect] = None,
+                 cursor: Point = (0, 0)):
+        if not monitors:
+            raise ValueError("At least one monitor is required")
+        self._monitors = list(monitors)
+        self.focused = focused
+        self.cursor_position = cursor
+
+    def monitors(self) -> List[Rect]:
+        return list(self._monitors)
+
+    def focused_window(self) -> Optional[Rect]:
+        return self.focused
+
+    def cursor(self) -> Point:
+        return self.cursor_position
+
+
+def default_geometry_provider() -> Optional[GeometryProvider]:
+    """The platform geometry provider, or None where there is none."""
+    try:
+        return Win32GeometryProvider()
+    except ImportError:
+        return None
+
+
+def resolve_region(provider: GeometryProvider,
+                   region: CaptureRegion,
+                   bbox: Optional[Tuple[int, int, int, int]] = None,
+                   cursor_size: Tuple[int, int] = (1024, 768)) -> Optional[Rect]:
+    """
+    Turn a capture region into a rectangle on the virtual desktop.
+
+    Args:
+        provider: Source of monitor, window and cursor geometry
+        region: Which part of the desktop to capture
+        bbox: (left, top, right, bottom) for CaptureRegion.BBOX
+        cursor_size: Size of the area around the cursor for CaptureRegion.CURSOR
+
+    Returns:
+        The rect to capture, clipped to the desktop, or None for all screens
+    """
+    if region == CaptureRegion.ALL_SCREENS:
+        return None
+
+    screen = provider.virtual_screen()
+    if region == CaptureRegion.BBOX:
+        if bbox is None:
+            raise ValueError("CaptureRegion.BBOX needs a bbox")
+        rect = Rect(*bbox)
+    elif region == CaptureRegion.MONITOR:
+        rect = provider.active_monitor()
+    elif region == CaptureRegion.FOCUSED_WINDOW:
+        rect = provider.focused_window()
+        if rect is None:
+            logger.info("No focused window, capturing the active monitor")
+            rect = provider.active_monitor()
+    else:
+        cursor = provider.cursor()
+        rect = provider.monitor_at(cursor).centered_on(cursor, cursor_size)
+
+    rect = rect.intersect(screen)
+    if rect.empty:
+        logger.warning(f"{region.value} region is off screen, capturing all screens")
+        return None
+    return rect
@@ -0,0 +1,381 @@
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .image_preprocess import target_size_for_detail
+from .metrics import get_metrics
+from .rate_limit import TokenBucket
+
+if TYPE_CHECKING:
+    from .openai_vision import ImageProcessingInputDetail, ImageProcessingOpenAIModelTypes
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+RPM_ENV = "SCRAPYARD_RPM"
+TPM_ENV = "SCRAPYARD_TPM"
+DAILY_BUDGET_ENV = "SCRAPYARD_DAILY_BUDGET"
+
+# Rough text tokenization used for estimates; the real count comes back in `usage`.
+CHARS_PER_TOKEN = 4
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    """USD per million tokens and how many tokens an image costs on a model."""
+    input_per_million: float
+    output_per_million: float
+    image_base_tokens: int
+    image_tile_tokens: int
+
+
+MODEL_PRICING: Dict[str, ModelPricing] = {
+    "gpt-4o": ModelPricing(2.50, 10.00, 85, 170),
+    "gpt-4o-mini": ModelPricing(0.15, 0.60, 2833, 5667),
+}
+
+
+def _pricing(model: str) -> ModelPricing:
+    return MODEL_PRICING.get(model, MODEL_PRICING["gpt-4o"])
+
+
+def estimate_image_tokens(size: Tuple[int, int], detail: str, model: str = "gpt-4o") -> int:
+    """
+    Input tokens the vision API charges for an image.
+
+    Low detail is a flat base cost. Otherwise the image is scaled the way the
+    API scales it and billed per 512px tile on top of the base.
+
+    Args:
+        size: Image (width, height) as uploaded
+        detail: "low", "high" or "auto" ("auto" is estimated like "high")
+        model: Model name; gpt-4o-mini bills images at a higher token count
+    """
+    pricing = _pricing(model)
+    if detail == "low":
+        return pricing.image_base_tokens
+    width, height = target_size_for_detail(size, "high")
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return pricing.image_base_tokens + tiles * pricing.image_tile_tokens
+
+
+def estimate_text_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def request_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a request."""
+    pricing = _pricing(model)
+    return (prompt_tokens * pricing.input_per_million + completion_tokens * pricing.output_per_million) / 1_000_000
+
+
+class BudgetExceeded(Exception):
+    """The governor refused a request; the cycle should be skipped, not retried."""
+
+
+@dataclass
+class GovernorLimits:
+    """
+    Limits enforced by the SpendGovernor. None means unlimited.
+
+    Attributes:
+        rpm: Requests per minute, per model
+        tpm: Tokens per minute, per model
+        daily_budget: USD per calendar day
+        max_wait: Longest a request may wait for the rate limits before it is
+            degraded or refused
+        low_detail_below: Remaining budget fraction below which images are sent at low detail
+        mini_below: Remaining budget fraction below which text-only requests use the mini model
+        expected_output_tokens: Completion size assumed before the real usage is known
+    """
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    daily_budget: Optional[float] = None
+    max_wait: float = 30.0
+    low_detail_below: float = 0.5
+    mini_below: float = 0.25
+    expected_output_tokens: int = 150
+
+    @classmethod
+    def from_env(cls) -> "GovernorLimits":
+        def read(name):
+            value = os.environ.get(name)
+            return float(value) if value else None
+
+        return cls(rpm=read(RPM_ENV), tpm=read(TPM_ENV), daily_budget=read(DAILY_BUDGET_ENV))
+
+
+@dataclass
+class CallPlan:
+    """The model, detail level and estimated cost a request was admitted with."""
+    model_type: "ImageProcessingOpenAIModelTypes"
+    detail: Optional["ImageProcessingInputDetail"]
+    estimated_tokens: int
+    estimated_cost: float
+    degraded: Tuple[str, ...] = field(default_factory=tuple)
+
+
+class SpendGovernor:
+    """
+    Shared admission control and spend accounting for every OpenAI call.
+
+    Each request is planned before it is sent: its tokens are estimated from
+    the prompt and the image size and detail, and checked against per-model
+    RPM/TPM token buckets and the daily budget. Rather than failing when
+    limits get tight, the plan degrades: image requests step their detail
+    down (high, auto, low) once the budget runs low or the rate limits would
+    make the call wait too long, and text-only requests switch to
+    GPT_4_O_MINI. Images keep their model, since the mini model bills an
+    image at many times gpt-4o's token count for about the same price. Only
+    when no degradation helps is the request refused with BudgetExceeded so
+    the cycle is skipped. After the call the actual `usage` settles the
+    estimate.
+    """
+
+    def __init__(self, limits: Optional[GovernorLimits] = None):
+        self.limits = limits or GovernorLimits()
+        self._lock = threading.Lock()
+        self._request_buckets: Dict[str, TokenBucket] = {}
+        self._token_buckets: Dict[str, TokenBucket] = {}
+        self._day = date.today()
+        self._stats = {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'spend_today': 0.0,
+            'spend_total': 0.0,
+            'degraded_detail': 0,
+            'degraded_model': 0,
+            'skipped': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def _buckets(self, model: str) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        with self._lock:
+            if model not in self._request_buckets:
+                limits = self.limits
+                self._request_buckets[model] = TokenBucket(limits.rpm / 60, limits.rpm) if limits.rpm else None
+                self._token_buckets[model] = TokenBucket(limits.tpm / 60, limits.tpm) if limits.tpm else None
+            return self._request_buckets[model], self._token_buckets[model]
+
+    def _roll_day(self) -> None:
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._stats['spend_today'] = 0.0
+
+    def remaining_budget(self) -> Optional[float]:
+        """USD left today, or None without a daily budget."""
+        if self.limits.daily_budget is None:
+            return None
+        with self._lock:
+            self._roll_day()
+            return max(0.0, self.limits.daily_budget - self._stats['spend_today'])
+
+    def should_skip(self) -> bool:
+        """True when today's budget is spent, so a cycle should not even capture."""
+        remaining = self.remaining_budget()
+        if remaining is not None and remaining <= 0:
+            self._skip("budget")
+            return True
+        return False
+
+    def _skip(self, reason: str) -> None:
+        with self._lock:
+            self._stats['skipped'] += 1
+        registry.inc("governor_skipped", reason=reason)
+
+    def _wait_estimate(self, model: str, tokens: int) -> float:
+        requests, token_bucket = self._buckets(model)
+        wait = requests.retry_after(1) if requests is not None else 0.0
+        if token_bucket is not None:
+            wait = max(wait, token_bucket.retry_after(tokens))
+        return wait
+
+    def plan(self,
+             model_type: "ImageProcessingOpenAIModelTypes",
+             detail: Optional["ImageProcessingInputDetail"] = None,
+             image_size: Optional[Tuple[int, int]] = None,
+             prompt: str = "") -> CallPlan:
+        """
+        Decide how a request should be sent, degrading it if limits are tight.
+
+        Args:
+            model_type: Model the caller asked for
+            detail: Vision detail level, or None for a text-only request
+            image_size: Uploaded image (width, height), or None for a text-only request
+            prompt: Text sent with the request
+
+        Returns:
+            The plan to send the request with
+
+        Raises:
+            BudgetExceeded: No degradation fits within the budget and rate limits
+        """
+        from .openai_vision import ImageProcessingInputDetail, ImageProcessingOpenAIModelTypes
+
+        degraded = []
+
+        def estimate(model, level):
+            tokens = estimate_text_tokens(prompt) + self.limits.expected_output_tokens
+            if image_size is not None and level is not None:
+                tokens += estimate_image_tokens(image_size, level.value, model.value)
+            cost = request_cost(model.value, tokens - self.limits.expected_output_tokens, self.limits.expected_output_tokens)
+            return tokens, cost
+
+        is_image = image_size is not None and detail is not None
+        lower_levels = {
+            ImageProcessingInputDetail.HIGH: ImageProcessingInputDetail.AUTO,
+            ImageProcessingInputDetail.AUTO: ImageProcessingInputDetail.LOW,
+        }
+
+        def lower_detail():
+            nonlocal detail
+            if is_image and detail in lower_levels:
+                detail = lower_levels[detail]
+                if "detail" not in degraded:
+                    degraded.append("detail")
+                return True
+            return False
+
+        def cheaper_model():
+            nonlocal model_type
+            # Only text-only calls: gpt-4o-mini bills images at ~33x the tokens,
+            # so switching saves next to nothing there and eats far more TPM
+            if not is_image and model_type != ImageProcessingOpenAIModelTypes.GPT_4_O_MINI:
+                model_type = ImageProcessingOpenAIModelTypes.GPT_4_O_MINI
+                degraded.append("model")
+                return True
+            return False
+
+        remaining = self.remaining_budget()
+        if remaining is not None:
+            if remaining <= 0:
+                self._skip("budget")
+                raise BudgetExceeded(f"Daily budget of ${self.limits.daily_budget:.2f} is spent")
+            fraction = remaining / self.limits.daily_budget
+            if fraction < self.limits.low_detail_below:
+                while lower_detail():
+                    pass
+            if fraction < self.limits.mini_below:
+                cheaper_model()
+
+        tokens, cost = estimate(model_type, detail)
+        while self._wait_estimate(model_type.value, tokens) > self.limits.max_wait:
+            if not (lower_detail() or cheaper_model()):
+                self._skip("rate_limit")
+                raise BudgetExceeded(f"Rate limits for {model_type.value} would delay the request "
+                                     f"more than {self.limits.max_wait:.0f}s")
+            tokens, cost = estimate(model_type, detail)
+
+        while remaining is not None and cost > remaining and (lower_detail() or cheaper_model()):
+            tokens, cost = estimate(model_type, detail)
+        if remaining is not None and cost > remaining:
+            self._skip("budget")
+            raise BudgetExceeded(f"Request estimated at ${cost:.4f} exceeds the ${remaining:.4f} left today")
+
+        if degraded:
+            with self._lock:
+                for kind in degraded:
+                    self._stats[f'degraded_{kind}'] += 1
+            for kind in degraded:
+                registry.inc("governor_degraded", kind=kind)
+            logger.info(f"Degraded request to {model_type.value}"
+                        f"{f' at {detail.value} detail' if detail is not None else ''} ({', '.join(degraded)})")
+        return CallPlan(model_type, detail, tokens, cost, tuple(degraded))
+
+    def admit(self, plan: CallPlan) -> None:
+        """
+        Wait for the plan's share of the rate limits.
+
+        Called once per attempt, retries included, so each one is throttled
+        and later settled with `record`.
+
+        Raises:
+            BudgetExceeded: Today's budget is spent, or the limits would hold
+                the request longer than max_wait
+        """
+        remaining = self.remaining_budget()
+        if remaining is not None and remaining <= 0:
+            self._skip("budget")
+            raise BudgetExceeded(f"Daily budget of ${self.limits.daily_budget:.2f} is spent")
+        requests, token_bucket = self._buckets(plan.model_type.value)
+        start = time.perf_counter()
+        if requests is not None and not requests.acquire(1, timeout=self.limits.max_wait):
+            self._skip("rate_limit")
+            raise BudgetExceeded(f"Request limit for {plan.model_type.value} reached")
+        if token_bucket is not None and not token_bucket.acquire(plan.estimated_tokens, timeout=self.limits.max_wait):
+            if requests is not None:
+                # The request is not sent, so hand its slot back
+                requests.adjust(-1)
+            self._skip("rate_limit")
+            raise BudgetExceeded(f"Token limit for {plan.model_type.value} reached")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['wait_seconds'] += waited
+        if waited > 0.001:
+            registry.observe("governor_wait", waited, model=plan.model_type.value)
+
+    def record(self, plan: CallPlan, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None) -> None:
+        """
+        Account for a finished request and settle its token estimate.
+
+        Args:
+            plan: The plan the request was admitted with
+            prompt_tokens: Actual input tokens from `usage`, if reported
+            completion_tokens: Actual output tokens from `usage`, if reported
+        """
+        model = plan.model_type.value
+        if prompt_tokens is None or completion_tokens is None:
+            completion_tokens = self.limits.expected_output_tokens
+            prompt_tokens = plan.estimated_tokens - completion_tokens
+        actual_tokens = prompt_tokens + completion_tokens
+        cost = request_cost(model, prompt_tokens, completion_tokens)
+
+        _, token_bucket = self._buckets(model)
+        if token_bucket is not None:
+            token_bucket.adjust(actual_tokens - plan.estimated_tokens)
+
+        with self._lock:
+            self._roll_day()
+            self._stats['prompt_tokens'] += prompt_tokens
+            self._stats['completion_tokens'] += completion_tokens
+            self._stats['spend_today'] += cost
+            self._stats['spend_total'] += cost
+        registry.inc("governor_spend_usd", cost, model=model)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for monitoring, plus today's remaining budget."""
+        with self._lock:
+            self._roll_day()
+            stats = dict(self._stats)
+        if self.limits.daily_budget is not None:
+            stats['budget_remaining'] = max(0.0, self.limits.daily_budget - stats['spend_today'])
+        return stats
+
+
+_governor: Optional[SpendGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> SpendGovernor:
+    """Return the process-wide governor, with limits from the environment by default."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = SpendGovernor(GovernorLimits.from_env())
+        return _governor
+
+
+def configure_governor(limits: GovernorLimits) -> SpendGovernor:
+    """Replace the process-wide governor with one enforcing `limits`."""
+    global _governor
+    with _governor_lock:
+        _governor = SpendGovernor(limits)
+        return _governor
@@ -0,0 +1,92 @@
+import base64
+import io
+import threading
+from enum import Enum
+from typing import Optional
+
+from PIL import Image
+
+
+class ImageFormat(Enum):
+    """Encodings accepted by the OpenAI vision API."""
+    JPEG = "JPEG"
+    PNG = "PNG"
+    WEBP = "WEBP"
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.value.lower()}"
+
+
+class ImageEncoder:
+    """
+    Encode in-memory images into a reusable buffer.
+
+    The same BytesIO is truncated and refilled for every frame, so encoding a
+    screenshot never touches the disk and does not grow a new buffer each cycle.
+    """
+
+    def __init__(self, image_format: ImageFormat = ImageFormat.JPEG, quality: int = 85):
+        """
+        Args:
+            image_format: Output encoding for every frame
+            quality: Default JPEG/WebP quality (1-100), ignored for PNG
+        """
+        if not (1 <= quality <= 100):
+            raise ValueError(f"Quality must be between 1 and 100, got {quality}")
+
+        self.image_format = image_format
+        self.quality = quality
+        self._buffer = io.BytesIO()
+        self._lock = threading.Lock()
+
+    @property
+    def mime_type(self) -> str:
+        return self.image_format.mime_type
+
+    def _save(self, image: Image.Image, quality: Optional[int]) -> None:
+        """Encode the image into the internal buffer, replacing its contents."""
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+
+        if self.image_format == ImageFormat.PNG:
+            image.save(self._buffer, format="PNG", compress_level=1)
+            return
+
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(self._buffer, format=self.image_format.value, quality=quality or self.quality)
+
+    def encode(self, image: Image.Image, quality: Optional[int] = None) -> bytes:
+        """
+        Encode an image and return a copy of the encoded bytes.
+
+        Args:
+            image: PIL image to encode
+            quality: Override the default quality for this call
+
+        Returns:
+            The encoded image bytes
+        """
+        with self._lock:
+            self._save(image, quality)
+            return self._buffer.getvalue()
+
+    def encode_base64(self, image: Image.Image, quality: Optional[int] = None) -> str:
+        """
+        Encode an image and return it base64-encoded.
+
+        The base64 text is produced straight from a view over the internal
+        buffer, so the encoded bytes are not copied an extra time.
+        """
+        with self._lock:
+            self._save(image, quality)
+            view = self._buffer.getbuffer()
+            try:
+                return base64.b64encode(view).decode("ascii")
+            finally:
+                view.release()
+
+    def to_data_url(self, image: Image.Image, quality: Optional[int] = None) -> str:
+        """Encode an image as a data URL whose MIME type matches the encoding."""
+        return f"data:{self.mime_type};base64,{self.encode_base64(image, quality)}"
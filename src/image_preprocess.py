@@ -0,0 +1,155 @@
+import base64
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from .image_encoder import ImageEncoder, ImageFormat
+
+logger = logging.getLogger(__name__)
+
+# Pixel budgets the vision API scales images to before tiling them.
+LOW_DETAIL_MAX_SIDE = 512
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+
+
+@dataclass
+class PreparedImage:
+    """An encoded, upload-ready image together with the cost of producing it."""
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    source_width: int
+    source_height: int
+    quality: Optional[int]
+    encode_time: float
+
+    @property
+    def source_bytes(self) -> int:
+        """Size of the raw RGB frame the image was produced from."""
+        return self.source_width * self.source_height * 3
+
+    @property
+    def encoded_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.source_bytes - self.encoded_bytes
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def target_size_for_detail(size: Tuple[int, int], detail: str) -> Tuple[int, int]:
+    """
+    Compute the largest size the vision API would actually look at.
+
+    Args:
+        size: Source (width, height)
+        detail: One of "low", "high" or "auto"; "auto" is budgeted like "high"
+            since that is the most the API will use
+
+    Returns:
+        The (width, height) to resize to, never larger than the source
+    """
+    width, height = size
+    if detail == "low":
+        scale = min(1.0, LOW_DETAIL_MAX_SIDE / max(width, height))
+    else:
+        scale = min(1.0, HIGH_DETAIL_MAX_SIDE / max(width, height))
+        scale = min(scale, HIGH_DETAIL_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class ImagePreprocessor:
+    """
+    Downscale and compress frames to fit the vision detail level.
+
+    Frames are resized to the API's effective pixel budget, then encoded at
+    the highest quality that still fits within `target_bytes`.
+    """
+
+    def __init__(self,
+                 image_format: ImageFormat = ImageFormat.JPEG,
+                 target_bytes: int = 300 * 1024,
+                 max_quality: int = 90,
+                 min_quality: int = 40):
+        """
+        Args:
+            image_format: JPEG or WEBP
+            target_bytes: Upper bound for the encoded size
+            max_quality: Quality tried first
+            min_quality: Lowest quality the search may go down to
+        """
+        if image_format == ImageFormat.PNG:
+            raise ValueError("ImagePreprocessor needs a lossy format (JPEG or WEBP)")
+        if not (1 <= min_quality <= max_quality <= 100):
+            raise ValueError(f"Invalid quality range {min_quality}-{max_quality}")
+
+        self.target_bytes = target_bytes
+        self.max_quality = max_quality
+        self.min_quality = min_quality
+        self.encoder = ImageEncoder(image_format, quality=max_quality)
+
+    def _encode_to_target(self, image: Image.Image) -> Tuple[bytes, int]:
+        """Binary-search the highest quality whose output fits the byte target."""
+        data = self.encoder.encode(image, self.max_quality)
+        if len(data) <= self.target_bytes:
+            return data, self.max_quality
+
+        best = None
+        low, high = self.min_quality, self.max_quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self.encoder.encode(image, quality)
+            if len(candidate) <= self.target_bytes:
+                best = (candidate, quality)
+                low = quality + 1
+            else:
+                high = quality - 1
+
+        if best is None:
+            logger.warning(f"Could not reach {self.target_bytes} bytes, using quality {self.min_quality}")
+            return self.encoder.encode(image, self.min_quality), self.min_quality
+        return best
+
+    def prepare(self, image: Image.Image, detail: str = "auto") -> PreparedImage:
+        """
+        Resize and encode a frame for upload.
+
+        Args:
+            image: Captured frame
+            detail: Vision detail level the image will be sent with
+
+        Returns:
+            A PreparedImage with the encoded bytes and size/timing stats
+        """
+        start = time.perf_counter()
+        source_size = image.size
+        size = target_size_for_detail(source_size, detail)
+        if size != source_size:
+            image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+        data, quality = self._encode_to_target(image)
+        prepared = PreparedImage(
+            data=data,
+            mime_type=self.encoder.mime_type,
+            width=size[0],
+            height=size[1],
+            source_width=source_size[0],
+            source_height=source_size[1],
+            quality=quality,
+            encode_time=time.perf_counter() - start,
+        )
+        logger.info(
+            f"Prepared {source_size[0]}x{source_size[1]} -> {size[0]}x{size[1]} "
+            f"{prepared.encoded_bytes} bytes (q={quality}, saved {prepared.bytes_saved} bytes) "
+            f"in {prepared.encode_time * 1000:.1f} ms"
+        )
+        return prepared
@@ -1,13 +1,24 @@
 import pygame
 import logging
 import os
-import win32gui
-import win32con
-import win32api
 import threading
+import time
+import queue
+from dataclasses import dataclass
 from enum import Enum
-from typing import Tuple
+from typing import Callable, List, Optional, Tuple
 from .resource_path import get_resource_path
+from .metrics import get_metrics
+
+try:
+    import win32api
+    import win32con
+    import win32gui
+except ImportError:
+    # Non-Windows or headless runs: the window is drawn but never restyled or moved natively
+    win32api = win32con = win32gui = None
+
+registry = get_metrics()
 
 class WindowMode(Enum):
     """Window display modes for the image renderer."""
@@ -15,7 +26,85 @@ class WindowMode(Enum):
     NOFRAME = pygame.NOFRAME
     FULLSCREEN = pygame.FULLSCREEN
 
+class RenderMode(Enum):
+    """Frame scheduling strategies for the render loop."""
+    CONTINUOUS = "continuous"
+    ON_DEMAND = "on_demand"
+
 QUIT_EVENT = pygame.USEREVENT + 1
+REDRAW_EVENT = pygame.USEREVENT + 2
+
+_EXPOSE_EVENTS = {pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWMOVED,
+                  pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWSIZECHANGED}
+
+@dataclass
+class RenderStats:
+    """Frame counters collected by the render loop."""
+    frames: int = 0
+    wakeups: int = 0
+    elapsed: float = 0.0
+    cpu_time: float = 0.0
+    draw_cpu_time: float = 0.0
+    max_draw_cpu_time: float = 0.0
+    over_budget: int = 0
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def cpu_per_frame(self) -> float:
+        """Thread CPU seconds spent drawing each frame."""
+        return self.draw_cpu_time / self.frames if self.frames else 0.0
+
+    @property
+    def cpu_load(self) -> float:
+        """Fraction of one core used by the render thread over the loop's lifetime."""
+        return self.cpu_time / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'frames': self.frames,
+            'wakeups': self.wakeups,
+            'elapsed': self.elapsed,
+            'fps': self.fps,
+            'cpu_per_frame': self.cpu_per_frame,
+            'cpu_load': self.cpu_load,
+            'max_cpu_per_frame': self.max_draw_cpu_time,
+            'over_budget': self.over_budget,
+        }
+
+def make_layered_topmost(hwnd, position: Tuple[int, int], size: Tuple[int, int]) -> None:
+    """
+    Turn a window into a black-colorkeyed, always-on-top overlay and show it.
+
+    Args:
+        hwnd: Native window handle
+        position: Window position as (x, y) coordinates
+        size: Window size as (width, height)
+    """
+    if win32gui is None:
+        return
+    win32gui.SetWindowLong(
+        hwnd,
+        win32con.GWL_EXSTYLE,
+        win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE) | win32con.WS_EX_LAYERED
+    )
+
+    win32gui.SetLayeredWindowAttributes(
+        hwnd,
+        win32api.RGB(0, 0, 0),
+        0,
+        win32con.LWA_COLORKEY
+    )
+    
+    win32gui.SetWindowPos(
+        hwnd,
+        win32con.HWND_TOPMOST,
+        position[0], position[1],
+        size[0], size[1],
+        win32con.SWP_SHOWWINDOW
+    )
 
 class ImageRenderer:
     """
@@ -25,8 +114,13 @@ class ImageRenderer:
     and managing the rendering loop.
     """
 
-    def __init__(self):
-        """Initialize the ImageRenderer."""
+    def __init__(self, hidden: bool = False):
+        """
+        Initialize the ImageRenderer.
+
+        Args:
+            hidden: Create the initial placeholder window hidden
+        """
         self.image = None
         self.screen = None
         self.running = False
@@ -34,18 +128,26 @@ class ImageRenderer:
         self.height = 0
         self.hwnd = None  
         self._lock = threading.Lock()  
+        self.render_mode = RenderMode.ON_DEMAND
+        self.idle_timeout_ms = 250
+        self.tick_interval_ms: Optional[int] = None
+        self.tick_callback: Optional[Callable[[], Optional[List[pygame.Rect]]]] = None
+        self.stats = RenderStats()
+        # Sub-rectangle of `image` to show, e.g. one frame of a sprite atlas
+        self.source_rect: Optional[pygame.Rect] = None
+        self.frame_budget_ms: Optional[float] = None
+        self._dirty_lock = threading.Lock()
+        self._dirty_rects: List[pygame.Rect] = []
+        self._full_redraw = True
+        self._calls: "queue.SimpleQueue[Callable[[], None]]" = queue.SimpleQueue()
+        self.quit_handler: Optional[Callable[[], None]] = None
         self._setup_logging()
         pygame.init()
-        self._temp_surface = pygame.display.set_mode((1, 1), pygame.NOFRAME)
+        self._temp_surface = pygame.display.set_mode((1, 1), pygame.NOFRAME | (pygame.HIDDEN if hidden else 0))
 
     def _setup_logging(self) -> None:
         """Configure logging for the image renderer."""
         self.logger = logging.getLogger(__name__)
-        if not self.logger.handlers:
-            logging.basicConfig(
-                level=logging.INFO,
-                format='%(asctime)s - %(levelname)s - %(message)s'
-            )
         self.logger.info("ImageRenderer initialized")
 
     def load_image(self, image_path: str) -> bool:
@@ -67,9 +169,10 @@ class ImageRenderer:
                 self.logger.error(f"Image file does not exist at {resource_path}")
                 return False
 
-            self.image = pygame.image.load(resource_path)
-            self.width, self.height = self.image.get_size()
-            self.image = self.image.convert_alpha()
+            with registry.span("render_load_image"):
+                self.image = pygame.image.load(resource_path)
+                self.width, self.height = self.image.get_size()
+                self.image = self.image.convert_alpha()
 
             self.logger.info(f"Image loaded successfully, size: {self.width}x{self.height}")
             return True
@@ -101,36 +204,15 @@ class ImageRenderer:
             x, y = position
             os.environ['SDL_VIDEO_WINDOW_POS'] = f"{x},{y}"
 
-            self.screen = pygame.display.set_mode(
-                (self.width, self.height),
-                mode.value
-            )
-            pygame.display.set_caption(title)
-
-            self.hwnd = pygame.display.get_wm_info()["window"] 
-            
-
-            win32gui.SetWindowLong(
-                self.hwnd,
-                win32con.GWL_EXSTYLE,
-                win32gui.GetWindowLong(self.hwnd, win32con.GWL_EXSTYLE) | win32con.WS_EX_LAYERED
-            )
-
-
-            win32gui.SetLayeredWindowAttributes(
-                self.hwnd,
-                win32api.RGB(0, 0, 0),
-                0,
-                win32con.LWA_COLORKEY
-            )
-            
-            win32gui.SetWindowPos(
-                self.hwnd,
-                win32con.HWND_TOPMOST,
-                x, y,
-                self.width, self.height,
-                win32con.SWP_SHOWWINDOW
-            )
+            with registry.span("render_create_window"):
+                self.screen = pygame.display.set_mode(
+                    (self.width, self.height),
+                    mode.value
+                )
+                pygame.display.set_caption(title)
+
+                self.hwnd = pygame.display.get_wm_info()["window"] 
+                make_layered_topmost(self.hwnd, position, (self.width, self.height))
 
             self.logger.info(f"Window created: {self.width}x{self.height} at position {position}")
             return True
@@ -139,42 +221,186 @@ class ImageRenderer:
             self.logger.error(f"Failed to create window: {e}")
             return False
 
+    def mark_dirty(self, rect: Optional[pygame.Rect] = None) -> None:
+        """
+        Request a redraw from any thread.
+
+        Args:
+            rect: Area that changed, or None to redraw the whole window
+        """
+        self._mark_dirty(rect)
+        if self.running and pygame.display.get_init():
+            pygame.event.post(pygame.event.Event(REDRAW_EVENT))
+
+    def _mark_dirty(self, rect: Optional[pygame.Rect] = None) -> None:
+        """Record a dirty area without waking the loop (used from the loop itself)."""
+        with self._dirty_lock:
+            if rect is None:
+                self._full_redraw = True
+            else:
+                self._dirty_rects.append(pygame.Rect(rect))
+
+    def call_soon(self, func: Callable[[], None]) -> None:
+        """Run `func` on the render thread at its next wakeup; safe to call from any thread."""
+        self._calls.put(func)
+        if self.running and pygame.display.get_init():
+            pygame.event.post(pygame.event.Event(REDRAW_EVENT))
+
+    def _run_calls(self) -> None:
+        while True:
+            try:
+                func = self._calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                func()
+            except Exception as e:
+                self.logger.error(f"Render thread call failed: {e}")
+
+    def _request_quit(self) -> None:
+        if self.quit_handler is not None:
+            self.quit_handler()
+        else:
+            self.running = False
+
+    def set_tick_interval(self, interval_ms: Optional[int], callback: Optional[Callable[[], Optional[List[pygame.Rect]]]] = None) -> None:
+        """
+        Wake the loop on a fixed interval, e.g. for animation.
+
+        Args:
+            interval_ms: Milliseconds between ticks, or None to only wake on events
+            callback: Called on each tick; returns the rects it changed, or None
+                for a full redraw
+        """
+        self.tick_interval_ms = interval_ms
+        self.tick_callback = callback
+        self.mark_dirty()
+
+    def _handle_event(self, event) -> None:
+        if event.type == pygame.QUIT:
+            self.logger.info("Quit event detected")
+            self._request_quit()
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.logger.info("Escape key pressed, exiting")
+                self._request_quit()
+        elif event.type == QUIT_EVENT:
+            self.logger.info("Custom quit event received")
+            self.running = False
+        elif event.type in _EXPOSE_EVENTS:
+            with self._dirty_lock:
+                self._full_redraw = True
+
+    def _take_dirty(self) -> Optional[List[pygame.Rect]]:
+        """Return the rects to redraw ([] for nothing, None for the whole window)."""
+        with self._dirty_lock:
+            if self._full_redraw:
+                rects = None
+            else:
+                rects = self._dirty_rects
+            self._full_redraw = False
+            self._dirty_rects = []
+        return rects
+
+    def _draw(self, rects: Optional[List[pygame.Rect]]) -> None:
+        draw_start = time.thread_time()
+        source = self.source_rect
+        if rects is None:
+            self.screen.fill((0, 0, 0))
+            self.screen.blit(self.image, (0, 0), area=source)
+            pygame.display.update()
+        else:
+            for rect in rects:
+                area = rect.move(source.topleft) if source is not None else rect
+                self.screen.fill((0, 0, 0), rect)
+                self.screen.blit(self.image, rect, area=area)
+            pygame.display.update(rects)
+
+        draw_time = time.thread_time() - draw_start
+        registry.observe("render_draw_cpu", draw_time)
+        self.stats.frames += 1
+        self.stats.draw_cpu_time += draw_time
+        if draw_time > self.stats.max_draw_cpu_time:
+            self.stats.max_draw_cpu_time = draw_time
+        if self.frame_budget_ms is not None and draw_time * 1000 > self.frame_budget_ms:
+            self.stats.over_budget += 1
+
     def start_render_loop(self) -> None:
-        """Start the rendering loop to display the image."""
+        """
+        Start the rendering loop to display the image.
+
+        In ON_DEMAND mode the loop sleeps in pygame.event.wait and only redraws
+        what was marked dirty (first show, expose/move events, mark_dirty calls
+        and ticks). CONTINUOUS mode redraws the full window every 10 ms.
+        """
         if self.image is None or self.screen is None:
             self.logger.error("Cannot start render loop: Image or screen not initialized")
             return
 
         self.running = True
-        self.logger.info("Starting render loop")
+        self.stats = RenderStats()
+        self._mark_dirty()
+        self.logger.info(f"Starting render loop ({self.render_mode.value})")
+
+        loop_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        next_tick = None
 
         try:
             while self.running:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        self.logger.info("Quit event detected")
-                        self.running = False
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_ESCAPE:
-                            self.logger.info("Escape key pressed, exiting")
-                            self.running = False
-                    elif event.type == QUIT_EVENT:
-                        self.logger.info("Custom quit event received")
-                        self.running = False
+                if self.render_mode == RenderMode.CONTINUOUS:
+                    for event in pygame.event.get():
+                        self._handle_event(event)
+                    self._run_calls()
+                    if not self.running:
                         break
-
+                    self._take_dirty()
+                    self._draw(None)
+                    pygame.time.wait(10)
+                    continue
+
+                tick_interval_ms = self.tick_interval_ms
+                timeout = self.idle_timeout_ms
+                if tick_interval_ms is None:
+                    next_tick = None
+                else:
+                    now = time.perf_counter()
+                    if next_tick is None:
+                        next_tick = now
+                    timeout = max(1, min(timeout, int((next_tick - now) * 1000)))
+
+                event = pygame.event.wait(timeout)
+                self.stats.wakeups += 1
+                if event.type != pygame.NOEVENT:
+                    self._handle_event(event)
+                for event in pygame.event.get():
+                    self._handle_event(event)
+                self._run_calls()
                 if not self.running:
                     break
 
-                self.screen.fill((0, 0, 0))
-                self.screen.blit(self.image, (0, 0))
-                pygame.display.update()
-                
-                pygame.time.wait(10)
+                now = time.perf_counter()
+                if next_tick is not None and now >= next_tick:
+                    interval = tick_interval_ms / 1000
+                    # Skip ticks we fell behind on instead of replaying them back to back
+                    next_tick = next_tick + interval if now - next_tick < interval else now + interval
+                    changed = self.tick_callback() if self.tick_callback else None
+                    if changed is None:
+                        self._mark_dirty()
+                    else:
+                        for rect in changed:
+                            self._mark_dirty(rect)
+
+                rects = self._take_dirty()
+                if rects is None or rects:
+                    self._draw(rects)
 
         except Exception as e:
             self.logger.error(f"Error in render loop: {e}")
         finally:
+            self.stats.elapsed = time.perf_counter() - loop_start
+            self.stats.cpu_time = time.thread_time() - cpu_start
+            self.logger.info(f"Render loop stopped: {self.stats.as_dict()}")
             self.cleanup()
 
     def stop_rendering(self) -> None:
@@ -219,7 +445,7 @@ class ImageRenderer:
         """Close the rendering window in a thread-safe way and force pygame cleanup."""
         with self._lock:
             try:
-                if self.hwnd:
+                if self.hwnd and win32gui is not None:
                     try:
                         win32gui.DestroyWindow(self.hwnd)
                     except Exception as e:
@@ -238,7 +464,7 @@ class ImageRenderer:
 
     def set_window_position(self, position: Tuple[int, int]) -> None:
         """Set the position of the rendering window."""
-        if self.hwnd:
+        if self.hwnd and win32gui is not None:
             x, y = position
             win32gui.SetWindowPos(self.hwnd, win32con.HWND_TOPMOST, x, y, 0, 0, win32con.SWP_NOSIZE)
             self.logger.info(f"Window position set to {position}")
\ No newline at end of file
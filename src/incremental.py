@@ -0,0 +1,247 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+from .geometry import Rect
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+
+class FrameChange(Enum):
+    FULL = "full"
+    CROP = "crop"
+    UNCHANGED = "unchanged"
+
+
+@dataclass
+class IncrementalPlan:
+    """How a frame should be analyzed relative to the last analyzed one."""
+    change: FrameChange
+    changed_fraction: float
+    regions: List[Rect] = field(default_factory=list)
+    image: Optional[Image.Image] = None
+    previous_description: Optional[str] = None
+
+    def prompt(self, prompt: str, frame_size: Tuple[int, int]) -> str:
+        """The vision prompt to send with this plan's image."""
+        if self.change != FrameChange.CROP:
+            return prompt
+        areas = "; ".join(f"{r.width}x{r.height} at ({r.left}, {r.top})" for r in self.regions)
+        if len(self.regions) == 1:
+            shown = f"The image is only the part of the screen that changed: {areas}"
+        else:
+            shown = f"The image shows only the {len(self.regions)} parts of the screen that changed, stacked top to bottom: {areas}"
+        return (
+            f"{prompt}\n\n"
+            f"{shown}, on a {frame_size[0]}x{frame_size[1]} screen. "
+            f"Before the change, the whole screen was described as:\n\n"
+            f"{self.previous_description}\n\n"
+            f"Reply with an updated description of the whole screen."
+        )
+
+
+def changed_tiles(previous: Image.Image,
+                  current: Image.Image,
+                  tile_size: int = 64,
+                  pixel_threshold: int = 24) -> Image.Image:
+    """
+    Mask of the tiles that differ between two frames of the same size.
+
+    Frames are compared in grayscale; pass "L" images to skip the conversion.
+
+    Args:
+        previous: Last analyzed frame
+        current: New frame
+        tile_size: Tile edge in pixels; must be a power of two
+        pixel_threshold: Grayscale difference above which a pixel counts as changed
+
+    Returns:
+        An "L" image with one pixel per tile, 255 where any pixel in the tile changed
+    """
+    if tile_size & (tile_size - 1):
+        raise ValueError(f"tile_size must be a power of two, got {tile_size}")
+    if previous.mode != "L":
+        previous = previous.convert("L")
+    if current.mode != "L":
+        current = current.convert("L")
+    mask = ImageChops.difference(previous, current).point(lambda v: 255 if v > pixel_threshold else 0)
+    # Reduce in steps of at most 8x, re-thresholding after each, so a single
+    # changed pixel is never averaged away.
+    remaining = tile_size
+    while remaining > 1:
+        factor = min(8, remaining)
+        mask = mask.reduce(factor).point(lambda v: 255 if v else 0)
+        remaining //= factor
+    return mask
+
+
+def changed_regions(mask: Image.Image, padding: int = 1) -> List[Rect]:
+    """
+    Bounding boxes of the connected groups of changed tiles, in tile units.
+
+    Each group is grown by `padding` tiles of context and groups that then
+    overlap are merged, so distant changes (an edited line and the taskbar
+    clock, say) stay separate regions.
+    """
+    width, height = mask.size
+    pixels = mask.tobytes()
+    seen = bytearray(len(pixels))
+    bounds = Rect(0, 0, width, height)
+    regions = []
+    for start in range(len(pixels)):
+        if not pixels[start] or seen[start]:
+            continue
+        seen[start] = 1
+        stack = [start]
+        left, top, right, bottom = width, height, 0, 0
+        while stack:
+            index = stack.pop()
+            x, y = index % width, index // width
+            left, top, right, bottom = min(left, x), min(top, y), max(right, x + 1), max(bottom, y + 1)
+            for ny in range(max(0, y - 1), min(height, y + 2)):
+                for nx in range(max(0, x - 1), min(width, x + 2)):
+                    neighbour = ny * width + nx
+                    if pixels[neighbour] and not seen[neighbour]:
+                        seen[neighbour] = 1
+                        stack.append(neighbour)
+        regions.append(Rect(left - padding, top - padding, right + padding, bottom + padding).intersect(bounds))
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                if not regions[i].intersect(regions[j]).empty:
+                    regions[i] = regions[i].union(regions.pop(j))
+                    merged = True
+                    break
+            if merged:
+                break
+    return sorted(regions, key=lambda r: (r.top, r.left))
+
+
+def stack_regions(frame: Image.Image, regions: List[Rect], gap: int = 8) -> Image.Image:
+    """Crop `regions` out of a frame and stack them top to bottom, separated by `gap` black pixels."""
+    crops = [frame.crop(region.bbox) for region in regions]
+    if len(crops) == 1:
+        return crops[0]
+    width = max(crop.width for crop in crops)
+    height = sum(crop.height for crop in crops) + gap * (len(crops) - 1)
+    image = Image.new(frame.mode, (width, height))
+    y = 0
+    for crop in crops:
+        image.paste(crop, (0, y))
+        y += crop.height + gap
+    return image
+
+
+class IncrementalAnalyzer:
+    """
+    Decide whether a frame needs a full upload or only its changed region.
+
+    The new frame is diffed against the last analyzed one in tiles. If only
+    a small area changed, the bounding boxes of the changed tiles (plus a tile
+    of context) are cropped out and sent with the previous description, so
+    the model only has to update it. Up to `max_regions` separate regions are
+    stacked into one image; more are merged into their overall bounding box.
+    Large changes, size changes and every `max_incremental`-th consecutive
+    update fall back to a full upload so the description cannot drift for long.
+
+    `plan` and `commit` may run on different threads (the pipeline plans on
+    its encode stage and commits on its vision stage); the baseline is
+    guarded by a lock so a plan always diffs against a frame and description
+    committed together.
+    """
+
+    def __init__(self,
+                 tile_size: int = 64,
+                 pixel_threshold: int = 24,
+                 max_changed_fraction: float = 0.25,
+                 max_crop_fraction: float = 0.5,
+                 padding: int = 1,
+                 max_regions: int = 3,
+                 max_incremental: int = 5):
+        """
+        Args:
+            tile_size: Tile edge in pixels; must be a power of two
+            pixel_threshold: Grayscale difference above which a pixel counts as changed
+            max_changed_fraction: Changed tiles above which the whole frame is sent
+            max_crop_fraction: Crop area, relative to the frame, above which the whole frame is sent
+            padding: Tiles of unchanged context kept around each changed region
+            max_regions: Separate regions sent before they are merged into one
+            max_incremental: Consecutive incremental updates before a full refresh
+        """
+        self.tile_size = tile_size
+        self.pixel_threshold = pixel_threshold
+        self.max_changed_fraction = max_changed_fraction
+        self.max_crop_fraction = max_crop_fraction
+        self.padding = padding
+        self.max_regions = max_regions
+        self.max_incremental = max_incremental
+        self._gray: Optional[Image.Image] = None
+        self._description: Optional[str] = None
+        self._incremental = 0
+        self._lock = threading.Lock()
+
+    def plan(self, frame: Image.Image) -> IncrementalPlan:
+        """
+        Compare a frame with the last analyzed one.
+
+        Returns:
+            A FULL plan (send the frame), a CROP plan with the cropped image, or
+            an UNCHANGED plan whose previous description can be reused as is
+        """
+        with registry.span("incremental_diff"), self._lock:
+            plan = self._plan(frame)
+        registry.inc("incremental_frames", change=plan.change.value)
+        if plan.change == FrameChange.CROP:
+            logger.info(f"Sending {len(plan.regions)} changed region(s) as {plan.image.size} of {frame.size} "
+                        f"({plan.changed_fraction:.0%} of tiles changed)")
+        return plan
+
+    def _plan(self, frame: Image.Image) -> IncrementalPlan:
+        if self._gray is None or self._description is None or self._gray.size != frame.size:
+            return IncrementalPlan(FrameChange.FULL, 1.0)
+
+        mask = changed_tiles(self._gray, frame.convert("L"), self.tile_size, self.pixel_threshold)
+        fraction = mask.histogram()[255] / (mask.width * mask.height)
+        if mask.getbbox() is None:
+            return IncrementalPlan(FrameChange.UNCHANGED, 0.0, previous_description=self._description)
+        if fraction > self.max_changed_fraction or self._incremental >= self.max_incremental:
+            return IncrementalPlan(FrameChange.FULL, fraction)
+
+        regions = changed_regions(mask, self.padding)
+        if len(regions) > self.max_regions:
+            union = regions[0]
+            for region in regions[1:]:
+                union = union.union(region)
+            regions = [union]
+        frame_rect = Rect(0, 0, *frame.size)
+        regions = [Rect(r.left * self.tile_size, r.top * self.tile_size,
+                        r.right * self.tile_size, r.bottom * self.tile_size).intersect(frame_rect) for r in regions]
+        if sum(r.width * r.height for r in regions) > self.max_crop_fraction * frame.width * frame.height:
+            return IncrementalPlan(FrameChange.FULL, fraction)
+
+        return IncrementalPlan(FrameChange.CROP, fraction, regions, stack_regions(frame, regions), self._description)
+
+    def commit(self, frame: Image.Image, description: str, plan: IncrementalPlan) -> None:
+        """Make `frame` and its description the baseline for the next diff."""
+        if plan.change == FrameChange.UNCHANGED:
+            return
+        gray = frame.convert("L")
+        with self._lock:
+            self._incremental = self._incremental + 1 if plan.change == FrameChange.CROP else 0
+            self._gray = gray
+            self._description = description
+
+    def reset(self) -> None:
+        with self._lock:
+            self._gray = None
+            self._description = None
+            self._incremental = 0
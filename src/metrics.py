@@ -0,0 +1,331 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENV_FLAG = "SCRAPYARD_METRICS"
+METRICS_JSONL_ENV = "SCRAPYARD_METRICS_JSONL"
+METRICS_PORT_ENV = "SCRAPYARD_METRICS_PORT"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Values below 2 * _SUB_BUCKETS microseconds are counted exactly; above that
+# each power of two is split into _SUB_BUCKETS buckets (~6% relative error).
+_SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+
+def _bucket_index(value: int) -> int:
+    if value < 2 * _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    return 2 * _SUB_BUCKETS + (shift - 1) * _SUB_BUCKETS + ((value >> shift) - _SUB_BUCKETS)
+
+
+def _bucket_upper(index: int) -> int:
+    """Highest value counted in a bucket."""
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = (index - 2 * _SUB_BUCKETS) // _SUB_BUCKETS + 1
+    mantissa = _SUB_BUCKETS + (index - 2 * _SUB_BUCKETS) % _SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    HDR-style latency histogram with log-linear buckets.
+
+    Durations are recorded in microseconds into sparse buckets, so memory stays
+    small and percentiles are accurate to a few percent at any scale.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._buckets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        index = _bucket_index(max(0, int(seconds * 1_000_000)))
+        with self._lock:
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Value in seconds at or below which `fraction` of the samples fall."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = max(1, int(round(fraction * self.count)))
+            seen = 0
+            for index in sorted(self._buckets):
+                seen += self._buckets[index]
+                if seen >= target:
+                    return min(_bucket_upper(index) / 1_000_000, self.max)
+            return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Count plus mean and percentiles in milliseconds."""
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'min_ms': (self.min or 0.0) * 1000,
+            'p50_ms': self.percentile(0.50) * 1000,
+            'p90_ms': self.percentile(0.90) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': (self.max or 0.0) * 1000,
+        }
+
+
+class _Span:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._finish_span(self.name, self.labels, self.start, exc_type is not None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Span timers, latency histograms and counters for the roast pipeline.
+
+    Disabled by default: every call returns immediately and `span` hands out a
+    shared no-op context manager. When enabled, finished spans are recorded
+    into histograms and optionally appended to a JSONL file, and everything
+    can be scraped as Prometheus text.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.environ.get(METRICS_ENV_FLAG, "0") == "1"
+        self.enabled = enabled
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+        self._jsonl = None
+        self._jsonl_lock = threading.Lock()
+        self._server: Optional["ThreadingHTTPServer"] = None
+
+    def span(self, name: str, **labels):
+        """Context manager timing a block as `name`."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, _labels(labels))
+
+    def _finish_span(self, name: str, labels: Labels, start: float, failed: bool) -> None:
+        duration = time.perf_counter() - start
+        self._histogram(name, labels).record(duration)
+        if failed:
+            self._add(f"{name}_errors", labels, 1)
+        if self._jsonl is not None:
+            event = {
+                'ts': time.time(),
+                'span': name,
+                'labels': dict(labels),
+                'duration_ms': duration * 1000,
+                'error': failed,
+            }
+            line = json.dumps(event) + "\n"
+            with self._jsonl_lock:
+                if self._jsonl is not None:
+                    self._jsonl.write(line)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record a duration measured elsewhere."""
+        if self.enabled:
+            self._histogram(name, _labels(labels)).record(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Add to a counter, e.g. bytes uploaded or tokens used."""
+        if self.enabled:
+            self._add(name, _labels(labels), amount)
+
+    def _histogram(self, name: str, labels: Labels) -> Histogram:
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def _add(self, name: str, labels: Labels, amount: float) -> None:
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @staticmethod
+    def _key_name(name: str, labels: Labels) -> str:
+        if not labels:
+            return name
+        return name + "{" + ",".join(f"{key}={value}" for key, value in labels) + "}"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Histogram summaries and counter values keyed by name and labels."""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = dict(self._counters)
+        return {
+            'spans': {self._key_name(name, labels): histogram.summary() for (name, labels), histogram in histograms},
+            'counters': {self._key_name(name, labels): value for (name, labels), value in counters.items()},
+        }
+
+    def render_prometheus(self, prefix: str = "scrapyard_") -> str:
+        """Prometheus text exposition: spans as summaries in seconds, counters as totals."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        def metric_name(name):
+            return prefix + "".join(c if c.isalnum() else "_" for c in name)
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        typed = set()
+        for (name, labels), histogram in histograms:
+            metric = metric_name(name) + "_seconds"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} summary")
+                typed.add(metric)
+            for quantile in (0.5, 0.9, 0.99):
+                lines.append(f"{metric}{label_text(labels, [('quantile', quantile)])} {histogram.percentile(quantile):.6f}")
+            lines.append(f"{metric}_sum{label_text(labels)} {histogram.total:.6f}")
+            lines.append(f"{metric}_count{label_text(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            metric = metric_name(name) + "_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export_jsonl(self, path: str) -> None:
+        """Append every finished span to a JSONL file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._jsonl_lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+            self._jsonl = open(path, "a", encoding="utf-8", buffering=1)
+        logger.info(f"Writing spans to {path}")
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """Serve /metrics in Prometheus text format from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{self._server.server_address[1]}/metrics")
+        return self._server
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def close(self) -> None:
+        """Stop the metrics endpoint and close the JSONL file."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._jsonl_lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+def configure_metrics(enabled: bool = True,
+                      jsonl_path: Optional[str] = None,
+                      prometheus_port: Optional[int] = None) -> MetricsRegistry:
+    """
+    Turn the shared registry on or off and attach exporters.
+
+    Args:
+        enabled: Record spans and counters
+        jsonl_path: Append finished spans to this file (SCRAPYARD_METRICS_JSONL)
+        prometheus_port: Serve Prometheus text on this port (SCRAPYARD_METRICS_PORT)
+
+    Returns:
+        The shared registry
+    """
+    jsonl_path = jsonl_path or os.environ.get(METRICS_JSONL_ENV)
+    if prometheus_port is None and os.environ.get(METRICS_PORT_ENV):
+        prometheus_port = int(os.environ[METRICS_PORT_ENV])
+
+    _registry.enabled = enabled
+    if enabled and jsonl_path:
+        _registry.export_jsonl(jsonl_path)
+    if enabled and prometheus_port is not None:
+        _registry.serve(prometheus_port)
+    return _registry
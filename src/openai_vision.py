@@ -1,11 +1,45 @@
-from openai import OpenAI
 from enum import Enum
-from dotenv import load_dotenv
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
 import os
 import base64
+import json
+import logging
+import random
+import re
+import threading
+import time
 
-from .screenshot import ScreenshotManager, PathType
-load_dotenv()
+from .screenshot import ScreenshotManager
+from .image_encoder import ImageEncoder, ImageFormat
+from .image_preprocess import ImagePreprocessor, PreparedImage
+from .response_cache import ResponseCache, digest
+from .metrics import get_metrics
+from .governor import CallPlan, get_governor
+from .incremental import FrameChange
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# The OpenAI SDK (with pydantic and httpx) and python-dotenv are imported on
+# first use rather than at import time, to keep startup fast.
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+
+_default_encoder = ImageEncoder(ImageFormat.JPEG)
+_default_preprocessor = ImagePreprocessor()
+
+ROAST_INSTRUCTIONS = """Please make a funny roast about what's on this screen. Assume that you are told it is a description of a user's screen. But actually make it funny, it can also be about the user who is on this screen. Make it harsh and personal, don't forget to make jokes about assumptions based on stereotypes or clichés. If you are not able to make a joke about something, then don't. Try and keep it short and snippy, witty but never not humorus. Dont forget to make this short, one sentance or two. And I repeat, harsh and personal with dark humor. You are meant to be someone critical of this person, NOT your friend. AGAIN, BE HARSH AND SNAPPY. THIS IS MESNT TO BE A BIT DEGRADING BUT ALL IN GOOD HUMOR. THE MORE UNSESSISARLY PERSONAL THIS IS. ALSO THIS IS IN THE VOICE OF MORGAN FREEMAN. So you can say things like 'as morgan freeman' or 'as morgan freeman would say' or 'as morgan freeman said' ONLY IF FITS WITH THE JOKE TO MAKE IT MORE FUNNY!"""
+
+COMBINED_INSTRUCTIONS = """Reply with a JSON object with exactly two string fields. "description" answers the request above about the screenshot. "joke" is a roast of what's on this screen: """ + ROAST_INSTRUCTIONS
 
 class ImageProcessingOpenAIModelTypes(Enum):
     GPT_4_O = "gpt-4o"
@@ -16,50 +50,287 @@ class ImageProcessingInputDetail(Enum):
     HIGH = "high"
     AUTO = "auto"
 
+class AnalysisMode(Enum):
+    TWO_PASS = "two_pass"
+    COMBINED = "combined"
+
+@dataclass
+class ClientSettings:
+    """Connection pool, timeout and retry settings for the shared OpenAI client."""
+    api_key: Optional[str] = None
+    base_url: Optional[str] = None
+    http2: bool = False
+    max_connections: int = 10
+    max_keepalive_connections: int = 5
+    keepalive_expiry: float = 120.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+
+class OpenAIClientManager:
+    """
+    Process-wide OpenAI client backed by one persistent httpx connection pool.
+
+    Reusing the pool keeps connections alive between cycles, so only the first
+    request pays for DNS, TCP and TLS setup. Requests made through `call` are
+    retried on 429, 5xx and connection errors with full-jitter exponential
+    backoff; the SDK's own retries are disabled so the two don't stack.
+    """
+
+    def __init__(self, settings: Optional[ClientSettings] = None):
+        self.settings = settings or ClientSettings()
+        self.retries = 0
+        self._client = None
+        self._http_client = None
+        self._lock = threading.Lock()
+
+    def _build_http_client(self):
+        import httpx
+
+        settings = self.settings
+        http2 = settings.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+                http2 = False
+
+        return httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout),
+        )
+
+    @property
+    def client(self) -> "OpenAI":
+        """The shared client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                from dotenv import load_dotenv
+                from openai import OpenAI
+
+                load_dotenv()
+                self._http_client = self._build_http_client()
+                self._client = OpenAI(
+                    api_key=self.settings.api_key or os.environ.get('OPENAI_API_KEY'),
+                    base_url=self.settings.base_url,
+                    http_client=self._http_client,
+                    max_retries=0,
+                )
+            return self._client
+
+    def _should_retry(self, error: Exception) -> bool:
+        from openai import APIConnectionError, APIStatusError
+
+        if isinstance(error, APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, APIConnectionError)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        from openai import APIStatusError
+
+        retry_after = None
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.settings.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.settings.backoff_max, self.settings.backoff_base * 2 ** attempt))
+
+    def call(self, func, *args, **kwargs):
+        """Call `func`, retrying transient API failures with jittered backoff."""
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.settings.max_retries or not self._should_retry(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"OpenAI request failed ({e}), retry {attempt}/{self.settings.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def close(self) -> None:
+        """Close the connection pool; the next `client` access opens a new one."""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._client = None
+            self._http_client = None
+
+_client_manager = None
+_client_manager_lock = threading.Lock()
+
+def get_client_manager():
+    """Return the process-wide OpenAIClientManager."""
+    global _client_manager
+    with _client_manager_lock:
+        if _client_manager is None:
+            _client_manager = OpenAIClientManager()
+        return _client_manager
+
+def configure_openai_client(settings):
+    """Replace the process-wide client manager with one using `settings`."""
+    global _client_manager
+    with _client_manager_lock:
+        if _client_manager is not None:
+            _client_manager.close()
+        _client_manager = OpenAIClientManager(settings)
+        return _client_manager
+
 def load_openai_client():
-    """Initialize and return an OpenAI client using the API key from environment variables."""
-    return OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+    """Return the shared OpenAI client, using the API key from environment variables."""
+    return get_client_manager().client
+
+def _create_completion(client, plan: CallPlan, **kwargs):
+    """Create a chat completion through the shared retry policy, admitting every attempt with the spend governor.
+
+    Usage of regular completions is recorded here; streamed ones report it
+    with their last chunk, see `_record_usage`. Failed attempts are charged
+    at the plan's estimate, so retries count against the limits and budget.
+    """
+    governor = get_governor()
+
+    def attempt(**kwargs):
+        governor.admit(plan)
+        try:
+            return client.chat.completions.create(**kwargs)
+        except Exception:
+            governor.record(plan)
+            raise
+
+    kind = "stream" if kwargs.get("stream") else "request"
+    with registry.span("openai_request", model=kwargs.get("model"), kind=kind):
+        completion = get_client_manager().call(attempt, **kwargs)
+    if not kwargs.get("stream"):
+        _record_usage(plan, getattr(completion, "usage", None))
+    return completion
+
+def _record_usage(plan, usage):
+    """Count tokens and spend; without `usage` the plan's estimate is charged."""
+    if usage is not None:
+        registry.inc("openai_prompt_tokens", usage.prompt_tokens, model=plan.model_type.value)
+        registry.inc("openai_completion_tokens", usage.completion_tokens, model=plan.model_type.value)
+        get_governor().record(plan, usage.prompt_tokens, usage.completion_tokens)
+    else:
+        get_governor().record(plan)
+
+def _image_size(image):
+    """(width, height) of a path, PreparedImage or PIL image, without decoding files."""
+    if isinstance(image, PreparedImage):
+        return image.width, image.height
+    if isinstance(image, (str, os.PathLike)):
+        from PIL import Image
+
+        with Image.open(image) as opened:
+            return opened.size
+    return image.size
 
 def encode_image(image_path):
     """Convert an image file to base64 encoding."""
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode("utf-8")
 
-def process_image_with_openai(client, image_path, prompt, model_type=ImageProcessingOpenAIModelTypes.GPT_4_O, detail=ImageProcessingInputDetail.AUTO):
-    """Process an image with OpenAI's vision API."""
-    base64_image = encode_image(image_path)
-    
-    completion = client.chat.completions.create(
-        model=model_type.value,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}",
-                            "detail": detail.value
-                        },
+def image_to_data_url(image, encoder=None):
+    """Build a data URL for an image file path, a PreparedImage or an in-memory PIL image."""
+    with registry.span("encode_base64"):
+        if isinstance(image, PreparedImage):
+            data_url = image.data_url
+        elif isinstance(image, (str, os.PathLike)):
+            mime_type = _MIME_TYPES.get(os.path.splitext(image)[1].lower(), "image/png")
+            data_url = f"data:{mime_type};base64,{encode_image(image)}"
+        else:
+            data_url = (encoder or _default_encoder).to_data_url(image)
+    registry.inc("image_upload_bytes", len(data_url))
+    return data_url
+
+def _vision_messages(prompt, image_url, detail):
+    """Chat messages sending a text prompt together with an image."""
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url,
+                        "detail": detail.value
                     },
-                ],
-            }
-        ],
+                },
+            ],
+        }
+    ]
+
+def process_image_with_openai(client, image, prompt, model_type=ImageProcessingOpenAIModelTypes.GPT_4_O, detail=ImageProcessingInputDetail.AUTO, encoder=None, cache=None):
+    """Process an image with OpenAI's vision API.
+
+    `image` may be a path to an image file, a PreparedImage or an in-memory PIL
+    image; PIL images are encoded with `encoder` (a shared JPEG encoder by default).
+    With a ResponseCache, identical model/detail/prompt/image requests are
+    answered from the cache. The spend governor only sees cache misses: it may
+    lower the detail level, and raises BudgetExceeded when the request should
+    be skipped. Responses are cached under the requested model and detail.
+    """
+    image_url = image_to_data_url(image, encoder)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = ResponseCache.make_key("vision", model_type.value, detail.value, prompt, digest(image_url))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion
+
+            return ChatCompletion.model_validate_json(cached)
+
+    plan = get_governor().plan(model_type, detail, _image_size(image), prompt)
+    completion = _create_completion(
+        client,
+        plan,
+        model=plan.model_type.value,
+        messages=_vision_messages(prompt, image_url, plan.detail),
     )
+
+    if cache_key is not None:
+        cache.put(cache_key, completion.model_dump_json())
     
     return completion
 
-def generate_joke_from_description(client, description, model_type=ImageProcessingOpenAIModelTypes.GPT_4_O):
-    """Generate a joke about the content of a screen based on its description."""
-    prompt = f"""The following is a description of what's on a user's screen: 
+def _joke_prompt(description):
+    """Prompt asking for a roast of a screen description."""
+    return f"""The following is a description of what's on a user's screen: 
     
     {description}
     
-    Please make a funny roast about what's on this screen. Assume that you are told it is a description of a user's screen. But actually make it funny, it can also be about the user who is on this screen. Make it harsh and personal, don't forget to make jokes about assumptions based on stereotypes or clichés. If you are not able to make a joke about something, then don't. Try and keep it short and snippy, witty but never not humorus. Dont forget to make this short, one sentance or two. And I repeat, harsh and personal with dark humor. You are meant to be someone critical of this person, NOT your friend. AGAIN, BE HARSH AND SNAPPY. THIS IS MESNT TO BE A BIT DEGRADING BUT ALL IN GOOD HUMOR. THE MORE UNSESSISARLY PERSONAL THIS IS. ALSO THIS IS IN THE VOICE OF MORGAN FREEMAN. So you can say things like 'as morgan freeman' or 'as morgan freeman would say' or 'as morgan freeman said' ONLY IF FITS WITH THE JOKE TO MAKE IT MORE FUNNY!"""
-    
-    completion = client.chat.completions.create(
-        model=model_type.value,
+    {ROAST_INSTRUCTIONS}"""
+
+def generate_joke_from_description(client, description, model_type=ImageProcessingOpenAIModelTypes.GPT_4_O, cache=None):
+    """Generate a joke about the content of a screen based on its description."""
+    prompt = _joke_prompt(description)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = ResponseCache.make_key("joke", model_type.value, digest(description))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    plan = get_governor().plan(model_type, prompt=prompt)
+    completion = _create_completion(
+        client,
+        plan,
+        model=plan.model_type.value,
         messages=[
             {
                 "role": "user",
@@ -67,35 +338,275 @@ def generate_joke_from_description(client, description, model_type=ImageProcessi
             }
         ],
     )
+
+    joke = completion.choices[0].message.content
+    if cache_key is not None and joke:
+        cache.put(cache_key, joke)
     
-    return completion.choices[0].message.content
+    return joke
+
+class SentenceSplitter:
+    """Accumulate streamed text and release it one complete sentence at a time."""
+
+    _BOUNDARY = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text):
+        """Add a chunk of text and return the sentences it completed."""
+        self._pending += text
+        sentences = []
+        while True:
+            match = self._BOUNDARY.search(self._pending)
+            if match is None:
+                break
+            sentence = self._pending[:match.end()].strip()
+            self._pending = self._pending[match.end():]
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self):
+        """Return whatever text is left once the stream has ended."""
+        remainder, self._pending = self._pending.strip(), ""
+        return [remainder] if remainder else []
+
+def stream_joke_from_description(client, description, model_type=ImageProcessingOpenAIModelTypes.GPT_4_O, cache=None):
+    """Generate a roast with a streaming completion, yielding it sentence by sentence.
+
+    Each sentence is yielded as soon as its closing punctuation arrives, so
+    speech can start long before the whole joke has been generated. Cached
+    jokes are split and yielded immediately.
+    """
+    splitter = SentenceSplitter()
+    prompt = _joke_prompt(description)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = ResponseCache.make_key("joke", model_type.value, digest(description))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield from splitter.feed(cached)
+            yield from splitter.flush()
+            return
+
+    plan = get_governor().plan(model_type, prompt=prompt)
+    started = time.perf_counter()
+    stream = _create_completion(
+        client,
+        plan,
+        model=plan.model_type.value,
+        messages=[
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    parts = []
+    usage = None
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            if not parts:
+                registry.observe("joke_first_token", time.perf_counter() - started)
+            parts.append(text)
+            yield from splitter.feed(text)
+    yield from splitter.flush()
+    registry.observe("joke_stream", time.perf_counter() - started)
+    _record_usage(plan, usage)
+
+    if cache_key is not None and parts:
+        cache.put(cache_key, "".join(parts))
+
+def _remember_streamed_joke(sentences, frame_cache, frame_hash, analysis):
+    """Pass sentences through and store the full joke in the frame cache at the end."""
+    spoken = []
+    for sentence in sentences:
+        spoken.append(sentence)
+        yield sentence
+    if frame_cache is not None and spoken:
+        frame_cache.store(frame_hash, analysis, " ".join(spoken))
+
+def analyze_and_roast(client, image, prompt, model_type=ImageProcessingOpenAIModelTypes.GPT_4_O, detail=ImageProcessingInputDetail.AUTO, encoder=None, cache=None):
+    """Describe an image and roast it in a single request.
+
+    The model is asked for a JSON object with `description` and `joke` fields,
+    saving the second round trip of the two-pass path. If the reply cannot be
+    parsed, the raw text is used as the description and the joke is generated
+    with a separate call.
+
+    Returns:
+        A (description, joke) tuple
+    """
+    full_prompt = f"{prompt}\n\n{COMBINED_INSTRUCTIONS}"
+    image_url = image_to_data_url(image, encoder)
+
+    cache_key = None
+    content = None
+    if cache is not None:
+        cache_key = ResponseCache.make_key("combined", model_type.value, detail.value, prompt, digest(image_url))
+        content = cache.get(cache_key)
+
+    if content is None:
+        plan = get_governor().plan(model_type, detail, _image_size(image), full_prompt)
+        completion = _create_completion(
+            client,
+            plan,
+            model=plan.model_type.value,
+            messages=_vision_messages(full_prompt, image_url, plan.detail),
+            response_format={"type": "json_object"},
+        )
+        content = completion.choices[0].message.content
+
+    try:
+        result = json.loads(content)
+        description, joke = result["description"], result["joke"]
+    except (TypeError, ValueError, KeyError) as e:
+        logger.warning(f"Combined response was not valid JSON ({e}), falling back to a separate joke call")
+        return content, generate_joke_from_description(client, content, model_type, cache=cache)
+
+    if cache_key is not None:
+        cache.put(cache_key, content)
+    return description, joke
 
 def take_screenshot_and_analyze(prompt="Describe this image", 
                               model_type=ImageProcessingOpenAIModelTypes.GPT_4_O,
                               detail=ImageProcessingInputDetail.AUTO,
-                              generate_joke=False):
-    """Take a screenshot and analyze it with OpenAI. Optionally generate a joke about the content."""
+                              generate_joke=False,
+                              in_memory=True,
+                              preprocessor=_default_preprocessor,
+                              frame_cache=None,
+                              response_cache=None,
+                              mode=AnalysisMode.TWO_PASS,
+                              stream_joke=False,
+                              screenshot_manager=None,
+                              incremental=None,
+                              capture_worker=None):
+    """Take a screenshot and analyze it with OpenAI. Optionally generate a joke about the content.
+
+    With `in_memory` (the default) the captured frame is encoded straight into a
+    reusable buffer; otherwise it is saved to ai_test_screenshot.png first.
+    In-memory frames are downscaled and compressed for `detail` by `preprocessor`
+    unless it is None. When a FrameCache is given, a near-duplicate of an
+    earlier frame reuses its description and joke without calling the API.
+    `response_cache` is a persistent ResponseCache passed to both API calls.
+    With `mode=AnalysisMode.COMBINED` and `generate_joke`, the description and
+    joke come back from one request instead of two serial ones.
+    With `stream_joke`, the second item returned is an iterator of joke
+    sentences streamed from the API (always two-pass) rather than a string.
+    Pass a long-lived `screenshot_manager` to keep its capture backend open
+    between calls.
+    With an IncrementalAnalyzer (in-memory only), a frame that changed only a
+    little is sent as a crop of the changed region together with the previous
+    description, and an unchanged frame reuses that description outright.
+    With a running CaptureWorker (in-memory, without `incremental`, which
+    needs the pixels here), the worker crops `screenshot_manager`'s region,
+    fingerprints and compresses it, and only the encoded image comes back.
+    """
     os.system('cls' if os.name == 'nt' else 'clear')
     
-    screenshot_manager = ScreenshotManager()
-    image_path = screenshot_manager.save_and_get_path("ai_test_screenshot.png")
-    
-    openai_client = load_openai_client()
-    completion = process_image_with_openai(
-        openai_client,
-        image_path, 
-        prompt, 
-        model_type=model_type, 
-        detail=detail
-    )
-    
-    analysis = completion.choices[0].message.content
-    
-    if generate_joke:
-        joke = generate_joke_from_description(openai_client, analysis, model_type)
-        return analysis, joke
+    screenshot_manager = screenshot_manager or ScreenshotManager()
+    frame = None
+    encoded = None
+    with registry.span("capture"):
+        if capture_worker is not None and in_memory and incremental is None and preprocessor is not None:
+            rect = screenshot_manager.resolve()
+            encoded = capture_worker.encode(
+                detail=detail.value,
+                preprocessor=preprocessor,
+                bbox=rect.bbox if rect is not None else None,
+                hash_size=frame_cache.hash_size if frame_cache is not None else None,
+            )
+        else:
+            frame = screenshot_manager.take()
+
+    frame_hash = None
+    cached = None
+    if frame_cache is not None:
+        with registry.span("fingerprint"):
+            frame_hash = encoded.fingerprint if encoded is not None else frame_cache.fingerprint(frame)
+            cached = frame_cache.lookup(frame_hash)
+        registry.inc("frame_cache_hits" if cached is not None else "frame_cache_misses")
+
+    openai_client = None
+    increment = incremental.plan(frame) if incremental is not None and in_memory and cached is None else None
+    if cached is not None:
+        analysis = cached.description
+    elif increment is not None and increment.change == FrameChange.UNCHANGED:
+        analysis = increment.previous_description
+    else:
+        if increment is not None:
+            prompt = increment.prompt(prompt, frame.size)
+        if encoded is not None:
+            image = encoded.image
+        elif in_memory:
+            image = increment.image if increment is not None and increment.change == FrameChange.CROP else frame
+            if preprocessor is not None:
+                with registry.span("preprocess"):
+                    image = preprocessor.prepare(image, detail.value)
+        else:
+            with registry.span("save_png"):
+                image = screenshot_manager.save_and_get_path("ai_test_screenshot.png")
+
+        openai_client = load_openai_client()
+        if generate_joke and mode == AnalysisMode.COMBINED and not stream_joke:
+            with registry.span("analyze_and_roast"):
+                analysis, joke = analyze_and_roast(
+                    openai_client,
+                    image,
+                    prompt,
+                    model_type=model_type,
+                    detail=detail,
+                    cache=response_cache
+                )
+            if increment is not None:
+                incremental.commit(frame, analysis, increment)
+            if frame_cache is not None:
+                frame_cache.store(frame_hash, analysis, joke)
+            return analysis, joke
+
+        with registry.span("vision"):
+            completion = process_image_with_openai(
+                openai_client,
+                image,
+                prompt,
+                model_type=model_type,
+                detail=detail,
+                cache=response_cache
+            )
+        analysis = completion.choices[0].message.content
+        if increment is not None:
+            incremental.commit(frame, analysis, increment)
     
-    return analysis
+    if not generate_joke:
+        if frame_cache is not None and cached is None:
+            frame_cache.store(frame_hash, analysis)
+        return analysis
+
+    if cached is not None and cached.joke is not None:
+        if stream_joke:
+            splitter = SentenceSplitter()
+            return analysis, iter(splitter.feed(cached.joke) + splitter.flush())
+        return analysis, cached.joke
+
+    if stream_joke:
+        sentences = stream_joke_from_description(openai_client or load_openai_client(), analysis, model_type, cache=response_cache)
+        return analysis, _remember_streamed_joke(sentences, frame_cache, frame_hash, analysis)
+
+    with registry.span("joke"):
+        joke = generate_joke_from_description(openai_client or load_openai_client(), analysis, model_type, cache=response_cache)
+    if frame_cache is not None:
+        frame_cache.store(frame_hash, analysis, joke)
+    return analysis, joke
 
 if __name__ == "__main__":
     result = take_screenshot_and_analyze()
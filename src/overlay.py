@@ -0,0 +1,285 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+import pygame
+
+try:
+    from pygame._sdl2.video import Window as SDLWindow
+except ImportError:
+    SDLWindow = None
+
+from .image_render import ImageRenderer, QUIT_EVENT, make_layered_topmost, win32con, win32gui
+from .resource_path import get_resource_path
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+
+class SurfaceCache:
+    """
+    Decoded, display-converted surfaces keyed by resource path.
+
+    Only touched from the render thread, since convert_alpha needs the display
+    that owns the surfaces.
+    """
+
+    def __init__(self):
+        self._surfaces: Dict[str, pygame.Surface] = {}
+
+    def get(self, image_path: str) -> pygame.Surface:
+        """
+        Return the converted surface for an image, decoding it on first use.
+
+        Raises:
+            FileNotFoundError: If the image does not exist
+            pygame.error: If the image cannot be decoded
+        """
+        surface = self._surfaces.get(image_path)
+        if surface is None:
+            resource_path = get_resource_path(image_path)
+            if not os.path.isfile(resource_path):
+                raise FileNotFoundError(f"Image file does not exist at {resource_path}")
+            surface = pygame.image.load(resource_path).convert_alpha()
+            self._surfaces[image_path] = surface
+            logger.info(f"Cached surface {image_path} ({surface.get_width()}x{surface.get_height()})")
+        return surface
+
+    def __contains__(self, image_path: str) -> bool:
+        return image_path in self._surfaces
+
+    def __len__(self) -> int:
+        return len(self._surfaces)
+
+
+class OverlayRenderer:
+    """
+    Long-lived overlay window that is shown and hidden on demand.
+
+    SDL is initialized once on a dedicated render thread, which keeps a hidden
+    window and a cache of converted surfaces for the life of the process.
+    Showing the overlay only swaps the surface, moves the window and redraws,
+    instead of re-initializing pygame and re-decoding the image every cycle.
+    """
+
+    def __init__(self):
+        self.renderer: Optional[ImageRenderer] = None
+        self.surfaces = SurfaceCache()
+        self.visible = False
+        self._size: Tuple[int, int] = (0, 0)
+        self._styled_hwnd = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._start_error: Optional[Exception] = None
+
+    def start(self, timeout: float = 10.0) -> None:
+        """Start the render thread and wait until its hidden window exists."""
+        with self._start_lock:
+            if self._thread is None:
+                self._start_error = None
+                self._thread = threading.Thread(target=self._run, name="overlay-render", daemon=True)
+                self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Overlay render thread did not start")
+        if self._start_error is not None:
+            raise RuntimeError(f"Overlay render thread failed to start: {self._start_error}")
+
+    def _run(self) -> None:
+        try:
+            self.renderer = ImageRenderer(hidden=True)
+            self.renderer.quit_handler = self._hide_now
+            self.renderer.image = pygame.Surface((1, 1))
+            self.renderer.width, self.renderer.height = 1, 1
+            self.renderer.screen = self.renderer._temp_surface
+            self.renderer.hwnd = pygame.display.get_wm_info().get("window")
+            self._size = (1, 1)
+            self.renderer.running = True
+            if win32gui is None:
+                logger.warning("pywin32 is not available; the overlay is shown through SDL, "
+                               "without color-key transparency or staying on top")
+        except Exception as e:
+            self._start_error = e
+            self._thread = None
+            return
+        finally:
+            self._ready.set()
+        self.renderer.start_render_loop()
+
+    def _call(self, func, timeout: Optional[float]):
+        """Run `func` on the render thread and wait for its result."""
+        if self._thread is None:
+            self.start()
+        if threading.current_thread() is self._thread:
+            return func()
+
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+
+        self.renderer.call_soon(run)
+        return future.result(timeout)
+
+    def preload(self, image_path: str, timeout: Optional[float] = 5.0) -> Tuple[int, int]:
+        """
+        Decode and convert an image ahead of time.
+
+        Returns:
+            The image size as (width, height)
+        """
+        return self._call(lambda: self.surfaces.get(image_path).get_size(), timeout)
+
+    def _present(self, surface: pygame.Surface, size: Tuple[int, int], position: Tuple[int, int],
+                 source_rect: Optional[pygame.Rect] = None) -> None:
+        """Point the renderer at a surface, size and place the window, and show it."""
+        renderer = self.renderer
+        if size != self._size:
+            renderer.screen = pygame.display.set_mode(size, pygame.NOFRAME | pygame.HIDDEN)
+            renderer.hwnd = pygame.display.get_wm_info().get("window")
+            self._size = size
+
+        renderer.image = surface
+        renderer.source_rect = source_rect
+        renderer.width, renderer.height = size
+        if renderer.hwnd is None or win32gui is None:
+            self._set_sdl_window_visible(True, size, position)
+        elif renderer.hwnd != self._styled_hwnd:
+            make_layered_topmost(renderer.hwnd, position, size)
+            self._styled_hwnd = renderer.hwnd
+        else:
+            win32gui.SetWindowPos(
+                renderer.hwnd,
+                win32con.HWND_TOPMOST,
+                position[0], position[1],
+                size[0], size[1],
+                win32con.SWP_SHOWWINDOW | win32con.SWP_NOACTIVATE
+            )
+        self.visible = True
+        renderer._mark_dirty()
+
+    def _set_sdl_window_visible(self, visible: bool, size: Tuple[int, int],
+                                position: Optional[Tuple[int, int]] = None) -> None:
+        """Show or hide (and place) the window through SDL, where pywin32 cannot."""
+        if SDLWindow is not None:
+            window = SDLWindow.from_display_module()
+            if position is not None:
+                window.position = position
+            if visible:
+                window.show()
+            else:
+                window.hide()
+        else:
+            flags = pygame.NOFRAME | (pygame.SHOWN if visible else pygame.HIDDEN)
+            self.renderer.screen = pygame.display.set_mode(size, flags)
+
+    def _show_now(self, image_path: str, position: Tuple[int, int]) -> Tuple[int, int]:
+        self._stop_animation_now()
+        surface = self.surfaces.get(image_path)
+        size = surface.get_size()
+        self._present(surface, size, position)
+        return size
+
+    def _play_animation_now(self, atlas, track, position, started_at) -> None:
+        renderer = self.renderer
+        surface = self.surfaces.get(atlas.image_path)
+        if not atlas.frame_rects:
+            atlas.layout(surface.get_size())
+        rects = atlas.frame_rects
+
+        self._present(surface, atlas.frame_size, position, rects[track.rest_frame])
+        renderer.frame_budget_ms = 1000 / track.fps
+        current = [track.rest_frame]
+
+        def tick():
+            if track.started is None and started_at is not None:
+                started = started_at()
+                if started is not None:
+                    track.start(started)
+            frame = track.frame_at(time.perf_counter())
+            if frame is None:
+                renderer.set_tick_interval(None)
+                frame = track.rest_frame
+            if frame == current[0]:
+                return []
+            current[0] = frame
+            renderer.source_rect = rects[frame]
+            return None
+
+        renderer.set_tick_interval(max(1, int(1000 / track.fps)), tick)
+
+    def _stop_animation_now(self) -> None:
+        renderer = self.renderer
+        if renderer.frame_budget_ms is not None:
+            renderer.set_tick_interval(None)
+            renderer.frame_budget_ms = None
+            logger.info(f"Animation stopped: {renderer.stats.as_dict()}")
+
+    def play_animation(self, atlas, track, position: Tuple[int, int],
+                       started_at: Optional[Callable[[], Optional[float]]] = None,
+                       timeout: Optional[float] = 5.0) -> None:
+        """
+        Show a sprite atlas animation driven by a precomputed FrameTrack.
+
+        The atlas is decoded once into the surface cache and its frame rects
+        are computed up front, so each tick only selects a rect and blits.
+
+        Args:
+            atlas: SpriteAtlas to animate
+            track: FrameTrack with one atlas frame per tick
+            position: Overlay position on screen
+            started_at: Returns the perf_counter time audio started, or None
+                while it has not started yet; the track starts then. Without
+                it the track starts immediately.
+        """
+        if started_at is None:
+            track.start()
+        self._call(lambda: self._play_animation_now(atlas, track, position, started_at), timeout)
+
+    def stop_animation(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop ticking the animation, leaving the current frame on screen."""
+        self._call(self._stop_animation_now, timeout)
+
+    def _hide_now(self) -> None:
+        if self.visible:
+            if self.renderer.hwnd and win32gui is not None:
+                win32gui.ShowWindow(self.renderer.hwnd, win32con.SW_HIDE)
+            else:
+                self._set_sdl_window_visible(False, self._size)
+        self.visible = False
+
+    def show(self, image_path: str, position: Tuple[int, int], timeout: Optional[float] = 5.0) -> Tuple[int, int]:
+        """
+        Show an image in the overlay window at a screen position.
+
+        Safe to call from any thread; returns once the window is visible.
+
+        Returns:
+            The overlay size as (width, height)
+        """
+        start = time.perf_counter()
+        size = self._call(lambda: self._show_now(image_path, position), timeout)
+        elapsed = time.perf_counter() - start
+        registry.observe("overlay_show", elapsed)
+        logger.info(f"Overlay visible at {position} in {elapsed * 1000:.1f} ms")
+        return size
+
+    def hide(self, timeout: Optional[float] = 5.0) -> None:
+        """Hide the overlay window without tearing anything down."""
+        self._call(self._hide_now, timeout)
+
+    def shutdown(self, timeout: float = 2.0) -> None:
+        """Stop the render thread and release SDL."""
+        if self._thread is None:
+            return
+        pygame.event.post(pygame.event.Event(QUIT_EVENT))
+        self._thread.join(timeout)
+        self._thread = None
+        self._ready.clear()
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .openai_vision import (
+    ImageProcessingInputDetail,
+    ImageProcessingOpenAIModelTypes,
+    generate_joke_from_description,
+    load_openai_client,
+    process_image_with_openai,
+)
+from .image_preprocess import ImagePreprocessor
+from .screenshot import ScreenshotManager
+from .tts import SpeechMode
+from .metrics import get_metrics
+from .governor import BudgetExceeded, get_governor
+from .incremental import FrameChange
+
+logger = logging.getLogger(__name__)
+registry = get_metrics()
+
+_END = object()
+
+
+@dataclass
+class CycleContext:
+    """State carried through the pipeline for one capture-to-speech cycle."""
+    cycle: int
+    started: float = field(default_factory=time.perf_counter)
+    frame: Any = None
+    frame_hash: Optional[int] = None
+    image: Any = None
+    prompt: Optional[str] = None
+    increment: Any = None
+    description: Optional[str] = None
+    joke: Optional[str] = None
+    overlay: Any = None
+    cached: bool = False
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+@dataclass
+class PipelineStage:
+    """
+    One step of the pipeline.
+
+    `func` runs on the stage's own worker thread and either returns the
+    context to hand it to the next stage, or None to drop the cycle. Each stage
+    keeps a single dedicated thread, so thread-affine resources (SDL windows,
+    the speech engine) always see the same thread.
+    """
+    name: str
+    func: Callable[[CycleContext], Optional[CycleContext]]
+    queue_size: int = 1
+
+
+class AsyncPipeline:
+    """
+    Run stages concurrently with bounded queues between them.
+
+    Cycle N+1 can be captured and encoded while cycle N is still being spoken,
+    so throughput is bounded by the slowest stage rather than the sum of all
+    stages. Bounded queues provide backpressure: a fast stage waits instead of
+    piling up stale frames.
+    """
+
+    def __init__(self,
+                 stages: List[PipelineStage],
+                 interval: float = 0.0,
+                 max_cycles: Optional[int] = None,
+                 on_complete: Optional[Callable[[CycleContext], None]] = None):
+        """
+        Args:
+            stages: Stages in execution order; the first one receives new cycles
+            interval: Minimum seconds between the starts of two cycles
+            max_cycles: Stop after this many cycles, or run until cancelled
+            on_complete: Called with each context that made it through every stage
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+
+        self.stages = stages
+        self.interval = interval
+        self.max_cycles = max_cycles
+        self.on_complete = on_complete
+        self.completed = 0
+        self.dropped = 0
+        self._executors = {stage.name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"pipeline-{stage.name}")
+                           for stage in stages}
+        self._tasks: List[asyncio.Task] = []
+
+    async def _produce(self, queue: asyncio.Queue) -> None:
+        cycle = 0
+        try:
+            while self.max_cycles is None or cycle < self.max_cycles:
+                started = time.perf_counter()
+                await queue.put(CycleContext(cycle=cycle))
+                cycle += 1
+                wait = self.interval - (time.perf_counter() - started)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        finally:
+            await queue.put(_END)
+
+    async def _work(self, stage: PipelineStage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]) -> None:
+        loop = asyncio.get_running_loop()
+        executor = self._executors[stage.name]
+        while True:
+            ctx = await inbox.get()
+            if ctx is _END:
+                if outbox is not None:
+                    await outbox.put(_END)
+                return
+
+            start = time.perf_counter()
+            if stage is self.stages[0]:
+                ctx.started = start
+            try:
+                result = await loop.run_in_executor(executor, stage.func, ctx)
+            except BudgetExceeded as e:
+                logger.info(f"Skipping cycle {ctx.cycle} at stage {stage.name}: {e}")
+                result = None
+            except Exception as e:
+                logger.error(f"Stage {stage.name} failed on cycle {ctx.cycle}: {e}")
+                result = None
+            ctx.timings[stage.name] = time.perf_counter() - start
+            registry.observe("pipeline_stage", ctx.timings[stage.name], stage=stage.name)
+
+            if result is None:
+                self.dropped += 1
+                continue
+            if outbox is not None:
+                await outbox.put(result)
+            else:
+                self.completed += 1
+                registry.observe("pipeline_cycle", result.elapsed)
+                logger.info(f"Cycle {result.cycle} done in {result.elapsed:.2f}s {result.timings}")
+                if self.on_complete is not None:
+                    self.on_complete(result)
+
+    async def run(self) -> None:
+        """Run until max_cycles have drained through every stage, or until cancelled."""
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self._tasks = [asyncio.ensure_future(self._produce(queues[0]))]
+        for i, stage in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(self.stages) else None
+            self._tasks.append(asyncio.ensure_future(self._work(stage, queues[i], outbox)))
+
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            logger.info("Pipeline cancelled")
+            raise
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            for executor in self._executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def cancel(self) -> None:
+        """Cancel all running stage tasks; work already on a thread finishes in the background."""
+        for task in self._tasks:
+            task.cancel()
+
+
+def build_roast_stages(tts,
+                       show_overlay: Callable[[CycleContext], Any],
+                       hide_overlay: Callable[[Any], None],
+                       prompt: str = "What can you see in this screenshot?",
+                       model_type: ImageProcessingOpenAIModelTypes = ImageProcessingOpenAIModelTypes.GPT_4_O,
+                       detail: ImageProcessingInputDetail = ImageProcessingInputDetail.AUTO,
+                       screenshot_manager: Optional[ScreenshotManager] = None,
+                       preprocessor: Optional[ImagePreprocessor] = None,
+                       frame_cache=None,
+                       response_cache=None,
+                       incremental=None,
+                       capture_worker=None) -> List[PipelineStage]:
+    """
+    Build the capture -> encode -> vision -> joke -> render -> TTS stages.
+
+    Args:
+        tts: AdvancedTextToSpeech used by the TTS stage
+        show_overlay: Opens the overlay for a cycle and returns a handle
+        hide_overlay: Closes the overlay handle once speech has finished
+        prompt: Vision prompt
+        model_type: Model used for both calls
+        detail: Vision detail level
+        screenshot_manager: Capture source, a new ScreenshotManager by default
+        preprocessor: Downscale/compress stage, a new ImagePreprocessor by default
+        frame_cache: Optional FrameCache to skip API calls for unchanged screens
+        response_cache: Optional ResponseCache passed to both API calls
+        incremental: Optional IncrementalAnalyzer to send only the changed region
+        capture_worker: Optional running CaptureWorker; the capture stage then
+            has it crop, fingerprint and compress the frame out of process
+            (not combined with `incremental`, which needs the pixels here)
+
+    Returns:
+        Stages ready for AsyncPipeline
+    """
+    screenshot_manager = screenshot_manager or ScreenshotManager()
+    preprocessor = preprocessor or ImagePreprocessor()
+    # Only one overlay may be up at a time: the render stage takes the slot and
+    # the TTS stage gives it back once the overlay has been hidden.
+    overlay_slot = threading.Semaphore(1)
+
+    def capture(ctx):
+        if get_governor().should_skip():
+            logger.info(f"Daily budget spent, skipping cycle {ctx.cycle}")
+            return None
+        if capture_worker is not None and incremental is None:
+            rect = screenshot_manager.resolve()
+            encoded = capture_worker.encode(
+                detail=detail.value,
+                preprocessor=preprocessor,
+                bbox=rect.bbox if rect is not None else None,
+                hash_size=frame_cache.hash_size if frame_cache is not None else None,
+            )
+            ctx.image, ctx.frame_hash = encoded.image, encoded.fingerprint
+            return ctx
+        ctx.frame = screenshot_manager.take()
+        return ctx
+
+    def encode(ctx):
+        if frame_cache is not None:
+            if ctx.frame_hash is None:
+                ctx.frame_hash = frame_cache.fingerprint(ctx.frame)
+            entry = frame_cache.lookup(ctx.frame_hash)
+            if entry is not None:
+                ctx.description, ctx.joke, ctx.cached = entry.description, entry.joke, True
+                return ctx
+        if ctx.image is not None:
+            # Already encoded by the capture worker
+            return ctx
+        image = ctx.frame
+        if incremental is not None:
+            ctx.increment = incremental.plan(ctx.frame)
+            if ctx.increment.change == FrameChange.UNCHANGED:
+                ctx.description, ctx.frame = ctx.increment.previous_description, None
+                return ctx
+            ctx.prompt = ctx.increment.prompt(prompt, ctx.frame.size)
+            if ctx.increment.change == FrameChange.CROP:
+                image = ctx.increment.image
+        ctx.image = preprocessor.prepare(image, detail.value)
+        if incremental is None:
+            ctx.frame = None
+        return ctx
+
+    def vision(ctx):
+        if ctx.description is None:
+            completion = process_image_with_openai(
+                load_openai_client(), ctx.image, ctx.prompt or prompt,
+                model_type=model_type, detail=detail, cache=response_cache
+            )
+            ctx.description = completion.choices[0].message.content
+            if ctx.increment is not None:
+                incremental.commit(ctx.frame, ctx.description, ctx.increment)
+        ctx.frame = None
+        return ctx
+
+    def joke(ctx):
+        if ctx.joke is None:
+            ctx.joke = generate_joke_from_description(load_openai_client(), ctx.description, model_type, cache=response_cache)
+            if frame_cache is not None:
+                frame_cache.store(ctx.frame_hash, ctx.description, ctx.joke)
+        if tts.mode == SpeechMode.PRERENDERED:
+            # Synthesize while the overlay is being brought up
+            tts.prerender(ctx.joke)
+        return ctx
+
+    def render(ctx):
+        overlay_slot.acquire()
+        try:
+            ctx.overlay = show_overlay(ctx)
+        except Exception:
+            overlay_slot.release()
+            raise
+        if ctx.overlay is None:
+            overlay_slot.release()
+            return None
+        return ctx
+
+    def speak(ctx):
+        try:
+            tts.speak_async(ctx.joke).wait()
+        finally:
+            hide_overlay(ctx.overlay)
+            overlay_slot.release()
+        return ctx
+
+    return [
+        PipelineStage("capture", capture),
+        PipelineStage("encode", encode),
+        PipelineStage("vision", vision),
+        PipelineStage("joke", joke),
+        PipelineStage("render", render),
+        PipelineStage("tts", speak),
+    ]
@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting a shared resource to `rate` units per second.
+
+    Up to `burst` units can be taken at once after an idle period. Waiting
+    callers reserve their tokens up front, so they are served in arrival order
+    instead of racing each other for every refill.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity; defaults to one second's worth of tokens
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if they are available right now."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Take tokens, waiting for them to be refilled if necessary.
+
+        Args:
+            tokens: Units to take
+            timeout: Longest acceptable wait in seconds, or None to wait as long as it takes
+
+        Returns:
+            False without taking anything if the wait would exceed `timeout`
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return False
+            self._tokens -= tokens
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def retry_after(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` would be available without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def adjust(self, tokens: float) -> None:
+        """Take tokens without waiting, or return them if negative, e.g. to settle an estimate."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.burst, self._tokens - tokens)
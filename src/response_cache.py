@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "response_cache.sqlite3"
+CACHE_ENV_FLAG = "SCRAPYARD_RESPONSE_CACHE"
+
+
+def digest(data: Union[str, bytes]) -> str:
+    """SHA-256 hex digest of text or bytes."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed, size-bounded cache of OpenAI responses stored in SQLite.
+
+    Keys are digests of everything that determines a response (model, detail,
+    prompt, image or description), so identical requests survive restarts.
+    The least recently used entries are evicted once the stored values exceed
+    `max_bytes`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 32 * 1024 * 1024, enabled: Optional[bool] = None):
+        """
+        Args:
+            path: SQLite database file
+            max_bytes: Upper bound for the total size of stored values
+            enabled: Turn the cache on or off; defaults to on unless the
+                SCRAPYARD_RESPONSE_CACHE environment variable is "0"
+        """
+        if enabled is None:
+            enabled = os.environ.get(CACHE_ENV_FLAG, "1") != "0"
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+
+        if self.enabled:
+            self._open()
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        logger.info(f"Response cache opened at {self.path} ({self._total_bytes} bytes)")
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Combine the parts that identify a request into one cache key."""
+        return digest("\x1f".join(parts))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for a key, or None on a miss or when disabled."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store a value, evicting least recently used entries beyond the size bound."""
+        if not self.enabled:
+            return
+
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.warning(f"Not caching {size} byte response larger than the cache")
+            return
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self._total_bytes -= previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._total_bytes += size
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._total_bytes = 0
+                return
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._total_bytes -= row[1]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self._total_bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self.enabled = False
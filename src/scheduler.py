@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+from .frame_cache import dhash, hamming_distance
+
+logger = logging.getLogger(__name__)
+
+
+def frame_signature(image: Image.Image, hash_size: int = 8, box: Optional[Tuple[int, int, int, int]] = None) -> int:
+    """
+    Cheap change signature of a frame, or of a (left, top, right, bottom) box of it.
+
+    The frame is first box-reduced by an integer factor, which is much cheaper
+    than converting the full frame, and then difference-hashed.
+    """
+    width, height = (box[2] - box[0], box[3] - box[1]) if box is not None else image.size
+    factor = max(1, min(width, height) // (hash_size * 8))
+    if factor > 1:
+        image = image.reduce(factor, box)
+    elif box is not None:
+        image = image.crop(box)
+    return dhash(image, hash_size)
+
+
+class AdaptiveScheduler:
+    """
+    Run a task when the screen changes, within a minimum and maximum cadence.
+
+    A cheap signature is sampled every `sample_interval` seconds. The task runs
+    when the signature has moved at least `change_threshold` bits away from the
+    one seen at the last run (but never sooner than `min_interval` after it),
+    or when `max_interval` has passed regardless. Runs never overlap, failures
+    back off exponentially, and the thread sleeps on an Event until the next
+    sample or deadline instead of polling.
+    """
+
+    def __init__(self,
+                 task: Callable[[], None],
+                 signature: Callable[[], int],
+                 sample_interval: float = 2.0,
+                 min_interval: float = 60.0,
+                 max_interval: float = 120.0,
+                 change_threshold: int = 6,
+                 backoff_base: float = 30.0,
+                 backoff_max: float = 600.0):
+        """
+        Args:
+            task: The expensive job, e.g. a full capture-analyze-speak cycle
+            signature: Returns a cheap integer fingerprint of the current screen
+            sample_interval: Seconds between signature samples
+            min_interval: Minimum seconds between the starts of two runs
+            max_interval: Run at least this often even if nothing changed
+            change_threshold: Hamming distance that counts as a change
+            backoff_base: Extra delay after the first consecutive failure,
+                doubled for each further failure
+            backoff_max: Upper bound for the failure delay
+        """
+        if min_interval > max_interval:
+            raise ValueError("min_interval must not exceed max_interval")
+
+        self.task = task
+        self.signature = signature
+        self.sample_interval = sample_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.change_threshold = change_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._trigger = False
+        self._baseline: Optional[int] = None
+        self._last_run: Optional[float] = None
+        self._not_before = 0.0
+        self._failures = 0
+        self._metrics = {
+            'samples': 0,
+            'runs': 0,
+            'changed_runs': 0,
+            'max_interval_runs': 0,
+            'skipped_unchanged': 0,
+            'skipped_overlap': 0,
+            'errors': 0,
+        }
+
+    def start(self) -> None:
+        """Start the scheduler thread; the first run happens immediately."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name="adaptive-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop sampling; a run in progress is allowed to finish."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def join(self) -> None:
+        """Block until the scheduler stops, staying responsive to Ctrl+C."""
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(1.0)
+
+    def trigger(self) -> None:
+        """Run the task at the next opportunity, as if the screen had changed."""
+        self._trigger = True
+        self._wakeup.set()
+
+    def run_once(self) -> bool:
+        """
+        Run the task now unless a run is already in progress.
+
+        Returns:
+            True if the task ran and succeeded
+        """
+        if not self._run_lock.acquire(blocking=False):
+            self._metrics['skipped_overlap'] += 1
+            logger.info("Previous run still in progress, skipping")
+            return False
+
+        started = time.monotonic()
+        try:
+            self.task()
+        except Exception as e:
+            self._failures += 1
+            self._metrics['errors'] += 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - 1))
+            self._not_before = time.monotonic() + delay
+            logger.error(f"Scheduled task failed ({self._failures} in a row), backing off {delay:.1f}s: {e}")
+            return False
+        else:
+            self._failures = 0
+            return True
+        finally:
+            self._last_run = started
+            self._metrics['runs'] += 1
+            self._run_lock.release()
+            logger.info(f"Scheduled run took {time.monotonic() - started:.1f}s")
+
+    def _sample(self) -> Optional[int]:
+        try:
+            value = self.signature()
+        except Exception as e:
+            logger.warning(f"Change signature failed: {e}")
+            return None
+        self._metrics['samples'] += 1
+        return value
+
+    def _decide(self, now: float, value: Optional[int]) -> Optional[str]:
+        """Why the task should run now, or None to keep waiting."""
+        if now < self._not_before:
+            return None
+        if self._trigger:
+            return "triggered"
+        if self._last_run is None:
+            return "first run"
+
+        since_last = now - self._last_run
+        if since_last >= self.max_interval:
+            return "max interval"
+        if since_last < self.min_interval or value is None:
+            return None
+        if self._baseline is None or hamming_distance(value, self._baseline) >= self.change_threshold:
+            return "changed"
+        self._metrics['skipped_unchanged'] += 1
+        return None
+
+    def _next_wait(self, now: float) -> float:
+        wait = self.sample_interval
+        if self._last_run is not None:
+            wait = min(wait, max(0.0, self._last_run + self.max_interval - now))
+        if now < self._not_before:
+            wait = max(wait, self._not_before - now)
+        return wait
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            value = self._sample()
+            now = time.monotonic()
+            reason = self._decide(now, value)
+            if reason is not None:
+                distance = hamming_distance(value, self._baseline) if None not in (value, self._baseline) else None
+                logger.info(f"Running scheduled task ({reason}, distance {distance})")
+                self._trigger = False
+                if reason == "changed":
+                    self._metrics['changed_runs'] += 1
+                elif reason == "max interval":
+                    self._metrics['max_interval_runs'] += 1
+                if self.run_once():
+                    # Compare later samples against the screen the task just saw
+                    self._baseline = value
+                now = time.monotonic()
+
+            self._wakeup.wait(self._next_wait(now))
+            self._wakeup.clear()
+
+    def metrics(self) -> Dict[str, int]:
+        return dict(self._metrics, failures_in_a_row=self._failures)
@@ -1,61 +1,83 @@
 from PIL import ImageGrab
 import os
 import logging
-import time
 from enum import Enum
+from typing import Optional, Union
+
+from .capture import BBox, CaptureBackend, CaptureBackendType, create_capture_backend
+from .geometry import CaptureRegion, GeometryProvider, Rect, default_geometry_provider, resolve_region
 
 class PathType(Enum):
     ABSOLUTE = "absolute"
     LOCAL = "local"  
 
 
-class CustomFormatter(logging.Formatter):
-    def formatTime(self, record, datefmt=None):
-        ct = self.converter(record.created)
-        if datefmt:
-            s = time.strftime(datefmt, ct)
-        else:
-            s = time.strftime("%H.%M.%S", ct)
-        return f"[{s}]"
-
-    def format(self, record):
-        record.asctime = self.formatTime(record, self.datefmt)
-        return super().format(record)
-
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.propagate = False
-logger.handlers = []
-handler = logging.StreamHandler()
-handler.setFormatter(CustomFormatter('%(asctime)s %(message)s', datefmt='%H.%M.%S'))
-logger.addHandler(handler)
-
-def Logging(func):
-    def wrapper(*args, **kwargs):
-        try:
-            result = func(*args, **kwargs)
-            logger.info(f"{func.__name__} executed successfully")
-            return result
-        except Exception as e:
-            logger.error(f"{func.__name__} failed: {str(e)}")
-            raise
-        finally:
-            logger.info(f"{func.__name__} finished execution")
-    return wrapper
 
 class ScreenshotManager:
-    def __init__(self):
+    def __init__(self,
+                 backend: Union[None, str, CaptureBackendType, CaptureBackend] = None,
+                 region: CaptureRegion = CaptureRegion.ALL_SCREENS,
+                 geometry: Optional[GeometryProvider] = None,
+                 cursor_size: tuple = (1024, 768)):
+        """
+        Args:
+            backend: Capture backend instance, or a backend type/name passed to
+                create_capture_backend (defaults to SCRAPYARD_CAPTURE_BACKEND, then auto)
+            region: Part of the desktop captured by take()
+            geometry: Monitor/window/cursor geometry, the platform provider by default
+            cursor_size: Size of the area captured around the cursor
+        """
         self.image = None
-    
-    @Logging
-    def take(self) -> ImageGrab.Image:
-        """Take a screenshot of all screens and return the image."""
-        self.image = ImageGrab.grab(all_screens=True)
-        if self.image.mode != 'RGB':
-            self.image = self.image.convert('RGB')
+        if not isinstance(backend, CaptureBackend):
+            backend = create_capture_backend(backend)
+        self.backend = backend
+        self.region = region
+        self.geometry = geometry
+        self.cursor_size = cursor_size
+        self.last_rect: Optional[Rect] = None
+
+    def _resolve(self, region: CaptureRegion, bbox: Optional[BBox]) -> Optional[Rect]:
+        if region == CaptureRegion.ALL_SCREENS:
+            return None
+        if region == CaptureRegion.BBOX and self.geometry is None:
+            if bbox is None:
+                raise ValueError("CaptureRegion.BBOX needs a bbox")
+            return Rect(*bbox)
+        if self.geometry is None:
+            self.geometry = default_geometry_provider()
+            if self.geometry is None:
+                logger.warning(f"No geometry provider for {region.value} capture, capturing all screens")
+                self.region = CaptureRegion.ALL_SCREENS
+                return None
+        return resolve_region(self.geometry, region, bbox, self.cursor_size)
+
+    def take(self, bbox: Optional[BBox] = None, region: Optional[CaptureRegion] = None) -> ImageGrab.Image:
+        """Take a screenshot of the configured region and return the RGB image.
+
+        Args:
+            bbox: Capture exactly this (left, top, right, bottom) box
+            region: Override the manager's region for this capture
+
+        The captured rect is kept in `last_rect` (None for all screens).
+        """
+        if bbox is not None and region is None:
+            region = CaptureRegion.BBOX
+        rect = self._resolve(region or self.region, bbox)
+        self.last_rect = rect
+        self.image = self.backend.grab(rect.bbox if rect is not None else None)
+        logger.debug(f"Captured {self.image.width}x{self.image.height} with {self.backend.name}")
         return self.image
+
+    def resolve(self) -> Optional[Rect]:
+        """Desktop rect the configured region covers right now (None for all screens), without capturing."""
+        return self._resolve(self.region, None)
+
+    def peek(self) -> ImageGrab.Image:
+        """Capture the configured region without replacing `image`, for cheap sampling."""
+        rect = self.resolve()
+        return self.backend.grab(rect.bbox if rect is not None else None)
     
-    @Logging
     def _ensure_directory(self, file_path: str) -> None:
         """Ensure the directory exists for the given file path."""
         directory = os.path.dirname(file_path)
@@ -69,15 +91,14 @@ class ScreenshotManager:
             return False
         valid_extensions = ['.png', '.jpeg', '.jpg', '.webp']
         return os.path.splitext(file_path)[1].lower() in valid_extensions
-    @Logging
     def save(self, file_path: str) -> None:
         """Take a screenshot and save it to the specified path."""
         self._ensure_directory(file_path)
         if not self.image:
             self.take()
         self.image.save(file_path, format='PNG')
+        logger.info(f"Saved screenshot to {file_path}")
     
-    @Logging
     def save_and_get_path(self, file_path: str, path_type: PathType = PathType.ABSOLUTE) -> str:
         """Take a screenshot, save it, and return the path.
         
@@ -94,8 +115,6 @@ class ScreenshotManager:
         else:
             return os.path.relpath(file_path)
     
-    @Logging
-    @Logging
     def process(self, file_path: str, return_path: bool = False, path_type: PathType = PathType.ABSOLUTE) -> str or None:
         """Main processing function that can either save a screenshot or save and return path.
         
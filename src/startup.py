@@ -0,0 +1,177 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Subsystems that are not needed for the first capture and can be loaded in
+# the background while it happens.
+DEFERRED_MODULES = (
+    "src.openai_vision",
+    "src.tts",
+    "src.overlay",
+    "src.pipeline",
+)
+
+
+@dataclass
+class ImportTiming:
+    name: str
+    cumulative: float
+    self_time: float
+
+
+class _TimedLoader:
+    """Wraps a loader so executing the module body is timed."""
+
+    def __init__(self, loader, timer: "ImportTimer"):
+        self._loader = loader
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer._enter(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._exit(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportTimer:
+    """
+    Measure how long each module takes to import, like `python -X importtime`.
+
+    Works inside a frozen build as well, because it hooks the import system
+    instead of relying on an interpreter flag. Only install it for profiling:
+    every import goes through an extra finder while it is active.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, ImportTiming] = {}
+        self._local = threading.local()
+        self._installed = False
+
+    def install(self) -> "ImportTimer":
+        if not self._installed:
+            sys.meta_path.insert(0, self)
+            self._installed = True
+        return self
+
+    def uninstall(self) -> None:
+        if self._installed:
+            sys.meta_path.remove(self)
+            self._installed = False
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self)
+                return spec
+        return None
+
+    def _stack(self) -> List[list]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, name: str) -> None:
+        self._stack().append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name: str) -> None:
+        stack = self._stack()
+        _, started, children = stack.pop()
+        cumulative = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += cumulative
+        self.timings[name] = ImportTiming(name, cumulative, cumulative - children)
+
+    def top(self, count: int = 20) -> List[ImportTiming]:
+        """The slowest imports by cumulative time."""
+        return sorted(self.timings.values(), key=lambda t: t.cumulative, reverse=True)[:count]
+
+    def format_report(self, count: int = 20) -> str:
+        lines = [f"{'cumulative ms':>14} {'self ms':>9}  module"]
+        for timing in self.top(count):
+            lines.append(f"{timing.cumulative * 1000:14.1f} {timing.self_time * 1000:9.1f}  {timing.name}")
+        return "\n".join(lines)
+
+
+def time_import(name: str) -> float:
+    """Import a module and return how long it took in seconds (0 if it was already loaded)."""
+    if name in sys.modules:
+        return 0.0
+    start = time.perf_counter()
+    importlib.import_module(name)
+    return time.perf_counter() - start
+
+
+def start_background_imports(modules: Iterable[str] = DEFERRED_MODULES) -> threading.Thread:
+    """
+    Import deferred subsystems on a daemon thread.
+
+    The first capture can proceed meanwhile; anything that needs one of these
+    modules before the thread gets to it simply imports it itself, waiting on
+    the import lock for that module only.
+    """
+    def run():
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                logger.warning(f"Background import of {name} failed: {e}")
+        logger.debug(f"Background imports finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    thread = threading.Thread(target=run, name="background-imports", daemon=True)
+    thread.start()
+    return thread
+
+
+def profile_startup(process_start: float,
+                    timer: Optional[ImportTimer],
+                    capture,
+                    deferred: Iterable[str] = DEFERRED_MODULES) -> Dict[str, float]:
+    """
+    Report import costs and the time from process start to the first capture.
+
+    Args:
+        process_start: perf_counter() value taken as early as possible in main.py
+        timer: ImportTimer installed at that point, or None
+        capture: Callable taking the first screenshot
+        deferred: Subsystems imported after the first capture, timed individually
+
+    Returns:
+        Timings in milliseconds
+    """
+    ready = time.perf_counter()
+    capture()
+    first_capture = time.perf_counter()
+
+    results = {
+        'startup_ms': (ready - process_start) * 1000,
+        'first_capture_ms': (first_capture - process_start) * 1000,
+        'capture_ms': (first_capture - ready) * 1000,
+    }
+    for name in deferred:
+        results[f'import {name}_ms'] = time_import(name) * 1000
+
+    if timer is not None:
+        print(timer.format_report())
+        print()
+    for key, value in results.items():
+        print(f"{key:>32}: {value:8.1f}")
+    return results
@@ -1,16 +1,20 @@
-import pyttsx3
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 import threading
 import time
 import logging
-from dataclasses import dataclass
+import io
+import os
+import sys
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
 from enum import Enum
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from .metrics import get_metrics
+
 logger = logging.getLogger(__name__)
+registry = get_metrics()
 
 @dataclass
 class SpeechConfig:
@@ -26,32 +30,194 @@ class SpeechState(Enum):
     PAUSED = "paused"
     ERROR = "error"
 
+class SpeechPriority(Enum):
+    """Queue priority of an utterance; higher priorities are always spoken first."""
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+class SpeechMode(Enum):
+    """How queued text is turned into sound."""
+    LIVE = "live"
+    PRERENDERED = "prerendered"
+
+class UtteranceCache:
+    """Bounded LRU cache of synthesized WAV audio keyed on text and speech settings."""
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, config: SpeechConfig) -> Tuple:
+        return (text, config.rate, config.volume, config.voice_id)
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key: Tuple, audio: bytes) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = audio
+            self._bytes += len(audio)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+def play_wav_bytes(audio: bytes) -> None:
+    """Play WAV audio from memory and block until it has finished or is stopped."""
+    if sys.platform == "win32":
+        import winsound
+        winsound.PlaySound(audio, winsound.SND_MEMORY)
+        return
+
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    channel = pygame.mixer.Sound(file=io.BytesIO(audio)).play()
+    while channel is not None and channel.get_busy():
+        pygame.time.wait(20)
+
+def stop_wav_playback() -> None:
+    """Stop audio started by play_wav_bytes, from any thread."""
+    if sys.platform == "win32":
+        import winsound
+        winsound.PlaySound(None, 0)
+        return
+
+    import pygame
+    if pygame.mixer.get_init():
+        pygame.mixer.stop()
+
+@dataclass(eq=False)
+class SpeechHandle:
+    """Completion handle for one queued utterance."""
+    text: str
+    priority: SpeechPriority = SpeechPriority.NORMAL
+    enqueued: float = field(default_factory=time.perf_counter)
+    started: Optional[float] = None
+    completed: bool = False
+    cancelled: bool = False
+    error: Optional[Exception] = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the utterance has been spoken, cancelled or failed. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def cancel(self) -> bool:
+        """Cancel the utterance if it has not started yet."""
+        if self.started is not None or self.done():
+            return False
+        self.cancelled = True
+        self._done.set()
+        return True
+
+    def _finish(self, completed: bool, error: Optional[Exception] = None) -> None:
+        self.completed = completed
+        self.error = error
+        self._done.set()
+
 class AdvancedTextToSpeech:
-    def __init__(self):
-        """Initialize with robust error handling and state management."""
-        self.engine = pyttsx3.init(driverName=None, debug=False)
+    """
+    Text-to-speech front end with a dedicated worker thread.
+
+    The pyttsx3 engine is created and driven only by the worker, so callers
+    never block on synthesis or playback. Utterances are queued per priority
+    in deques and each call returns a SpeechHandle that can be waited on.
+    """
+
+    def __init__(self,
+                 mode: SpeechMode = SpeechMode.LIVE,
+                 cache_size: int = 32,
+                 driver_name: Optional[str] = None,
+                 engine_factory: Optional[Callable[[], Any]] = None):
+        """
+        Initialize with robust error handling and state management.
+
+        Args:
+            mode: LIVE speaks through the engine directly; PRERENDERED synthesizes
+                to an in-memory WAV first and plays that back
+            cache_size: Number of synthesized utterances kept for reuse
+            driver_name: pyttsx3 driver to use, or None for the platform default
+            engine_factory: Builds a pyttsx3-compatible engine on the worker
+                thread instead of pyttsx3.init (e.g. a null engine for benchmarks)
+
+        Raises:
+            RuntimeError: If the speech engine cannot be initialized
+        """
+        self.engine = None
         self.config = SpeechConfig()
         self.state = SpeechState.IDLE
-        
-        self.engine.connect('started-utterance', self._on_speech_start)
-        self.engine.connect('finished-utterance', self._on_speech_finish)
-        self.engine.connect('error', self._handle_error)
-        
+        self.mode = mode
+        self.utterance_cache = UtteranceCache(max_entries=cache_size)
+        self.driver_name = driver_name
+        self.engine_factory = engine_factory
+
         self._state_lock = threading.Lock()
-        self._speech_queue: List[str] = []
+        self._queues = {priority: deque() for priority in SpeechPriority}
+        self._commands = deque()
+        self._wakeup = threading.Event()
+        # Guards queue changes, the interrupt flag, _pending and _metrics.
+        # _pending counts utterances queued or playing; _idle is set exactly when it is 0
         self._queue_lock = threading.Lock()
-    
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._interrupt = threading.Event()
+        self._running = True
+        self._synthesizing = False
+        self._applied_config = None
+        self._current: Optional[SpeechHandle] = None
+        self._metrics = {
+            'spoken': 0,
+            'cancelled': 0,
+            'interrupted': 0,
+            'failed': 0,
+            'max_queue_depth': 0,
+            'total_queue_wait': 0.0,
+        }
+
+        ready = Future()
+        self._worker = threading.Thread(target=self._run, args=(ready,), name="tts-worker", daemon=True)
+        self._worker.start()
+        ready.result()
+
     def _on_speech_start(self, name):
         """Handler for speech start events."""
-        with self._state_lock:
-            self.state = SpeechState.SPEAKING
-            logger.info(f"Started speaking: {name}")
+        if self._synthesizing:
+            return
+        logger.info(f"Started speaking: {name}")
     
     def _on_speech_finish(self, name, completed):
         """Handler for speech completion events."""
-        with self._state_lock:
-            self.state = SpeechState.IDLE
-            logger.info(f"Finished speaking: {name}, completed: {completed}")
+        if self._synthesizing:
+            return
+        logger.info(f"Finished speaking: {name}, completed: {completed}")
+
+    def _on_word(self, name, location, length):
+        """Stop the engine from inside its own loop when an interrupt is pending."""
+        if self._interrupt.is_set() and not self._synthesizing:
+            self.engine.stop()
     
     def _handle_error(self, name, exception):
         """Handler for speech error events."""
@@ -62,6 +228,8 @@ class AdvancedTextToSpeech:
     def configure(self, config: SpeechConfig) -> None:
         """
         Apply speech configuration with validation and atomic updates.
+
+        The new settings are picked up by the worker before the next utterance.
         
         Args:
             config: SpeechConfig instance containing desired settings
@@ -77,73 +245,296 @@ class AdvancedTextToSpeech:
             
         with self._state_lock:
             self.config = config
-            self.engine.setProperty('rate', config.rate)
-            self.engine.setProperty('volume', config.volume)
-            if config.voice_id:
-                self.engine.setProperty('voice', config.voice_id)
 
-    def speak_async(self, text: str) -> None:
+    def speak_async(self,
+                    text: str,
+                    priority: SpeechPriority = SpeechPriority.NORMAL,
+                    interrupt: bool = False) -> SpeechHandle:
         """
-        Asynchronous speech processing with queue management.
+        Queue text for the worker thread and return immediately.
         
         Args:
             text: Text to be spoken
-            
-        Raises:
-            RuntimeError: If speech engine encounters an error
+            priority: Queue priority; HIGH utterances jump ahead of NORMAL and LOW ones
+            interrupt: Cut off the utterance currently playing and speak this one next
+
+        Returns:
+            A SpeechHandle that completes once the text has been spoken
         """
+        handle = SpeechHandle(text=text, priority=priority)
         if not text.strip():
             logger.warning("Empty text provided")
+            handle._finish(False)
+            return handle
+
+        if not self._running:
+            raise RuntimeError("Speech worker has been shut down")
+
+        with self._queue_lock:
+            self._pending += 1
+            self._idle.clear()
+            if interrupt:
+                self._queues[priority].appendleft(handle)
+                self._interrupt.set()
+            else:
+                self._queues[priority].append(handle)
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self.queue_depth)
+        if interrupt and self.mode == SpeechMode.PRERENDERED:
+            stop_wav_playback()
+        self._wakeup.set()
+        return handle
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of utterances waiting to be spoken."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until the queue is empty and nothing is playing. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
+    def _finished(self, count: int = 1) -> None:
+        """Account for utterances that were spoken, failed or dropped from the queue."""
+        with self._queue_lock:
+            self._finished_locked(count)
+
+    def _finished_locked(self, count: int = 1) -> None:
+        self._pending -= count
+        if self._pending <= 0:
+            self._pending = 0
+            self._idle.set()
+
+    def _call_on_worker(self, func: Callable):
+        """
+        Run `func` on the worker thread and return its result.
+
+        Raises:
+            RuntimeError: The worker is shut down or exited before running `func`
+        """
+        if threading.current_thread() is self._worker:
+            return func()
+        if not self._running or not self._worker.is_alive():
+            raise RuntimeError("Speech worker is not running")
+        future = Future()
+        self._commands.append((func, future))
+        self._wakeup.set()
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except FutureTimeout:
+                # The worker fails queued commands on shutdown; this covers it dying outright
+                if not self._worker.is_alive() and not future.done():
+                    raise RuntimeError("Speech worker exited before running the command")
+
+    def synthesize(self, text: str) -> bytes:
+        """
+        Render text to WAV audio without playing it.
+
+        Results are cached on the text and current SpeechConfig, so repeated
+        lines are only synthesized once. The engine itself runs on the worker.
+
+        Args:
+            text: Text to synthesize
+
+        Returns:
+            The WAV file contents
+        """
+        key = UtteranceCache.make_key(text, self.config)
+        audio = self.utterance_cache.get(key)
+        if audio is not None:
+            registry.inc("tts_cache_hits")
+            return audio
+
+        with registry.span("tts_synthesize"):
+            audio = self._call_on_worker(lambda: self._synthesize_on_worker(text))
+        registry.inc("tts_synthesized_bytes", len(audio))
+        self.utterance_cache.put(key, audio)
+        return audio
+
+    def _synthesize_on_worker(self, text: str) -> bytes:
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self._apply_config()
+            # Utterance callbacks fired while writing the file are not playback
+            self._synthesizing = True
+            try:
+                self.engine.save_to_file(text, path)
+                self.engine.runAndWait()
+            finally:
+                self._synthesizing = False
+            with open(path, "rb") as audio_file:
+                return audio_file.read()
+        finally:
+            os.remove(path)
+
+    def prerender(self, text: str) -> None:
+        """Synthesize text ahead of time so a later speak_async plays it immediately.
+
+        Rendering runs on the worker, so this waits for any utterance in progress.
+        """
+        if text and text.strip():
+            self.synthesize(text)
+
+    def _apply_config(self) -> None:
+        config = self.config
+        if config is self._applied_config:
             return
-            
+        self.engine.setProperty('rate', config.rate)
+        self.engine.setProperty('volume', config.volume)
+        if config.voice_id:
+            self.engine.setProperty('voice', config.voice_id)
+        self._applied_config = config
+
+    def _next_handle(self) -> Optional[SpeechHandle]:
         with self._queue_lock:
-            self._speech_queue.append(text)
-            
-        if self.state == SpeechState.IDLE:
-            self._process_next_text()
+            # Cleared before the pop: an interrupt queued from here on is
+            # either already at the front or still pending for this handle
+            self._interrupt.clear()
+            for priority in SpeechPriority:
+                queue = self._queues[priority]
+                while queue:
+                    handle = queue.popleft()
+                    if handle.cancelled:
+                        self._metrics['cancelled'] += 1
+                        self._finished_locked()
+                        continue
+                    return handle
+        return None
+
+    def _speak_now(self, text: str) -> None:
+        """Speak text on the worker thread, blocking until playback ends."""
+        if self.mode == SpeechMode.PRERENDERED:
+            audio = self.synthesize(text)
+            self._on_speech_start(text[:50])
+            play_wav_bytes(audio)
+            self._on_speech_finish(text[:50], not self._interrupt.is_set())
+            return
 
-    def _process_next_text(self) -> None:
-        """Internal method for processing queued text."""
+        self._apply_config()
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+    def _speak(self, handle: SpeechHandle) -> None:
+        handle.started = time.perf_counter()
         with self._queue_lock:
-            if not self._speech_queue:
-                return
-                
-            text = self._speech_queue.pop(0)
-            
+            self._metrics['total_queue_wait'] += handle.started - handle.enqueued
+        registry.observe("tts_queue_wait", handle.started - handle.enqueued, priority=handle.priority.name)
+        with self._state_lock:
+            self.state = SpeechState.SPEAKING
+            self._current = handle
+
         try:
-            with self._state_lock:
-                if self.state != SpeechState.IDLE:
-                    logger.info(f"Skipping text: {text[:50]}...")
-                    return
-                    
-                self.state = SpeechState.SPEAKING
-                self.engine.say(text)
-                
-            self.engine.runAndWait()
+            with registry.span("tts_speak", mode=self.mode.value):
+                self._speak_now(handle.text)
         except Exception as e:
             logger.error(f"Speech processing failed: {str(e)}")
-            self.state = SpeechState.ERROR
+            with self._queue_lock:
+                self._metrics['failed'] += 1
+            with self._state_lock:
+                self.state = SpeechState.ERROR
+            handle._finish(False, e)
+        else:
+            with self._queue_lock:
+                interrupted = self._interrupt.is_set()
+                self._metrics['interrupted' if interrupted else 'spoken'] += 1
+            handle._finish(not interrupted)
         finally:
             with self._state_lock:
-                self.state = SpeechState.IDLE
-                self._process_next_text()
+                self._current = None
+                if self.state == SpeechState.SPEAKING:
+                    self.state = SpeechState.IDLE
+            self._finished()
+
+    def _run(self, ready: Future) -> None:
+        """Worker loop: owns the engine, runs commands first, then queued speech."""
+        try:
+            if self.engine_factory is not None:
+                self.engine = self.engine_factory()
+            else:
+                # Imported here so the driver stack loads on the worker, not at startup
+                import pyttsx3
+
+                self.engine = pyttsx3.init(driverName=self.driver_name, debug=False)
+            self.engine.connect('started-utterance', self._on_speech_start)
+            self.engine.connect('finished-utterance', self._on_speech_finish)
+            self.engine.connect('started-word', self._on_word)
+            self.engine.connect('error', self._handle_error)
+        except Exception as e:
+            self._running = False
+            ready.set_exception(RuntimeError(f"Failed to initialize speech engine: {e}"))
+            return
+        ready.set_result(True)
+
+        try:
+            while self._running:
+                self._wakeup.clear()
+
+                if self._commands:
+                    func, future = self._commands.popleft()
+                    try:
+                        future.set_result(func())
+                    except Exception as e:
+                        future.set_exception(e)
+                    continue
+
+                handle = self._next_handle()
+                if handle is not None:
+                    self._speak(handle)
+                    continue
+
+                if not (self.queue_depth or self._commands):
+                    self._wakeup.wait()
+        finally:
+            self._running = False
+            while self._commands:
+                _, future = self._commands.popleft()
+                future.set_exception(RuntimeError("Speech worker has been shut down"))
+            self._idle.set()
 
     def stop(self) -> None:
-        """Immediate termination of ongoing speech."""
+        """Immediate termination of ongoing speech and everything still queued."""
+        with self._queue_lock:
+            for queue in self._queues.values():
+                while queue:
+                    queue.popleft().cancel()
+                    self._metrics['cancelled'] += 1
+                    self._finished_locked()
         with self._state_lock:
-            if self.state == SpeechState.SPEAKING:
-                self.engine.stop()
-                self.state = SpeechState.IDLE
+            speaking = self.state == SpeechState.SPEAKING
+        if speaking:
+            self._interrupt.set()
+            if self.mode == SpeechMode.PRERENDERED:
+                stop_wav_playback()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop speaking and shut the worker thread down."""
+        self.stop()
+        self._running = False
+        self._wakeup.set()
+        self._worker.join(timeout)
+
+    def metrics(self) -> Dict[str, float]:
+        """Queue depth and throughput counters."""
+        with self._queue_lock:
+            metrics = dict(self._metrics)
+            depth = self.queue_depth
+        spoken = metrics['spoken'] + metrics['interrupted'] + metrics['failed']
+        return {
+            'queue_depth': depth,
+            **metrics,
+            'mean_queue_wait': metrics['total_queue_wait'] / spoken if spoken else 0.0,
+        }
 
     def get_state(self) -> Dict[str, any]:
         """Retrieve current system state with synchronization."""
+        voices = self._call_on_worker(lambda: [{'id': v.id, 'name': v.name, 'languages': v.languages}
+                                               for v in self.engine.getProperty('voices')])
         with self._state_lock:
-            voices = [{'id': v.id, 'name': v.name, 'languages': v.languages}
-                     for v in self.engine.getProperty('voices')]
-            
             return {
                 'state': self.state.value,
                 'config': vars(self.config),
-                'queue_length': len(self._speech_queue),
-                'available_voices': voices
-            }
\ No newline at end of file
+                'queue_length': self.queue_depth,
+                'available_voices': voices,
+                'metrics': self.metrics()
+            }